@@ -3,6 +3,10 @@ from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from app.config import Config
 from app.blocklist import BLOCKLIST
+from app.password_hashing import hasher
+from app import cache, db, metrics, profiling
+from app.user_stats import rebuild_user_stats_command
+from app.image_hash import backfill_image_hashes_command
 
 # Import API blueprints
 from app.routes.api.auth_api import auth_api_bp
@@ -10,6 +14,7 @@ from app.routes.api.dashboard_api import dashboard_api_bp
 from app.routes.api.detection_api import detection_api_bp
 from app.routes.api.insurance_api import insurance_api_bp
 from app.routes.api.claims_api import claims_api_bp
+from app.routes.api.uploads_api import uploads_api_bp
 
 # Import Page blueprints
 from app.routes.pages.auth_pages import auth_pages_bp
@@ -27,6 +32,12 @@ def create_app():
     # Initialize extensions with app context
     jwt.init_app(app)
     bcrypt.init_app(app)
+    BLOCKLIST.init_app(app)
+    hasher.init_app(app)
+    metrics.init_app(app)
+    cache.init_app(app)
+    db.init_app(app)
+    profiling.init_app(app)
 
     # Register API Blueprints
     app.register_blueprint(auth_api_bp)
@@ -34,11 +45,17 @@ def create_app():
     app.register_blueprint(detection_api_bp)
     app.register_blueprint(insurance_api_bp)
     app.register_blueprint(claims_api_bp)
+    app.register_blueprint(uploads_api_bp)
     
     # Register Page Blueprints
     app.register_blueprint(auth_pages_bp)
     app.register_blueprint(dashboard_pages_bp)
     app.register_blueprint(insurance_pages_bp) 
+
+    # CLI commands
+    app.cli.add_command(rebuild_user_stats_command)
+    app.cli.add_command(backfill_image_hashes_command)
+
     # Check if token is revoked
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
@@ -0,0 +1,36 @@
+"""
+Async (ASGI) App
+Quart app factory for the wait-heavy endpoints: crack detection uploads and
+claim submit-final. Uploads are received by the event loop, files are written
+with async IO, the DB is reached through an aiomysql pool, and model/OpenCV
+work runs on an executor. One process can therefore keep many slow uploads
+open without tying up a worker per connection.
+
+    hypercorn asgi:app --bind 0.0.0.0:5002 --workers 2
+
+URLs and JSON match the Flask routes. Run it next to the WSGI app and route
+/api/detection/* and /api/insurance/claims/submit-final to it.
+"""
+from quart import Quart
+from app.config import Config
+from app.blocklist import BLOCKLIST
+from app.aio import db, executors
+from app.aio.detection import detection_bp
+from app.aio.claims import claims_bp
+
+
+def create_async_app():
+    app = Quart(__name__)
+    app.config.from_object(Config)
+    # Quart would otherwise cap bodies at 16 MB and 60 s, refusing uploads the Flask app accepts
+    app.config["MAX_CONTENT_LENGTH"] = Config.ASYNC_MAX_CONTENT_LENGTH
+    app.config["BODY_TIMEOUT"] = Config.ASYNC_BODY_TIMEOUT
+
+    BLOCKLIST.init_app(app)
+    db.init_app(app)
+    executors.init_app(app)
+
+    app.register_blueprint(detection_bp)
+    app.register_blueprint(claims_bp)
+
+    return app
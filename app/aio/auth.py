@@ -0,0 +1,48 @@
+"""
+Async Auth
+Access-token check for the ASGI app. Accepts the same tokens flask_jwt_extended
+issues (signature, expiry, token type, revocation) and answers with the same
+error bodies.
+"""
+from functools import wraps
+import jwt
+from quart import current_app, g, jsonify, request
+from app.blocklist import BLOCKLIST
+from app.aio.executors import run_blocking
+
+
+def _decode(token):
+    config = current_app.config
+    return jwt.decode(
+        token,
+        config.get("JWT_SECRET_KEY") or config["SECRET_KEY"],
+        algorithms=[config.get("JWT_ALGORITHM", "HS256")],
+    )
+
+
+def jwt_required(view):
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return jsonify({"msg": "Missing Authorization Header"}), 401
+        try:
+            claims = _decode(header[len("Bearer "):])
+        except jwt.ExpiredSignatureError:
+            return jsonify({"msg": "Token has expired"}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({"msg": str(e)}), 422
+        if claims.get("type") != "access":
+            return jsonify({"msg": "Only non-refresh tokens are allowed"}), 422
+        # The revocation check can hit SQLite or Redis; keep it off the event loop
+        if await run_blocking(BLOCKLIST.__contains__, claims.get("jti")):
+            return jsonify({"msg": "Token has been revoked"}), 401
+
+        g.jwt_identity = claims["sub"]
+        return await view(*args, **kwargs)
+
+    return wrapper
+
+
+def get_jwt_identity():
+    return g.jwt_identity
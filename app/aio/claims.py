@@ -0,0 +1,350 @@
+"""
+Async Claims API
+Async submit-final: same request, validation and response as the Flask route.
+No pool connection is held while images are saved and analysed; they are
+analysed concurrently and the rows are written in one short transaction.
+An upload_id attaches a resumable upload session as the Flask route does;
+waiting for its analyses polls the database without holding the loop.
+"""
+import asyncio
+import json
+import os
+import time
+from quart import Blueprint, current_app, jsonify, request
+from werkzeug.utils import secure_filename
+from app.cache import invalidate_user_cache
+from app.claim_submission import (
+    CLAIM_INSERT_SQL, PROPERTY_DETAILS_INSERT_SQL, CLAIM_IMAGE_INSERT_SQL, ASSESSMENT_INSERT_SQL,
+    CLAIM_VALUE_INSERT_SQL, CLAIM_ACTIVATE_SQL, analyze_claim_image, uploaded_file_analysis
+)
+from app.image_hash import (
+    IMAGE_HASHES_TABLE_SQL, IMAGE_HASHES_SINCE_SQL, CLAIM_IMAGE_IDS_SQL, IMAGE_HASH_INSERT_SQL,
+    index as image_hash_index, hash_rows, duplicate_report
+)
+from app.embeddings import store_embeddings
+from app.uploads import (
+    UPLOAD_SESSIONS_TABLE_SQL, UPLOAD_FILES_TABLE_SQL, UPLOAD_CHUNKS_TABLE_SQL, SESSION_FILES_SQL,
+    SESSION_CONSUME_SQL, MAX_WAIT_SECONDS, POLL_INTERVAL_SECONDS, UploadError
+)
+from app.data_version import USER_DATA_VERSION_TABLE_SQL, BUMP_DATA_VERSION_SQL
+from app.metrics import timed
+from app.user_stats import (
+    USER_STATS_TABLE_SQL, USER_STATS_DELTA_SQL, LATEST_CLAIM_VALUE_SQL, delta_args, value_change
+)
+from app.aio.auth import jwt_required, get_jwt_identity
+from app.aio.db import get_pool
+from app.aio.executors import run_blocking
+from app.aio.idempotency import idempotent
+
+claims_bp = Blueprint("aio_claims", __name__, url_prefix="/api/insurance")
+
+_tables_ready = False
+_hashes_table_ready = False
+_upload_tables_ready = False
+
+
+async def _refresh_summaries(cursor, user_id, **changes):
+    """Async counterpart of apply_user_stats_delta + bump_data_version"""
+    global _tables_ready
+    if not _tables_ready:
+        await cursor.execute(USER_STATS_TABLE_SQL)
+        await cursor.execute(USER_DATA_VERSION_TABLE_SQL)
+        _tables_ready = True
+    await cursor.execute(USER_STATS_DELTA_SQL, delta_args(user_id, **changes))
+    await cursor.execute(BUMP_DATA_VERSION_SQL, (user_id,))
+
+
+async def _refresh_image_hashes(cursor):
+    """Async counterpart of image_hash.refresh_index"""
+    global _hashes_table_ready
+    config = current_app.config
+    if not config.get("IMAGE_HASH_ENABLED", True):
+        return
+    if not _hashes_table_ready:
+        await cursor.execute(IMAGE_HASHES_TABLE_SQL)
+        _hashes_table_ready = True
+    args = image_hash_index.refresh_args(config.get("IMAGE_HASH_REBUILD_SECONDS", 300))
+    await cursor.execute(IMAGE_HASHES_SINCE_SQL, args)
+    image_hash_index.ingest(await cursor.fetchall(), full=args == (0,))
+
+
+async def _session_files(pool, upload_id):
+    """SESSION_FILES_SQL rows of an upload session, read in a transaction of their own"""
+    global _upload_tables_ready
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            if not _upload_tables_ready:
+                await cursor.execute(UPLOAD_SESSIONS_TABLE_SQL)
+                await cursor.execute(UPLOAD_FILES_TABLE_SQL)
+                await cursor.execute(UPLOAD_CHUNKS_TABLE_SQL)
+                _upload_tables_ready = True
+            await cursor.execute(SESSION_FILES_SQL, (upload_id,))
+            rows = await cursor.fetchall()
+        await conn.commit()
+    return rows
+
+
+async def _finalize_upload(pool, upload_id, username):
+    """
+    Async counterpart of uploads.finalize_session
+    Files still 'receiving' are refused rather than recovered, and analyses lost
+    with their worker are not restarted: POST /api/uploads/<id>/finalize on the
+    Flask app does both.
+    """
+    rows = await _session_files(pool, upload_id)
+    if not rows or rows[0]['username'] != username:
+        raise UploadError("Upload not found", 404)
+    if rows[0]['session_status'] == 'consumed':
+        raise UploadError("Upload is already attached to a claim", 409)
+    incomplete = [row['file_index'] for row in rows if row['status'] == 'receiving']
+    if incomplete:
+        raise UploadError(f"Files not fully received: {incomplete}", 409)
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("UPDATE upload_sessions SET status = 'finalized' WHERE id = %s AND status = 'open'", (upload_id,))
+        await conn.commit()
+
+    wait_seconds = current_app.config.get("UPLOAD_ANALYSIS_WAIT_SECONDS", 20)
+    deadline = time.monotonic() + min(wait_seconds, MAX_WAIT_SECONDS)
+    while any(row['status'] == 'analyzing' for row in rows) and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        rows = await _session_files(pool, upload_id)
+
+    files = []
+    for row in rows:
+        analysis = json.loads(row['analysis']) if row['analysis'] else None
+        files.append(dict(row, analysis=analysis))
+    return files, all(row['status'] != 'analyzing' for row in rows)
+
+
+@claims_bp.route("/claims/submit-final", methods=["POST"])
+@jwt_required
+@idempotent("claims_submit_final")
+async def submit_final_claim():
+    """Submit final claim with all steps data - creates claim record and adds property details, images, and analysis"""
+    user_identity = get_jwt_identity()
+    data = await request.form
+    files = await request.files
+
+    try:
+        # Step 1: Basic claim info
+        user_id = data.get('user_id')
+        insurance_code = data.get('insurance_code')
+        policy_number = data.get('policy_number')
+        claims_code = data.get('claims_code')
+        claim_details = data.get('claim_details', '')
+        time_of_loss = data.get('time_of_loss', '')
+        situation_of_loss = data.get('situation_of_loss', '')
+        cause_of_loss = data.get('cause_of_loss', '')
+
+        # Step 3: Property details
+        property_type = data.get('property_type')
+        wall_type = data.get('wall_type')
+        damage_area = float(data.get('damage_area', 0))
+        damage_length = float(data.get('damage_length', 0))
+        damage_breadth = float(data.get('damage_breadth', 0))
+        damage_height = float(data.get('damage_height', 1))
+        rate_per_sqft = float(data.get('rate_per_sqft', 350))
+
+        # Step 2: Get images (or a resumable upload session holding them)
+        images = files.getlist('images')
+        upload_id = data.get('upload_id')
+
+        # Step 4: Get manual overrides (if any)
+        manual_overrides = {}
+        if data.get('manual_overrides'):
+            try:
+                for override in json.loads(data['manual_overrides']):
+                    manual_overrides[override['image_index']] = override
+            except Exception as e:
+                current_app.logger.error(f"Error parsing manual overrides: {e}")
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    # Validation
+    if not claims_code:
+        return jsonify({"success": False, "error": "Claims code is required"}), 400
+    if not user_id:
+        return jsonify({"success": False, "error": "User ID is required"}), 400
+    if not insurance_code:
+        return jsonify({"success": False, "error": "Insurance code is required"}), 400
+    if not policy_number:
+        return jsonify({"success": False, "error": "Policy number is required"}), 400
+
+    pool = get_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # Verify user ownership
+                await cursor.execute("SELECT id FROM users WHERE username = %s", (user_identity,))
+                user_row = await cursor.fetchone()
+                if not user_row or str(user_row['id']) != str(user_id):
+                    return jsonify({"success": False, "error": "Unauthorized"}), 403
+
+                # Check if claim already exists
+                await cursor.execute("SELECT id, user_id FROM claims WHERE claims_code = %s", (claims_code,))
+                claim_row = await cursor.fetchone()
+
+                try:
+                    await _refresh_image_hashes(cursor)
+                except Exception as e:
+                    current_app.logger.warning(f"Could not refresh the image hash index: {e}")
+            await conn.commit()
+
+        if claim_row and str(claim_row['user_id']) != str(user_id):
+            return jsonify({"success": False, "error": "Unauthorized - claim belongs to another user"}), 403
+
+        uploaded_files = []
+        if upload_id:
+            try:
+                uploaded_files, done = await _finalize_upload(pool, upload_id, user_identity)
+            except UploadError as e:
+                return jsonify({"success": False, "error": str(e)}), e.status
+            if not done:
+                return jsonify({"success": False, "error": "Uploaded images are still being analyzed; retry shortly"}), 409
+
+        # Save every image, then analyse them concurrently on the executor
+        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'app/static/upload_image')
+        os.makedirs(upload_folder, exist_ok=True)
+
+        async def process(image_index, image_file):
+            filename = secure_filename(image_file.filename)
+            unique_filename = f"{int(time.time())}_{image_index}_{filename}"
+            filepath = os.path.join(upload_folder, unique_filename)
+            with timed("file_save"):
+                await image_file.save(filepath)
+            analysis = await run_blocking(
+                analyze_claim_image, filepath, manual_overrides.get(image_index), user_id
+            )
+            if analysis["is_override"]:
+                current_app.logger.info(f"Using manual override for image {image_index}: {analysis['ai_decision']}")
+            elif analysis.get("reused_from"):
+                current_app.logger.info(f"Image {image_index} matches image {analysis['reused_from']}; reusing its analysis")
+            return filename, unique_filename, analysis
+
+        async def process_uploaded(uploaded):
+            # Analyzed while it was received; only hashing is left
+            analysis = await run_blocking(
+                uploaded_file_analysis, uploaded, os.path.join(upload_folder, uploaded['stored_name']),
+                manual_overrides.get(uploaded['file_index'])
+            )
+            return uploaded['file_name'], uploaded['stored_name'], analysis
+
+        outcomes = await asyncio.gather(*(
+            process(image_index, image_file)
+            for image_index, image_file in enumerate(images)
+            if image_file and image_file.filename
+        ), *(process_uploaded(uploaded) for uploaded in uploaded_files), return_exceptions=True)
+
+        total_crack_area = 0
+        analysis_count = 0
+        total_confidence = 0
+        image_rows = []
+        fingerprints = {}
+        embeddings = {}
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                # Continue with other images
+                current_app.logger.error(f"Error processing image: {outcome}")
+                continue
+            filename, unique_filename, analysis = outcome
+            total_crack_area += analysis["crack_area"]
+            total_confidence += analysis["confidence"]
+            analysis_count += 1
+            crack_percent = analysis["crack_percent"]
+            non_crack_percent = analysis["non_crack_percent"]
+            ai_decision = analysis["ai_decision"]
+            image_rows.append((unique_filename, os.path.splitext(filename)[1], f"Uploaded: {filename}"))
+            if analysis["fingerprint"]:
+                fingerprints[unique_filename] = analysis["fingerprint"]
+            if analysis["embedding"] is not None:
+                embeddings[unique_filename] = analysis["embedding"]
+
+        # Calculate claim value
+        claim_recommended = damage_area * rate_per_sqft
+
+        # Write everything in one short transaction
+        async with pool.acquire() as conn:
+            try:
+                with timed("db.claim_write_transaction"):
+                    async with conn.cursor() as cursor:
+                        if upload_id:
+                            await cursor.execute(SESSION_CONSUME_SQL, (upload_id,))
+                            if cursor.rowcount != 1:
+                                raise UploadError("Upload is already attached to a claim", 409)
+
+                        if claim_row:
+                            claims_id = claim_row['id']
+                        else:
+                            await cursor.execute(CLAIM_INSERT_SQL, (
+                                user_id, claims_code, insurance_code, claim_details,
+                                time_of_loss, situation_of_loss, cause_of_loss, policy_number, user_id
+                            ))
+                            claims_id = cursor.lastrowid
+
+                        await cursor.execute(PROPERTY_DETAILS_INSERT_SQL, (
+                            claims_id, property_type, wall_type, damage_area,
+                            damage_length, damage_breadth, damage_height, rate_per_sqft
+                        ))
+                        claim_property_details_id = cursor.lastrowid
+
+                        image_ids = []
+                        if image_rows:
+                            await cursor.executemany(CLAIM_IMAGE_INSERT_SQL, [
+                                (claim_property_details_id, file_name, file_format, file_desc)
+                                for file_name, file_format, file_desc in image_rows
+                            ])
+                            if fingerprints or embeddings:
+                                await cursor.execute(CLAIM_IMAGE_IDS_SQL, (claim_property_details_id,))
+                                image_ids = await cursor.fetchall()
+                            hashes = hash_rows(image_ids, claims_id, fingerprints)
+                            if hashes:
+                                await cursor.executemany(IMAGE_HASH_INSERT_SQL, hashes)
+
+                        if analysis_count > 0:
+                            await cursor.execute(ASSESSMENT_INSERT_SQL, (
+                                claims_id, total_confidence / analysis_count,
+                                crack_percent, non_crack_percent, ai_decision
+                            ))
+
+                        await cursor.execute(LATEST_CLAIM_VALUE_SQL, (claims_id,))
+                        value_delta = value_change(await cursor.fetchone(), claim_recommended)
+                        await cursor.execute(CLAIM_VALUE_INSERT_SQL, (claims_id, claim_recommended))
+                        await cursor.execute(CLAIM_ACTIVATE_SQL, (claims_id,))
+                        await _refresh_summaries(
+                            cursor, user_id, claims=0 if claim_row else 1,
+                            pictures=len(image_rows), claim_value=value_delta
+                        )
+                    await conn.commit()
+            except UploadError as e:
+                await conn.rollback()
+                return jsonify({"success": False, "error": str(e)}), e.status
+            except Exception:
+                await conn.rollback()
+                raise
+
+        await run_blocking(invalidate_user_cache, user_identity)
+
+        try:
+            await run_blocking(store_embeddings, image_ids, embeddings)
+        except Exception as e:
+            current_app.logger.warning(f"Could not store image embeddings for claim {claims_code}: {e}")
+
+        # Matches name other users' claims, so they go to the adjusters' log, not to the submitter
+        possible_duplicates = duplicate_report(fingerprints, claims_id)
+        if possible_duplicates:
+            current_app.logger.warning(f"Claim {claims_code} has images matching other claims: {possible_duplicates}")
+
+        return jsonify({
+            "success": True,
+            "message": "Claim submitted successfully",
+            "claims_id": claims_id,
+            "claims_code": claims_code,
+            "claim_property_details_id": claim_property_details_id,
+            "total_claim_value": claim_recommended,
+            "images_processed": len(images) + len(uploaded_files)
+        }), 201
+
+    except Exception as e:
+        current_app.logger.exception("Error submitting final claim")
+        return jsonify({"success": False, "error": str(e)}), 500
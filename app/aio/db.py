@@ -0,0 +1,35 @@
+"""
+Async Database
+aiomysql connection pool for the ASGI app, opened when the server starts
+"""
+import aiomysql
+from quart import current_app
+
+
+def init_app(app):
+    @app.before_serving
+    async def _open_pool():
+        config = app.config
+        app.extensions["aiomysql_pool"] = await aiomysql.create_pool(
+            host=config["DB_HOST"],
+            user=config["DB_USER"],
+            password=config["DB_PASSWORD"],
+            db=config["DB_NAME"],
+            port=config["DB_PORT"],
+            charset='utf8mb4',
+            cursorclass=aiomysql.DictCursor,
+            minsize=config["ASYNC_DB_POOL_MIN"],
+            maxsize=config["ASYNC_DB_POOL_MAX"],
+            autocommit=False,
+        )
+
+    @app.after_serving
+    async def _close_pool():
+        pool = app.extensions.pop("aiomysql_pool", None)
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+
+
+def get_pool():
+    return current_app.extensions["aiomysql_pool"]
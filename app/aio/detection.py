@@ -0,0 +1,162 @@
+"""
+Async Detection API
+Same endpoints and responses as app/routes/api/detection_api.py
+"""
+import asyncio
+import io
+import os
+import time
+from quart import Blueprint, current_app, jsonify, request
+from werkzeug.utils import secure_filename
+from app.inference import classify_image, measure_crack
+from app.image_quality import quality_gate, rejection
+from app.metrics import timed
+from app.aio.executors import run_blocking
+
+detection_bp = Blueprint("aio_detection", __name__, url_prefix="/api/detection")
+
+
+def _crack_summary(crack_data):
+    ok = crack_data and crack_data.get('status') == 'success'
+    return {
+        "length_ft": crack_data.get('length_ft', 0) if ok else 0,
+        "width_ft": crack_data.get('width_ft', 0) if ok else 0,
+        "area_sqft": crack_data.get('crack_area', 0) if ok else 0
+    }
+
+
+async def _save_upload(image_file, base_name):
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    filepath = os.path.join(upload_folder, base_name)
+    with timed("file_save"):
+        await image_file.save(filepath)
+    return filepath
+
+
+async def _analyze_saved(filepath):
+    """Classification plus crack measurement; measurement failures are not fatal"""
+    prediction = await run_blocking(classify_image, filepath)
+    crack_data = None
+    processed_image_url = None
+    try:
+        crack_data = await run_blocking(measure_crack, filepath)
+        if crack_data and crack_data.get('status') == 'success' and crack_data.get('plot_path'):
+            processed_image_url = f"/static/upload_image/{os.path.basename(crack_data['plot_path'])}"
+    except Exception as crack_error:
+        current_app.logger.warning(f"Crack area calculation failed: {crack_error}")
+        crack_data = None
+    return prediction, crack_data, processed_image_url
+
+
+@detection_bp.route("/crack", methods=["POST"])
+async def detect_crack():
+    """Detect cracks in uploaded image using AI model"""
+    files = await request.files
+    if 'image' not in files:
+        return jsonify({"success": False, "error": "Image file missing"}), 400
+
+    image_file = files['image']
+    if image_file.filename == '':
+        return jsonify({"success": False, "error": "No file selected"}), 400
+
+    try:
+        image = io.BytesIO(image_file.read())
+        quality, rejected = await run_blocking(quality_gate, image)
+        if rejected:
+            return jsonify(rejection(quality)), 422
+
+        prediction = await run_blocking(classify_image, image)
+        return jsonify({
+            "success": True,
+            "predicted_class": prediction["predicted_class"],
+            "confidence": prediction["confidence"],
+            "probabilities": prediction["probabilities"],
+            "quality": quality
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@detection_bp.route("/crack-with-visualization", methods=["POST"])
+async def detect_crack_with_visualization():
+    """Detect cracks in uploaded image and generate visualization"""
+    files = await request.files
+    if 'image' not in files:
+        return jsonify({"success": False, "error": "Image file missing"}), 400
+
+    image_file = files['image']
+    if image_file.filename == '':
+        return jsonify({"success": False, "error": "No file selected"}), 400
+
+    try:
+        base_name = f"temp_{int(time.time())}_{secure_filename(image_file.filename)}"
+        filepath = await _save_upload(image_file, base_name)
+        quality, rejected = await run_blocking(quality_gate, filepath)
+        if rejected:
+            return jsonify(rejection(quality, original_image_url=f"/static/upload_image/{base_name}")), 422
+        prediction, crack_data, processed_image_url = await _analyze_saved(filepath)
+
+        return jsonify({
+            "success": True,
+            "predicted_class": prediction["predicted_class"],
+            "confidence": prediction["confidence"],
+            "probabilities": prediction["probabilities"],
+            "processed_image_url": processed_image_url,
+            "crack_data": _crack_summary(crack_data),
+            "original_image_url": f"/static/upload_image/{base_name}",
+            "quality": quality
+        }), 200
+    except Exception as e:
+        current_app.logger.exception("Error in crack detection with visualization")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@detection_bp.route("/batch-analyze", methods=["POST"])
+async def batch_analyze_images():
+    """Analyze multiple images concurrently and return instant reports"""
+    files = await request.files
+    if 'images' not in files:
+        return jsonify({"success": False, "error": "No images provided"}), 400
+
+    images = files.getlist('images')
+    if not images:
+        return jsonify({"success": False, "error": "No images selected"}), 400
+
+    timestamp = int(time.time())
+
+    async def analyze(idx, image_file):
+        filename = secure_filename(image_file.filename)
+        try:
+            base_name = f"batch_{timestamp}_{idx}_{filename}"
+            filepath = await _save_upload(image_file, base_name)
+            quality, rejected = await run_blocking(quality_gate, filepath)
+            if rejected:
+                return rejection(quality, filename=filename)
+            prediction, crack_data, processed_image_url = await _analyze_saved(filepath)
+            return {
+                "success": True,
+                "filename": filename,
+                "predicted_class": prediction["predicted_class"],
+                "confidence": prediction["confidence"],
+                "probabilities": prediction["probabilities"],
+                "crack_detected": prediction["class_index"] == 1,
+                "processed_image_url": processed_image_url,
+                "crack_data": _crack_summary(crack_data),
+                "original_image_url": f"/static/upload_image/{base_name}",
+                "quality": quality
+            }
+        except Exception as e:
+            current_app.logger.exception(f"Error processing image {idx}")
+            return {"success": False, "filename": image_file.filename, "error": str(e)}
+
+    results = await asyncio.gather(*(
+        analyze(idx, image_file) for idx, image_file in enumerate(images) if image_file.filename != ''
+    ))
+
+    return jsonify({
+        "success": True,
+        "total_images": len(images),
+        "processed_images": len(results),
+        "results": list(results)
+    }), 200
@@ -0,0 +1,29 @@
+"""
+Executors
+Blocking work (model inference, OpenCV, cache/revocation backends) runs on a
+bounded thread pool so the event loop keeps serving other connections. torch
+and OpenCV release the GIL, and threads share the one loaded model.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from quart import current_app
+from app.topology import available_cpus
+
+
+def init_app(app):
+    app.extensions["blocking_executor"] = ThreadPoolExecutor(
+        max_workers=app.config["ASYNC_BLOCKING_WORKERS"] or available_cpus(),
+        thread_name_prefix="aio-blocking",
+    )
+
+    @app.after_serving
+    async def _shutdown_executor():
+        app.extensions["blocking_executor"].shutdown(wait=False)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the app's executor and await its result"""
+    loop = asyncio.get_running_loop()
+    executor = current_app.extensions["blocking_executor"]
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
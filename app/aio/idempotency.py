@@ -0,0 +1,106 @@
+"""
+Async Idempotent Requests
+Idempotency-Key handling for the ASGI app; same table, SQL and responses as
+app/idempotency.py, with the waiting done on the event loop
+"""
+import asyncio
+import time
+from functools import wraps
+from quart import current_app, jsonify, make_response, request
+from app.idempotency import (
+    IDEMPOTENCY_HEADER, POLL_INTERVAL_SECONDS, MISMATCH_ERROR,
+    IDEMPOTENCY_TABLE_SQL, IDEMPOTENCY_PURGE_SQL, IDEMPOTENCY_CLAIM_SQL, IDEMPOTENCY_LOOKUP_SQL,
+    IDEMPOTENCY_TAKEOVER_SQL, IDEMPOTENCY_COMPLETE_SQL, IDEMPOTENCY_RELEASE_SQL,
+    request_fingerprint, check_key, existing_outcome, replayed_response, in_progress_response, storable
+)
+from app.aio.auth import get_jwt_identity
+from app.aio.db import get_pool
+
+_table_ready = False
+
+
+async def _begin(scope, fingerprint):
+    """Claim the key; None if the view should run, otherwise the response to send"""
+    global _table_ready
+    config = current_app.config
+    deadline = time.monotonic() + config.get("IDEMPOTENCY_WAIT_SECONDS", 60)
+    async with get_pool().acquire() as conn:
+        async with conn.cursor() as cursor:
+            if not _table_ready:
+                await cursor.execute(IDEMPOTENCY_TABLE_SQL)
+                _table_ready = True
+            await cursor.execute(IDEMPOTENCY_PURGE_SQL, (config.get("IDEMPOTENCY_TTL_HOURS", 24),))
+            while True:
+                await cursor.execute(IDEMPOTENCY_CLAIM_SQL, (*scope, fingerprint))
+                await conn.commit()
+                if cursor.rowcount == 1:
+                    return None
+
+                await cursor.execute(IDEMPOTENCY_LOOKUP_SQL, scope)
+                row = await cursor.fetchone()
+                await conn.commit()
+                if row is None:
+                    continue
+
+                outcome = existing_outcome(row, fingerprint)
+                if outcome == "mismatch":
+                    return jsonify({"success": False, "error": MISMATCH_ERROR}), 422
+                if outcome == "completed":
+                    return replayed_response(row, current_app.response_class)
+
+                await cursor.execute(IDEMPOTENCY_TAKEOVER_SQL, (
+                    *scope, fingerprint, config.get("IDEMPOTENCY_LOCK_SECONDS", 600)
+                ))
+                await conn.commit()
+                if cursor.rowcount == 1:
+                    return None
+
+                if time.monotonic() >= deadline:
+                    return in_progress_response(current_app.response_class)
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def _finish(scope, status, body):
+    async with get_pool().acquire() as conn:
+        async with conn.cursor() as cursor:
+            if body is None:
+                await cursor.execute(IDEMPOTENCY_RELEASE_SQL, scope)
+            else:
+                await cursor.execute(IDEMPOTENCY_COMPLETE_SQL, (status, body, *scope))
+        await conn.commit()
+
+
+def idempotent(endpoint):
+    """Async counterpart of app.idempotency.idempotent; place under @jwt_required"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return await view(*args, **kwargs)
+            error = check_key(key)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+
+            scope = (get_jwt_identity(), endpoint, key)
+            fingerprint = request_fingerprint(await request.form, await request.files)
+            early = await _begin(scope, fingerprint)
+            if early is not None:
+                return early
+
+            try:
+                response = await make_response(await view(*args, **kwargs))
+            except Exception:
+                await _finish(scope, None, None)
+                raise
+
+            try:
+                if storable(response):
+                    await _finish(scope, response.status_code, await response.get_data(as_text=True))
+                else:
+                    await _finish(scope, None, None)
+            except Exception as e:
+                current_app.logger.warning(f"Could not record idempotent response: {e}")
+            return response
+        return wrapper
+    return decorator
@@ -1,2 +1,203 @@
 # app/blocklist.py
-BLOCKLIST = set()
+"""
+JWT Revocation Store
+Revoked token ids (jti) are kept in a store shared by every worker and
+expire together with the token's own exp claim.
+
+Backends:
+- "sqlite": a local SQLite file, for single-host deployments (default)
+- "redis":  any Redis-compatible server, for clusters
+
+Each worker keeps a bloom filter of revoked jtis, synced from the shared
+store at most every REVOCATION_SYNC_INTERVAL seconds. A bloom miss means the
+token is not revoked; a hit is confirmed against the store. Only unexpired
+revocations are loaded; when the filter fills up it is rebuilt from them,
+sized for at least twice the live count so it does not refill at once.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+class BloomFilter:
+    """Fixed-size bloom filter sized for a capacity and false-positive rate"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SQLiteRevocationBackend:
+    """Revocations in a local SQLite file shared by all workers on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                jti TEXT NOT NULL UNIQUE,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_revoked_expires ON revoked_tokens (expires_at)")
+        conn.commit()
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, jti, expires_at):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+            (jti, expires_at)
+        )
+        conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    def contains(self, jti):
+        row = self._connect().execute(
+            "SELECT 1 FROM revoked_tokens WHERE jti = ? AND expires_at > ?",
+            (jti, time.time())
+        ).fetchone()
+        return row is not None
+
+    def changes_since(self, position):
+        """Active jtis added after position, and the new position"""
+        rows = self._connect().execute(
+            "SELECT seq, jti FROM revoked_tokens WHERE seq > ? AND expires_at > ? ORDER BY seq",
+            (position or 0, time.time())
+        ).fetchall()
+        if not rows:
+            return [], position
+        return [jti for _, jti in rows], rows[-1][0]
+
+
+class RedisRevocationBackend:
+    """Revocations in a Redis-compatible server shared by the whole cluster"""
+
+    STREAM_KEY = "revoked:stream"
+
+    def __init__(self, url, max_token_seconds):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.max_token_seconds = max_token_seconds
+
+    def add(self, jti, expires_at):
+        expires_at = int(math.ceil(expires_at))
+        # Stream ids are insertion times; no token outlives max_token_seconds, so older entries are all expired
+        min_id = int((time.time() - self.max_token_seconds) * 1000)
+        pipe = self._client.pipeline()
+        pipe.set(f"revoked:{jti}", 1, exat=expires_at)
+        pipe.xadd(self.STREAM_KEY, {"jti": jti, "exp": expires_at}, minid=min_id, approximate=True)
+        pipe.execute()
+
+    def contains(self, jti):
+        return bool(self._client.exists(f"revoked:{jti}"))
+
+    def changes_since(self, position):
+        start = f"({position.decode() if isinstance(position, bytes) else position}" if position else "-"
+        entries = self._client.xrange(self.STREAM_KEY, min=start, max="+")
+        if not entries:
+            return [], position
+        now = time.time()
+        jtis = [
+            fields[b"jti"].decode("utf-8") for _, fields in entries
+            if float(fields.get(b"exp", now + 1)) > now
+        ]
+        return jtis, entries[-1][0]
+
+
+class TokenBlocklist:
+    """Shared, expiring JWT revocation store with a local bloom-filter fast path"""
+
+    def __init__(self):
+        self.backend = None
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._position = None
+        self._last_sync = 0.0
+
+    def init_app(self, app):
+        config = app.config
+        if config.get("REVOCATION_BACKEND") == "redis":
+            max_token_seconds = max(
+                config.get("ACCESS_TOKEN_EXPIRE_MINUTES", 60) * 60,
+                config.get("REFRESH_TOKEN_EXPIRE_DAYS", 14) * 86400,
+            )
+            self.backend = RedisRevocationBackend(config["REVOCATION_REDIS_URL"], max_token_seconds)
+        else:
+            self.backend = SQLiteRevocationBackend(config["REVOCATION_SQLITE_PATH"])
+        self.sync_interval = config.get("REVOCATION_SYNC_INTERVAL", 1.0)
+        self.bloom_capacity = config.get("REVOCATION_BLOOM_CAPACITY", 100000)
+        self.bloom_error_rate = config.get("REVOCATION_BLOOM_ERROR_RATE", 0.001)
+        self._rebuild()
+
+    def _rebuild(self):
+        # Start a fresh filter from the active entries, dropping expired ones
+        jtis, position = self.backend.changes_since(None)
+        bloom = BloomFilter(max(self.bloom_capacity, 2 * len(jtis)), self.bloom_error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom, self._position = bloom, position
+        self._last_sync = time.monotonic()
+
+    def _sync(self):
+        if time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            if self._bloom.count >= self._bloom.capacity:
+                self._rebuild()
+                return
+            jtis, self._position = self.backend.changes_since(self._position)
+            for jti in jtis:
+                self._bloom.add(jti)
+            self._last_sync = time.monotonic()
+
+    def add(self, jti, expires_at):
+        """Revoke a token until its exp (unix timestamp)"""
+        self.backend.add(jti, expires_at)
+        with self._lock:
+            self._bloom.add(jti)
+
+    def __contains__(self, jti):
+        self._sync()
+        if jti not in self._bloom:
+            return False
+        return self.backend.contains(jti)
+
+
+BLOCKLIST = TokenBlocklist()
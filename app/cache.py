@@ -0,0 +1,241 @@
+"""
+Response Cache
+Short-TTL, per-user cache for read-mostly JSON endpoints
+
+Per-user entries are keyed by the user's data version from the database
+(app/data_version.py), the same counter the ETags use. Write paths bump it in
+their own transaction, so a committed write invalidates the user's entries in
+every worker at once and no key needs scanning. The "public" scope (lookups
+shared by all users) has no database version; it uses a counter kept in the
+cache backend instead.
+
+Backends:
+- "memory": in-process LRU (default, per worker)
+- "redis":  any Redis-compatible server (Redis, Valkey, KeyDB...), shared by all workers
+
+With several workers the memory backend still invalidates per-user entries
+everywhere (the version comes from the database), but each worker holds its
+own copy, and a write to public-scope data is only seen by other workers once
+their entries expire after the TTL. Use "redis" for one shared copy and
+immediate public invalidation; init_app warns when that applies.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request, make_response
+from flask_jwt_extended import get_jwt_identity
+from app.config import current_config
+from app.metrics import CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_SCOPE = "public"
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, scope):
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def bump_version(self, scope):
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+            return self._versions[scope]
+
+
+class RedisCacheBackend:
+    """Cache stored in a Redis-compatible server so all workers share it"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def get_version(self, scope):
+        value = self._client.get(f"ver:{scope}")
+        return int(value) if value is not None else 0
+
+    def bump_version(self, scope):
+        return int(self._client.incr(f"ver:{scope}"))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache backend, creating it from config on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = current_config()
+                if config.get("CACHE_BACKEND") == "redis":
+                    _backend = RedisCacheBackend(config["CACHE_REDIS_URL"])
+                else:
+                    _backend = MemoryCacheBackend(config.get("CACHE_MAX_ENTRIES", 1024))
+    return _backend
+
+
+def init_app(app):
+    """Warn when the per-worker memory backend runs under several workers"""
+    if (app.config.get("CACHE_ENABLED", True) and app.config.get("CACHE_BACKEND") != "redis"
+            and app.config.get("WEB_CONCURRENCY", 0) > 1):
+        app.logger.warning(
+            "CACHE_BACKEND=memory with %s workers: each worker caches its own copy and public-scope "
+            "entries may be up to CACHE_DEFAULT_TTL seconds stale after a write; set CACHE_BACKEND=redis "
+            "to share one cache", app.config["WEB_CONCURRENCY"]
+        )
+
+
+def get_data_version(scope):
+    """Current data version for a cache scope"""
+    try:
+        return get_cache().get_version(scope)
+    except Exception as e:
+        logger.warning(f"Cache version lookup failed: {e}")
+        return 0
+
+
+def invalidate_user_cache(username, public=False):
+    """
+    Drop cached responses for a user by bumping their data version
+    Call after the write has been committed
+    """
+    try:
+        cache = get_cache()
+        if username:
+            cache.bump_version(username)
+            mark_recent_write(username)
+        if public:
+            cache.bump_version(PUBLIC_SCOPE)
+    except Exception as e:
+        logger.warning(f"Cache invalidation failed: {e}")
+
+
+def mark_recent_write(username):
+    """
+    Keep a user's reads on the primary for DB_STICKY_SECONDS after a write
+    (read-your-writes while replicas catch up; only used with DB_REPLICA_URLS)
+    """
+    config = current_config()
+    if not config.get("DB_REPLICA_URLS") or not username:
+        return
+    get_cache().set(f"sticky:{username}", "1", config.get("DB_STICKY_SECONDS", 5))
+
+
+def wrote_recently(username):
+    """Whether the user wrote within the stickiness window"""
+    if not username:
+        return False
+    try:
+        return get_cache().get(f"sticky:{username}") is not None
+    except Exception as e:
+        logger.warning(f"Sticky-write lookup failed: {e}")
+        return True
+
+
+def invalidate_user_cache_by_id(cursor, user_id, public=False):
+    """Look up the username for a user id and invalidate their cached responses"""
+    cursor.execute("SELECT username FROM users WHERE id = %s", (user_id,))
+    row = cursor.fetchone()
+    invalidate_user_cache(row['username'] if row else None, public=public)
+
+
+def invalidate_claim_owner_cache(cursor, claims_id):
+    """Invalidate cached responses for the owner of a claim"""
+    cursor.execute(
+        "SELECT u.username FROM claims c JOIN users u ON c.user_id = u.id WHERE c.id = %s",
+        (claims_id,)
+    )
+    row = cursor.fetchone()
+    invalidate_user_cache(row['username'] if row else None)
+
+
+def cached_response(namespace, ttl=None, scope=None):
+    """
+    Cache successful JSON responses of a view for a short TTL
+    Entries are keyed by the caller's identity and database data version
+    (or the given scope and its cache-backend counter) and the query string
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("CACHE_ENABLED", True):
+                return view(*args, **kwargs)
+
+            cache_scope = scope or get_jwt_identity()
+            try:
+                cache = get_cache()
+                if scope:
+                    version = f"c{cache.get_version(cache_scope)}"
+                else:
+                    version = g.get("data_version")
+                    if version is None:
+                        from app.data_version import get_user_data_version
+                        version = get_user_data_version(cache_scope)
+                    if version is None:
+                        return view(*args, **kwargs)
+                    version = f"d{version}"
+                key = f"resp:{namespace}:{cache_scope}:{version}:{request.query_string.decode('utf-8')}"
+                body = cache.get(key)
+            except Exception as e:
+                current_app.logger.warning(f"Cache lookup failed: {e}")
+                return view(*args, **kwargs)
+
+            if body is not None:
+                CACHE_EVENTS.labels(result="hit").inc()
+                response = current_app.response_class(body, status=200, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            CACHE_EVENTS.labels(result="miss").inc()
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                try:
+                    cache.set(
+                        key,
+                        response.get_data(as_text=True),
+                        ttl or current_app.config.get("CACHE_DEFAULT_TTL", 30)
+                    )
+                except Exception as e:
+                    current_app.logger.warning(f"Cache store failed: {e}")
+                response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
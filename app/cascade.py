@@ -0,0 +1,232 @@
+"""
+Model Cascade
+Cheap first stage in front of CrackClassifier.
+
+With CASCADE_ENABLED, every image is first scored by its Canny edge density:
+the share of edge pixels in a blurred 256 px grayscale thumbnail (JPEG draft
+decode, OpenCV, about a millisecond once decoded). Plain walls score near
+zero and clearly cracked ones high:
+- density <= CASCADE_NO_CRACK_MAX   answered "no crack" without the model
+- density >= CASCADE_CRACK_MIN      answered "crack" without the model
+- anything in between               escalated to CrackClassifier
+
+A first-stage answer carries "stage": "edge_density" and a confidence from a
+logistic over the density (90% at either threshold, more beyond it), not the
+model's softmax. Requests that ask for the embedding always escalate, since
+only the model computes it.
+
+Thresholds depend on camera and wall type; measure them on labeled images:
+
+    python -m app.cascade data/labeled                  # crack/ and no_crack/ subfolders
+    python -m app.cascade data/labeled --no-crack-max 0.004 --crack-min 0.06 --output cascade.json
+
+The report gives the escalation rate, accuracy of the cascade against the
+model alone, and the throughput gain from skipping the model.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+from app.config import current_config
+from app.metrics import CASCADE_DECISIONS, timed
+
+SCORE_SIZE = 256
+CANNY_LOW = 50
+CANNY_HIGH = 150
+# Logistic scale: probability 0.9 / 0.1 at the thresholds
+THRESHOLD_ODDS = math.log(9)
+
+POSITIVE_DIRS = {"crack", "cracked", "positive"}
+NEGATIVE_DIRS = {"no_crack", "non_crack", "clean", "negative"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def edge_density(source):
+    """Share of Canny edge pixels in a blurred thumbnail of an image (path, bytes or file-like)"""
+    import cv2
+    import numpy as np
+    from PIL import Image
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with Image.open(source) as image:
+            image.draft("L", (SCORE_SIZE, SCORE_SIZE))
+            gray = image.convert("L")
+            gray.thumbnail((SCORE_SIZE, SCORE_SIZE))
+            pixels = np.asarray(gray, dtype=np.uint8)
+    finally:
+        if position is not None:
+            source.seek(position)
+    # The blur removes surface texture so only strong lines (cracks, joints, edges) remain
+    edges = cv2.Canny(cv2.GaussianBlur(pixels, (5, 5), 0), CANNY_LOW, CANNY_HIGH)
+    return cv2.countNonZero(edges) / edges.size
+
+
+def thresholds():
+    """(no_crack_max, crack_min) from the configuration"""
+    config = current_config()
+    return config.get("CASCADE_NO_CRACK_MAX", 0.002), config.get("CASCADE_CRACK_MIN", 0.03)
+
+
+def decide(density, no_crack_max, crack_min, labels):
+    """
+    First-stage prediction for an edge density, or None to escalate
+    labels: CrackClassifier.CLASS_LABELS
+    """
+    if no_crack_max < density < crack_min:
+        return None
+    midpoint = (no_crack_max + crack_min) / 2
+    scale = max(crack_min - midpoint, 1e-9) / THRESHOLD_ODDS
+    crack_probability = 1 / (1 + math.exp(-max(min((density - midpoint) / scale, 50), -50)))
+    probabilities = [1 - crack_probability, crack_probability]
+    index = 1 if density >= crack_min else 0
+    return {
+        "class_index": index,
+        "predicted_class": labels[index],
+        "confidence": round(probabilities[index] * 100, 2),
+        "probabilities": {labels[i]: round(p * 100, 2) for i, p in enumerate(probabilities)},
+        "stage": "edge_density",
+        "edge_density": round(density, 5),
+    }
+
+
+def first_stage(source, labels):
+    """
+    Cascade answer for an image, or None when the cascade is off or the image needs the model
+    Unreadable images are escalated so the model reports the error
+    """
+    if not current_config().get("CASCADE_ENABLED", False):
+        return None
+    try:
+        with timed("cascade_first_stage"):
+            density = edge_density(source)
+    except Exception:
+        CASCADE_DECISIONS.labels(outcome="escalated").inc()
+        return None
+    result = decide(density, *thresholds(), labels)
+    CASCADE_DECISIONS.labels(
+        outcome="escalated" if result is None else f"edge_{'crack' if result['class_index'] else 'no_crack'}"
+    ).inc()
+    return result
+
+
+def labeled_images(folder):
+    """[(path, class_index)] for the images under crack/ and no_crack/ style subfolders"""
+    images = []
+    for entry in sorted(os.listdir(folder)):
+        name = entry.lower()
+        if name in POSITIVE_DIRS:
+            label = 1
+        elif name in NEGATIVE_DIRS:
+            label = 0
+        else:
+            continue
+        for root, _, files in os.walk(os.path.join(folder, entry)):
+            images.extend(
+                (os.path.join(root, f), label) for f in sorted(files)
+                if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS
+            )
+    return images
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        f"p{pct}": round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 5)
+        for pct in (5, 50, 95)
+    }
+
+
+def evaluate(images, backend, no_crack_max, crack_min):
+    """
+    Run both stages on every labeled image and summarise the cascade
+    Every image also goes through the model, for the accuracy comparison and
+    the model-only timing; the cascade's cost per image is its first-stage
+    time plus the model time of the images it escalates
+    """
+    labels = backend.classifier.CLASS_LABELS
+    rows = []
+    for path, label in images:
+        start = time.perf_counter()
+        density = edge_density(path)
+        decided = decide(density, no_crack_max, crack_min, labels)
+        first_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        model_index = backend.predict([backend.preprocess(path)])[0]["class_index"]
+        model_ms = (time.perf_counter() - start) * 1000
+        rows.append({
+            "label": label, "density": density, "model": model_index,
+            "cascade": decided["class_index"] if decided else model_index, "escalated": decided is None,
+            "first_ms": first_ms, "model_ms": model_ms,
+        })
+
+    total = len(rows)
+    if not total:
+        return {"images": 0}
+    escalated = sum(row["escalated"] for row in rows)
+    decided_rows = [row for row in rows if not row["escalated"]]
+    model_ms = sum(row["model_ms"] for row in rows)
+    cascade_ms = sum(row["first_ms"] + (row["model_ms"] if row["escalated"] else 0) for row in rows)
+    return {
+        "images": total,
+        "thresholds": {"no_crack_max": no_crack_max, "crack_min": crack_min},
+        "escalation_rate": round(escalated / total, 4),
+        "model_accuracy": round(sum(row["model"] == row["label"] for row in rows) / total, 4),
+        "cascade_accuracy": round(sum(row["cascade"] == row["label"] for row in rows) / total, 4),
+        "first_stage_errors": sum(row["cascade"] != row["label"] for row in decided_rows),
+        "first_stage_disagreements": sum(row["cascade"] != row["model"] for row in decided_rows),
+        "first_stage_ms": round(sum(row["first_ms"] for row in rows) / total, 3),
+        "model_ms": round(model_ms / total, 3),
+        "cascade_ms": round(cascade_ms / total, 3),
+        "throughput_gain": round(model_ms / cascade_ms, 3) if cascade_ms else None,
+        "edge_density": {
+            "crack": _percentiles([row["density"] for row in rows if row["label"] == 1]),
+            "no_crack": _percentiles([row["density"] for row in rows if row["label"] == 0]),
+        },
+    }
+
+
+def main():
+    no_crack_max, crack_min = thresholds()
+    parser = argparse.ArgumentParser(description="Evaluate the edge-density cascade on a labeled image folder")
+    parser.add_argument("folder", help="folder with crack/ (or positive/) and no_crack/ (or negative/) subfolders")
+    parser.add_argument("--no-crack-max", type=float, default=no_crack_max)
+    parser.add_argument("--crack-min", type=float, default=crack_min)
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    images = labeled_images(args.folder)
+    if not images:
+        print(f"[FAIL] No labeled images under {args.folder}")
+        return 1
+    from app.inference import LocalBackend
+    backend = LocalBackend()
+    backend.warmup()
+
+    print(f"[*] Evaluating cascade on {len(images)} images")
+    report = evaluate(images, backend, args.no_crack_max, args.crack_min)
+    print(f"  Escalation rate       {report['escalation_rate']:.1%}")
+    print(f"  Model accuracy        {report['model_accuracy']:.1%}")
+    print(f"  Cascade accuracy      {report['cascade_accuracy']:.1%}"
+          f"  ({report['first_stage_errors']} first-stage errors)")
+    print(f"  Per image             first stage {report['first_stage_ms']:.2f} ms, model {report['model_ms']:.2f} ms,"
+          f" cascade {report['cascade_ms']:.2f} ms")
+    print(f"  Throughput gain       {report['throughput_gain']:.2f}x")
+    for name, spread in report["edge_density"].items():
+        if spread:
+            print(f"  Edge density {name:9} p5 {spread['p5']:.5f}  p50 {spread['p50']:.5f}  p95 {spread['p95']:.5f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[*] Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Claim Submission
+SQL and per-image analysis shared by the WSGI and ASGI submit-final endpoints
+"""
+import logging
+from app.embeddings import get_store
+from app.image_hash import REUSABLE_FIELDS, fingerprint_image
+from app.image_quality import quality_gate
+from app.inference import classify_image, measure_crack
+
+logger = logging.getLogger(__name__)
+
+CLAIM_INSERT_SQL = """
+    INSERT INTO claims
+    (user_id, claims_code, insurance_id, claim_details, time_of_loss,
+     situation_of_loss, cause_of_loss, policy_number, is_active, status, created_by)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1, 'inactive', %s)
+"""
+
+PROPERTY_DETAILS_INSERT_SQL = """
+    INSERT INTO claim_property_details
+    (claims_id, property_type, wall_type, damage_area, damage_length,
+     damage_breadth, damage_height, rate_per_sqft, is_active, status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1, 'active')
+"""
+
+CLAIM_IMAGE_INSERT_SQL = """
+    INSERT INTO claim_property_image
+    (claim_property_details_id, file_name, file_format, file_desc)
+    VALUES (%s, %s, %s, %s)
+"""
+
+ASSESSMENT_INSERT_SQL = """
+    INSERT INTO claim_property_assessment
+    (claims_id, confidence, crack_percent, non_crack_percent, ai_decision)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+CLAIM_VALUE_INSERT_SQL = """
+    INSERT INTO claims_value
+    (claims_id, claim_recommended)
+    VALUES (%s, %s)
+"""
+
+CLAIM_ACTIVATE_SQL = "UPDATE claims SET status = 'active' WHERE id = %s"
+
+
+def override_analysis(override_data):
+    """Claim figures from a manual override made in the review step"""
+    confidence = override_data.get('confidence', 0)
+    # Set crack percentages based on decision
+    if override_data.get('crack_detected'):
+        crack_percent = confidence
+        non_crack_percent = 100 - confidence
+    else:
+        crack_percent = 0
+        non_crack_percent = confidence
+    return {
+        "confidence": confidence,
+        "crack_percent": crack_percent,
+        "non_crack_percent": non_crack_percent,
+        "ai_decision": override_data.get('ai_decision', 'Unknown'),
+        "crack_area": override_data.get('area_sqft', 0),
+        "crack_length": override_data.get('length_ft', 0),
+        "crack_width": override_data.get('width_ft', 0),
+        "is_override": True,
+    }
+
+
+def prediction_analysis(prediction, image_response):
+    """Claim figures from a classify_image prediction and a measure_crack result"""
+    prediction = prediction or {}
+    probabilities = prediction.get("probabilities", {})
+    return {
+        "confidence": prediction.get("confidence", 0),
+        "crack_percent": probabilities.get("Positive (Crack Detected)", 0),
+        "non_crack_percent": probabilities.get("Negative (No Crack)", 0),
+        "ai_decision": prediction.get("predicted_class", "Unknown"),
+        "crack_area": image_response.get('crack_area', 0),
+        "crack_length": image_response.get('length_ft', 0),
+        "crack_width": image_response.get('width_ft', 0),
+        "is_override": False,
+    }
+
+
+def analyze_claim_image(filepath, override_data=None, user_id=None):
+    """
+    Crack classification and measurement for one saved claim image
+    A manual override from the review step replaces the AI figures entirely;
+    an identical copy of one of user_id's already analysed images reuses that
+    image's analysis (near-duplicates and other users' images are only
+    reported, see ImageFingerprint.duplicates).
+    The result's "fingerprint" and "embedding" (None when unavailable) are
+    stored with the image once it has an id.
+    """
+    fingerprint = fingerprint_image(filepath)
+    if override_data and override_data.get('is_override'):
+        analysis = override_analysis(override_data)
+        analysis.update(fingerprint=fingerprint, embedding=None)
+        return analysis
+
+    store = get_store()
+    match = fingerprint.reusable(user_id) if fingerprint and user_id is not None else None
+    prediction = None
+    if match:
+        analysis = dict(match.analysis, is_override=False, reused_from=match.image_id)
+        embedding = store.vector(match.image_id) if store else None
+    else:
+        # Claims are never rejected on quality; the reasons are left for the adjuster
+        quality, _ = quality_gate(filepath)
+        if quality and not quality["passed"]:
+            logger.warning(f"Claim image {filepath} failed the quality check: {quality['reasons']}")
+        # A failed classification still counts the image, with zero confidence
+        try:
+            prediction = classify_image(filepath, with_embedding=store is not None)
+        except Exception as e:
+            logger.error(f"Crack classification failed for {filepath}: {e}")
+            prediction = {}
+        embedding = prediction.pop("embedding", None)
+        analysis = prediction_analysis(prediction, measure_crack(filepath))
+
+    # Only a successful classification is kept for reuse
+    if fingerprint and (match or prediction):
+        fingerprint.analysis = {field: analysis[field] for field in REUSABLE_FIELDS}
+    analysis.update(fingerprint=fingerprint, embedding=embedding)
+    return analysis
+
+
+def uploaded_file_analysis(uploaded, filepath, override_data=None):
+    """
+    analyze_claim_image for a file of a finalized upload session
+    The file was analyzed while it was being received; uploaded is one file of
+    finalize_session's result and filepath its stored file.
+    """
+    stored_analysis = uploaded['analysis'] or {}
+    prediction = stored_analysis.get('prediction')
+    if override_data and override_data.get('is_override'):
+        analysis = override_analysis(override_data)
+    else:
+        # As for images sent with the claim: a failed analysis counts with zero confidence
+        # and photo quality never drops an image
+        quality = stored_analysis.get('quality')
+        if quality and not quality['passed']:
+            logger.warning(f"Claim image {uploaded['file_name']} failed the quality check: {quality['reasons']}")
+        if not prediction:
+            logger.error(f"Error processing image {uploaded['file_name']}: {stored_analysis.get('error')}")
+        analysis = prediction_analysis(prediction, stored_analysis.get('crack_data') or {})
+    fingerprint = fingerprint_image(filepath)
+    if fingerprint and not analysis["is_override"]:
+        fingerprint.analysis = {field: analysis[field] for field in REUSABLE_FIELDS}
+    analysis.update(fingerprint=fingerprint, embedding=(prediction or {}).get('embedding'))
+    return analysis
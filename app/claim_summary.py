@@ -0,0 +1,73 @@
+"""
+Claim Summary
+SQL fragments that keep claim queries at one row per claim.
+
+A claim can have several property-details, assessment and value rows (one per
+submission) and any number of images. Joining those tables directly multiplies
+the rows; instead the latest details/assessment/value row is joined by id and
+the images are aggregated per claim into a JSON array, which nest_images()
+turns into a list.
+"""
+import json
+
+LATEST_DETAILS_JOIN = """claim_property_details cpd
+                    ON cpd.id = (SELECT MAX(id) FROM claim_property_details WHERE claims_id = c.id)"""
+
+LATEST_ASSESSMENT_JOIN = """claim_property_assessment cpa
+                    ON cpa.id = (SELECT MAX(id) FROM claim_property_assessment WHERE claims_id = c.id)"""
+
+LATEST_VALUE_JOIN = """claims_value cv
+                    ON cv.id = (SELECT MAX(id) FROM claims_value WHERE claims_id = c.id)"""
+
+# Correlated per claim, so only evaluated for the rows actually returned
+CLAIM_IMAGES_SQL = """(
+                        SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                            'id', img.id, 'file_name', img.file_name, 'file_format', img.file_format
+                        ))
+                        FROM claim_property_image img
+                        INNER JOIN claim_property_details img_cpd ON img_cpd.id = img.claim_property_details_id
+                        WHERE img_cpd.claims_id = c.id
+                    )"""
+
+FIRST_IMAGE_SQL = """(
+                        SELECT img.file_name
+                        FROM claim_property_image img
+                        INNER JOIN claim_property_details img_cpd ON img_cpd.id = img.claim_property_details_id
+                        WHERE img_cpd.claims_id = c.id
+                        ORDER BY img.id
+                        LIMIT 1
+                    )"""
+
+
+DAMAGE_CALCULATION_SQL = f"""
+                SELECT 
+                    u.name,
+                    c.insurance_id AS insurance_id,
+                    c.policy_number AS policy_number,
+                    c.claims_code AS claim_id,
+                    {FIRST_IMAGE_SQL} AS file_name,
+                    {CLAIM_IMAGES_SQL} AS images,
+                    cpa.ai_decision,
+                    cpa.confidence,
+                    cpa.crack_percent,
+                    cpa.non_crack_percent,
+                    cv.claim_recommended
+                FROM claims as c
+                INNER JOIN users as u ON u.id = c.user_id
+                LEFT JOIN {LATEST_ASSESSMENT_JOIN}
+                LEFT JOIN {LATEST_VALUE_JOIN}
+                WHERE c.id = %s
+            """
+
+
+def nest_images(rows, key="images"):
+    """Decode the aggregated image column of each row into a list ordered by id"""
+    for row in rows:
+        if key not in row:
+            continue
+        images = row[key]
+        if isinstance(images, (str, bytes)):
+            images = json.loads(images)
+        row[key] = sorted(images or [], key=lambda image: image["id"])
+    return rows
+
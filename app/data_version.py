@@ -0,0 +1,118 @@
+"""
+Per-user Data Versions and Conditional GET
+Every write to a user's insurance/claims data bumps a version counter in the
+database. JSON endpoints derive a weak ETag from it, so a client sending a
+matching If-None-Match gets a 304 without the endpoint's queries running.
+The same version keys the response cache (app/cache.py), so the ETag and a
+cached body can never come from different version counters.
+"""
+import hashlib
+from functools import wraps
+from flask import current_app, g, request, make_response
+from flask_jwt_extended import get_jwt_identity
+from app.db import get_db, routed_to_replica
+
+USER_DATA_VERSION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS user_data_version (
+        user_id INT PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+BUMP_DATA_VERSION_SQL = """
+    INSERT INTO user_data_version (user_id, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+_table_ready = False
+
+
+def ensure_user_data_version_table(cursor):
+    """Create the user_data_version table once per process"""
+    global _table_ready
+    if not _table_ready:
+        cursor.execute(USER_DATA_VERSION_TABLE_SQL)
+        _table_ready = True
+
+
+def bump_data_version(cursor, user_id):
+    """
+    Increment a user's data version
+    Call inside the same transaction as the write so the version and data commit together
+    """
+    ensure_user_data_version_table(cursor)
+    cursor.execute(BUMP_DATA_VERSION_SQL, (user_id,))
+
+
+def bump_data_version_for_claim(cursor, claims_id):
+    """Increment the data version of a claim's owner"""
+    cursor.execute("SELECT user_id FROM claims WHERE id = %s", (claims_id,))
+    row = cursor.fetchone()
+    if row:
+        bump_data_version(cursor, row['user_id'])
+
+
+def get_user_data_version(username):
+    """
+    Current data version for a username (0 if never written)
+    Read through the same routing as the view's own queries, so under
+    @read_replica it comes from the replica that serves the body
+    """
+    conn = get_db()
+    try:
+        with conn.cursor() as cursor:
+            if not routed_to_replica():
+                ensure_user_data_version_table(cursor)
+            cursor.execute(
+                """
+                SELECT u.id, COALESCE(v.version, 0) AS version
+                FROM users u
+                LEFT JOIN user_data_version v ON v.user_id = u.id
+                WHERE u.username = %s
+                """,
+                (username,)
+            )
+            row = cursor.fetchone()
+        return row['version'] if row else None
+    finally:
+        conn.close()
+
+
+def conditional_get(namespace):
+    """
+    Add a weak ETag to successful JSON responses and answer 304 when the
+    client's If-None-Match still matches the user's data version
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            username = get_jwt_identity()
+            try:
+                version = get_user_data_version(username)
+            except Exception as e:
+                current_app.logger.warning(f"Data version lookup failed: {e}")
+                return view(*args, **kwargs)
+
+            if version is None:
+                return view(*args, **kwargs)
+            # cached_response keys its entries by this same version
+            g.data_version = version
+
+            tag_source = f"{namespace}:{username}:{version}:{request.query_string.decode('utf-8')}"
+            etag = hashlib.sha1(tag_source.encode("utf-8")).hexdigest()[:20]
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers["Cache-Control"] = "private, no-cache"
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
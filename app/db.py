@@ -1,15 +1,264 @@
+"""
+Database
+MySQL connections with instrumented cursors.
+
+Every statement is timed under the db.query stage. Inside a request the cursor
+also records per-request query count, total DB time and each statement's
+duration; statements slower than DB_SLOW_QUERY_MS are logged with their
+route and the type and length of each parameter (values, which include
+password hashes, tokens and personal data, only with DB_SLOW_QUERY_LOG_PARAMS),
+and a statement repeated DB_N_PLUS_ONE_THRESHOLD times
+in one request is flagged as a likely N+1. With app.debug or DB_SERVER_TIMING
+the totals are sent back in a Server-Timing header.
+
+Read/write splitting: with DB_REPLICA_URLS set, views wrapped in
+@read_replica get replica connections from get_db(); everything else, and
+any user who wrote within the last DB_STICKY_SECONDS, uses the primary. All
+connections of one request go to the same replica, so the ETag data version
+and the body it describes are read at one replication position. The sticky
+marker lives in the cache backend, which must then be shared (redis) unless
+WEB_CONCURRENCY is 1.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import unquote, urlparse
 import pymysql
-from flask import current_app
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from app.cache import wrote_recently
+from app.metrics import timed
+
+# Statements executed while capture_queries() is active in this context
+_captured_queries = contextvars.ContextVar("captured_queries", default=None)
+
+SERVER_TIMING_STATEMENTS = 5
+
+
+def _one_line(sql):
+    return " ".join(sql.split())
+
+
+def _describe_param(value):
+    """Type (and length for text and bytes) of a statement parameter, without its value"""
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes, bytearray)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (list, tuple)):
+        return "(" + ", ".join(_describe_param(item) for item in value) + ")"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{key}: {_describe_param(item)}" for key, item in value.items()) + "}"
+    return type(value).__name__
+
+
+def _format_params(args, with_values=False, max_length=200):
+    if with_values:
+        text = repr(args)
+    elif isinstance(args, list) and args and isinstance(args[0], (list, tuple, dict)):
+        # executemany: one row is representative
+        text = f"{len(args)} rows of {_describe_param(args[0])}"
+    else:
+        text = _describe_param(args)
+    return text if len(text) <= max_length else text[:max_length] + "..."
+
+
+class RequestQueryStats:
+    """Statements executed while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements = []   # (sql, seconds)
+        self.repeats = {}      # sql -> executions
+
+    def record(self, sql, seconds):
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements.append((sql, seconds))
+        self.repeats[sql] = self.repeats.get(sql, 0) + 1
+
+    def slowest(self, n):
+        return sorted(self.statements, key=lambda item: item[1], reverse=True)[:n]
+
+    def server_timing(self):
+        entries = [f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries"']
+        for index, (sql, seconds) in enumerate(self.slowest(SERVER_TIMING_STATEMENTS), 1):
+            desc = _one_line(sql)[:80].replace('"', "'")
+            entries.append(f'db-{index};dur={seconds * 1000:.1f};desc="{desc}"')
+        return ", ".join(entries)
+
+
+def _record_statement(query, args, seconds):
+    """Attach a finished statement to the current request and log it if slow"""
+    if not has_request_context():
+        return
+    stats = g.get("_db_stats")
+    if stats is None:
+        stats = g._db_stats = RequestQueryStats()
+    stats.record(query, seconds)
+
+    config = current_app.config
+    slow_ms = config.get("DB_SLOW_QUERY_MS", 0)
+    if slow_ms and seconds * 1000 >= slow_ms:
+        params = _format_params(args, with_values=config.get("DB_SLOW_QUERY_LOG_PARAMS", False))
+        current_app.logger.warning(
+            f"Slow query ({seconds * 1000:.1f} ms) in {request.method} {request.path} "
+            f"[{request.endpoint}]: {_one_line(query)} params={params}"
+        )
+
+
+class TimedDictCursor(pymysql.cursors.DictCursor):
+    """DictCursor that records statement time under the db.query stage and per request"""
+
+    def _run(self, method, query, args):
+        captured = _captured_queries.get()
+        if captured is not None:
+            captured.append(query)
+        started = time.perf_counter()
+        try:
+            with timed("db.query"):
+                return method(query, args)
+        finally:
+            _record_statement(query, args, time.perf_counter() - started)
+
+    def execute(self, query, args=None):
+        return self._run(super().execute, query, args)
+
+    def executemany(self, query, args):
+        return self._run(super().executemany, query, args)
+
+
+@contextmanager
+def capture_queries():
+    """Collect the SQL of every statement executed inside the block"""
+    queries = []
+    token = _captured_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _captured_queries.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """
+    Fail with AssertionError if the block executes more than limit statements
+    Used to keep page routes from regressing into N+1 query chains
+    """
+    with capture_queries() as queries:
+        yield queries
+    if len(queries) > limit:
+        listing = "\n".join(f"  {_one_line(q)}" for q in queries)
+        raise AssertionError(f"{len(queries)} queries executed, expected at most {limit}:\n{listing}")
+
+
+def _replica_settings(config):
+    """Connection settings for each DB_REPLICA_URLS entry; missing parts come from the primary"""
+    replicas = []
+    for dsn in filter(None, (part.strip() for part in config.get("DB_REPLICA_URLS", "").split(","))):
+        url = urlparse(dsn if "://" in dsn else f"mysql://{dsn}")
+        replicas.append({
+            "host": url.hostname,
+            "user": unquote(url.username) if url.username else config["DB_USER"],
+            "password": unquote(url.password) if url.password else config["DB_PASSWORD"],
+            "db": url.path.lstrip("/") or config["DB_NAME"],
+            "port": url.port or config["DB_PORT"],
+        })
+    return replicas
+
+
+def _connect(host, user, password, db, port):
+    with timed("db.connect"):
+        return pymysql.connect(
+            host=host,
+            user=user,
+            password=password,
+            db=db,
+            port=port,
+            charset='utf8mb4',
+            cursorclass=TimedDictCursor
+        )
+
+
+def routed_to_replica():
+    """Whether get_db() connections of the current request go to a replica"""
+    return has_request_context() and g.get("_db_use_replica", False)
+
+
+def get_db(use_replica=None):
+    """
+    New connection to the primary, or to a random replica when use_replica is
+    true (default: whether the current view is routed by @read_replica)
+    Falls back to the primary if the replica cannot be reached
+    """
+    config = current_app.config
+    if use_replica is None:
+        use_replica = routed_to_replica()
+
+    if use_replica:
+        replicas = _replica_settings(config)
+        if replicas:
+            # One replica per request: a second, more lagged one could pair a fresh ETag with a stale body
+            replica = g.get("_db_replica") if has_request_context() else None
+            if replica is None:
+                replica = random.choice(replicas)
+                if has_request_context():
+                    g._db_replica = replica
+            try:
+                return _connect(**replica)
+            except pymysql.err.OperationalError as e:
+                current_app.logger.warning(f"Replica {replica['host']} unavailable, using primary: {e}")
+                if has_request_context():
+                    # Keep the rest of the request on the primary too
+                    g._db_use_replica = False
 
-def get_db():
     # A simple way: create new connection every time (less optimal for high traffic)
-    connection = pymysql.connect(
-        host=current_app.config["DB_HOST"],
-        user=current_app.config["DB_USER"],
-        password=current_app.config["DB_PASSWORD"],
-        db=current_app.config["DB_NAME"],
-        port=current_app.config["DB_PORT"],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
+    return _connect(
+        config["DB_HOST"], config["DB_USER"], config["DB_PASSWORD"], config["DB_NAME"], config["DB_PORT"]
     )
-    return connection
+
+
+def read_replica(view):
+    """
+    Route the view's get_db() connections to a replica
+    Place under @jwt_required(); callers who wrote recently stay on the primary
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_app.config.get("DB_REPLICA_URLS"):
+            g._db_use_replica = not wrote_recently(get_jwt_identity())
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+    """Per-request N+1 detection and the development Server-Timing header"""
+    if (app.config.get("DB_REPLICA_URLS") and app.config.get("CACHE_BACKEND") != "redis"
+            and app.config.get("WEB_CONCURRENCY") != 1):
+        # A per-worker marker would send the next request to a lagging replica whenever it lands elsewhere
+        raise RuntimeError(
+            "DB_REPLICA_URLS needs CACHE_BACKEND=redis so read-your-writes stickiness is shared "
+            "by all workers (or WEB_CONCURRENCY=1 for a single process)"
+        )
+
+    @app.after_request
+    def _report_queries(response):
+        stats = g.pop("_db_stats", None)
+        if stats is None:
+            return response
+
+        threshold = app.config.get("DB_N_PLUS_ONE_THRESHOLD", 0)
+        if threshold:
+            for sql, executions in stats.repeats.items():
+                if executions >= threshold:
+                    app.logger.warning(
+                        f"Possible N+1 in {request.method} {request.path} [{request.endpoint}]: "
+                        f"statement executed {executions} times: {_one_line(sql)}"
+                    )
+
+        if app.debug or app.config.get("DB_SERVER_TIMING"):
+            response.headers.add("Server-Timing", stats.server_timing())
+        return response
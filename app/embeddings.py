@@ -0,0 +1,259 @@
+"""
+Embedding Store
+Backbone embeddings of claim images and top-k similarity search over them.
+
+The 1280-d features that CrackClassifier computes before its classifier head
+are kept for every analysed claim image (same forward pass, no second model
+run). They are L2-normalised and appended to two flat files in
+EMBEDDING_STORE_DIR:
+- vectors.f16   float16 row per image (2.5 KB each)
+- ids.i64       the claim_property_image id of each row
+
+Readers memory-map both files, so every worker shares the page cache instead
+of loading its own copy. Search is an exact cosine scan with NumPy,
+converting SEARCH_BLOCK_ROWS rows at a time to float32 (about 40 MB of
+scratch). A full scan costs roughly 5 ms per 1,000 stored images on one
+core, dominated by the float16 conversion; a search limited to one user's
+images reads only their rows. Appends are serialised with a file lock.
+Vectors are written before ids, so a reader never sees an id without its
+vector.
+"""
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from app.config import current_config
+
+EMBEDDING_DIM = 1280
+SEARCH_BLOCK_ROWS = 8192
+ID_BYTES = 8
+MAX_K = 50
+
+# The caller and the owner of the query image, in one statement
+IMAGE_ACCESS_SQL = """
+    SELECT
+        u.id AS user_id,
+        u.role,
+        (SELECT c.user_id
+            FROM claim_property_image cpi
+            JOIN claim_property_details cpd ON cpd.id = cpi.claim_property_details_id
+            JOIN claims c ON c.id = cpd.claims_id
+            WHERE cpi.id = %s) AS owner_id
+    FROM users u
+    WHERE u.username = %s
+"""
+
+USER_IMAGE_IDS_SQL = """
+    SELECT cpi.id
+    FROM claim_property_image cpi
+    JOIN claim_property_details cpd ON cpd.id = cpi.claim_property_details_id
+    JOIN claims c ON c.id = cpd.claims_id
+    WHERE c.user_id = %s
+"""
+
+IMAGE_DETAILS_SQL = """
+    SELECT cpi.id AS image_id, cpi.file_name, c.id AS claims_id, c.claims_code
+    FROM claim_property_image cpi
+    JOIN claim_property_details cpd ON cpd.id = cpi.claim_property_details_id
+    JOIN claims c ON c.id = cpd.claims_id
+    WHERE cpi.id IN ({placeholders})
+"""
+
+
+class EmbeddingStore:
+    """Append-only float16 embedding matrix with an image id per row"""
+
+    def __init__(self, directory, dim=EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.ids_path = os.path.join(directory, "ids.i64")
+        self.lock_path = os.path.join(directory, "append.lock")
+
+    def __len__(self):
+        try:
+            return min(
+                os.path.getsize(self.vectors_path) // (self.dim * 2),
+                os.path.getsize(self.ids_path) // ID_BYTES,
+            )
+        except OSError:
+            return 0
+
+    @contextmanager
+    def _append_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, image_ids, vectors):
+        """Append normalised vectors for the given image ids"""
+        import numpy as np
+        if not len(image_ids):
+            return
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(image_ids), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.maximum(norms, 1e-12)).astype(np.float16)
+        ids = np.asarray(image_ids, dtype=np.int64)
+
+        with self._append_lock():
+            # Drop a partial row left by a crashed writer so rows and ids stay aligned
+            rows = len(self)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(rows * self.dim * 2)
+                f.write(matrix.tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.truncate(rows * ID_BYTES)
+                f.write(ids.tobytes())
+
+    def _views(self):
+        """(vectors, ids) memory maps of the rows written so far"""
+        import numpy as np
+        rows = len(self)
+        if rows == 0:
+            return np.empty((0, self.dim), dtype=np.float16), np.empty(0, dtype=np.int64)
+        vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(rows,))
+        return vectors, ids
+
+    def vector(self, image_id):
+        """Stored embedding of an image (float32), or None"""
+        import numpy as np
+        vectors, ids = self._views()
+        positions = np.flatnonzero(ids == image_id)
+        if not len(positions):
+            return None
+        return np.asarray(vectors[positions[-1]], dtype=np.float32)
+
+    def search(self, query, k=10, allowed_ids=None, exclude_ids=()):
+        """
+        [(image_id, cosine similarity)] of the k most similar stored images
+        allowed_ids restricts the search to those images (only their rows are
+        read); exclude_ids skips images
+        """
+        import numpy as np
+        vectors, ids = self._views()
+        if k <= 0 or not len(ids):
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        keep = _latest_rows(ids)
+        if exclude_ids:
+            keep &= ~np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64))
+        if allowed_ids is not None:
+            allowed = np.isin(ids, np.fromiter(allowed_ids, dtype=np.int64))
+            positions = np.flatnonzero(allowed & keep)
+            keep = None
+        else:
+            positions = np.arange(len(ids))
+            if keep.all():
+                keep = None
+
+        best_scores = []
+        best_rows = []
+        block = np.empty((min(SEARCH_BLOCK_ROWS, len(positions)), self.dim), dtype=np.float32)
+        for start in range(0, len(positions), SEARCH_BLOCK_ROWS):
+            rows = positions[start:start + SEARCH_BLOCK_ROWS]
+            if allowed_ids is None:
+                np.copyto(block[:len(rows)], vectors[rows[0]:rows[-1] + 1])
+            else:
+                np.copyto(block[:len(rows)], vectors[rows])
+            scores = block[:len(rows)] @ query
+            if keep is not None:
+                scores[~keep[rows]] = -np.inf
+            take = min(k, len(scores))
+            top = np.argpartition(-scores, take - 1)[:take]
+            best_scores.append(scores[top])
+            best_rows.append(rows[top])
+
+        if not best_scores:
+            return []
+        scores = np.concatenate(best_scores)
+        rows = np.concatenate(best_rows)
+        results = []
+        for position in np.argsort(-scores)[:k]:
+            if not np.isfinite(scores[position]):
+                break
+            results.append((int(ids[rows[position]]), round(float(scores[position]), 4)))
+        return results
+
+
+def _latest_rows(ids):
+    """Mask of each image's last row: an image embedded twice is searched once, by the vector() row"""
+    import numpy as np
+    _, last = np.unique(ids[::-1], return_index=True)
+    mask = np.zeros(len(ids), dtype=bool)
+    mask[len(ids) - 1 - last] = True
+    return mask
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The configured store, or None when EMBEDDINGS_ENABLED is off"""
+    global _store
+    config = current_config()
+    if not config.get("EMBEDDINGS_ENABLED", True):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore(config.get("EMBEDDING_STORE_DIR"))
+    return _store
+
+
+def store_embeddings(image_rows, embeddings):
+    """
+    Save the embeddings of newly inserted claim images
+    image_rows: CLAIM_IMAGE_IDS_SQL result; embeddings: {file_name: vector}
+    """
+    store = get_store()
+    if store is None:
+        return
+    pairs = [(image["id"], embeddings[image["file_name"]])
+             for image in image_rows if embeddings.get(image["file_name"]) is not None]
+    if pairs:
+        store.add([image_id for image_id, _ in pairs], [vector for _, vector in pairs])
+
+
+def similar_images(cursor, username, image_id, k=10):
+    """
+    Claim images most similar to image_id, as (status, payload)
+    Admins search every claim; other users only their own claims' images
+    """
+    store = get_store()
+    if store is None:
+        return 404, {"success": False, "message": "Image embeddings are disabled"}
+
+    cursor.execute(IMAGE_ACCESS_SQL, (image_id, username))
+    access = cursor.fetchone()
+    is_admin = bool(access) and access["role"] == "admin"
+    if not access or access["owner_id"] is None or (access["owner_id"] != access["user_id"] and not is_admin):
+        return 404, {"success": False, "message": "Image not found"}
+
+    query = store.vector(image_id)
+    if query is None:
+        return 404, {"success": False, "message": "No embedding stored for this image"}
+
+    allowed_ids = None
+    if not is_admin:
+        cursor.execute(USER_IMAGE_IDS_SQL, (access["user_id"],))
+        allowed_ids = [row["id"] for row in cursor.fetchall()]
+
+    hits = store.search(query, min(max(k, 1), MAX_K), allowed_ids, exclude_ids=(image_id,))
+    results = []
+    if hits:
+        cursor.execute(
+            IMAGE_DETAILS_SQL.format(placeholders=", ".join(["%s"] * len(hits))),
+            [hit_id for hit_id, _ in hits]
+        )
+        details = {row["image_id"]: row for row in cursor.fetchall()}
+        # Images deleted since they were embedded have no details row
+        results = [dict(details[hit_id], score=score) for hit_id, score in hits if hit_id in details]
+    return 200, {"success": True, "image_id": image_id, "results": results}
@@ -0,0 +1,235 @@
+"""
+Idempotent Requests
+Idempotency-Key support for expensive POST endpoints (claim submit-final).
+
+The first request with a key claims it in the idempotency_keys table and
+runs the view; its JSON response is stored against the key. A retry with the
+same key and the same request body gets the stored response
+(Idempotent-Replayed: true) without re-saving images or re-running the
+model. A retry that arrives while the original is still running gets 409
+with Retry-After at once: a sync worker must not sleep waiting for another
+request (the ASGI app, which waits on the event loop, waits up to
+IDEMPOTENCY_WAIT_SECONDS first). Server errors (5xx) and retryable answers
+(409, 429, 503, e.g. "images still being analyzed") release the key so the
+client's retry runs the view again instead of replaying them.
+
+Keys are scoped per user and endpoint and kept for IDEMPOTENCY_TTL_HOURS.
+"""
+import hashlib
+import json
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from app.db import get_db
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL_SECONDS = 0.5
+RETRY_AFTER_SECONDS = 2
+# Answers that say "try again": storing them would replay the refusal for the whole TTL
+TRANSIENT_STATUSES = {409, 429, 503}
+
+MISMATCH_ERROR = f"{IDEMPOTENCY_HEADER} was already used with a different request"
+IN_PROGRESS_ERROR = f"A request with this {IDEMPOTENCY_HEADER} is still being processed; retry later"
+
+IDEMPOTENCY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        username VARCHAR(255) NOT NULL,
+        endpoint VARCHAR(100) NOT NULL,
+        idempotency_key VARCHAR(255) NOT NULL,
+        request_hash CHAR(64) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'in_progress',
+        response_status INT NULL,
+        response_body MEDIUMTEXT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (username, endpoint, idempotency_key),
+        KEY idx_idempotency_created (created_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+IDEMPOTENCY_PURGE_SQL = "DELETE FROM idempotency_keys WHERE created_at < NOW() - INTERVAL %s HOUR"
+
+IDEMPOTENCY_CLAIM_SQL = """
+    INSERT IGNORE INTO idempotency_keys (username, endpoint, idempotency_key, request_hash)
+    VALUES (%s, %s, %s, %s)
+"""
+
+IDEMPOTENCY_LOOKUP_SQL = """
+    SELECT request_hash, status, response_status, response_body
+    FROM idempotency_keys
+    WHERE username = %s AND endpoint = %s AND idempotency_key = %s
+"""
+
+# Take over a key whose original request died without completing or releasing it
+IDEMPOTENCY_TAKEOVER_SQL = """
+    UPDATE idempotency_keys SET updated_at = CURRENT_TIMESTAMP
+    WHERE username = %s AND endpoint = %s AND idempotency_key = %s
+      AND request_hash = %s AND status = 'in_progress'
+      AND updated_at < NOW() - INTERVAL %s SECOND
+"""
+
+IDEMPOTENCY_COMPLETE_SQL = """
+    UPDATE idempotency_keys
+    SET status = 'completed', response_status = %s, response_body = %s
+    WHERE username = %s AND endpoint = %s AND idempotency_key = %s
+"""
+
+IDEMPOTENCY_RELEASE_SQL = """
+    DELETE FROM idempotency_keys
+    WHERE username = %s AND endpoint = %s AND idempotency_key = %s AND status = 'in_progress'
+"""
+
+_table_ready = False
+
+
+def request_fingerprint(form, files):
+    """SHA-256 over the form fields and uploaded files, so a reused key with a different body is caught"""
+    digest = hashlib.sha256()
+    for name, value in sorted(form.items(multi=True)):
+        digest.update(f"{name}={value}\n".encode("utf-8"))
+    for name, storage in files.items(multi=True):
+        digest.update(f"{name}:{storage.filename}\n".encode("utf-8"))
+        for chunk in iter(lambda: storage.stream.read(65536), b""):
+            digest.update(chunk)
+        storage.stream.seek(0)
+    return digest.hexdigest()
+
+
+def check_key(key):
+    """Error message for an unusable Idempotency-Key, or None"""
+    if len(key) > MAX_KEY_LENGTH:
+        return f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"
+    return None
+
+
+def existing_outcome(row, fingerprint):
+    """What to do about a key that is already taken: mismatch, completed or in_progress"""
+    if row["request_hash"] != fingerprint:
+        return "mismatch"
+    return row["status"]
+
+
+def replayed_response(row, response_class):
+    """The stored response of a completed key (response_class: the Flask or Quart app's)"""
+    response = response_class(
+        row["response_body"], status=row["response_status"], mimetype="application/json"
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def in_progress_response(response_class):
+    """409 for a key whose original request is still running (response_class: the Flask or Quart app's)"""
+    response = response_class(
+        json.dumps({"success": False, "error": IN_PROGRESS_ERROR}), status=409, mimetype="application/json"
+    )
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
+
+def storable(response):
+    """Whether a view's response is final and kept for replay, rather than releasing the key"""
+    return response.status_code < 500 and response.status_code not in TRANSIENT_STATUSES and response.is_json
+
+
+def ensure_idempotency_table(cursor):
+    """Create the idempotency_keys table once per process"""
+    global _table_ready
+    if not _table_ready:
+        cursor.execute(IDEMPOTENCY_TABLE_SQL)
+        _table_ready = True
+
+
+def _begin(scope, fingerprint):
+    """
+    Claim the key for this request
+    Returns None if the view should run, otherwise the response to send
+    """
+    config = current_app.config
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            ensure_idempotency_table(cursor)
+            cursor.execute(IDEMPOTENCY_PURGE_SQL, (config.get("IDEMPOTENCY_TTL_HOURS", 24),))
+            while True:
+                cursor.execute(IDEMPOTENCY_CLAIM_SQL, (*scope, fingerprint))
+                conn.commit()
+                if cursor.rowcount == 1:
+                    return None
+
+                cursor.execute(IDEMPOTENCY_LOOKUP_SQL, scope)
+                row = cursor.fetchone()
+                conn.commit()
+                if row is None:
+                    # Original failed and released the key; claim it again
+                    continue
+
+                outcome = existing_outcome(row, fingerprint)
+                if outcome == "mismatch":
+                    return jsonify({"success": False, "error": MISMATCH_ERROR}), 422
+                if outcome == "completed":
+                    return replayed_response(row, current_app.response_class)
+
+                cursor.execute(IDEMPOTENCY_TAKEOVER_SQL, (
+                    *scope, fingerprint, config.get("IDEMPOTENCY_LOCK_SECONDS", 600)
+                ))
+                conn.commit()
+                if cursor.rowcount == 1:
+                    return None
+                return in_progress_response(current_app.response_class)
+    finally:
+        conn.close()
+
+
+def _finish(scope, status, body):
+    """Store the response against the key, or release the key (body None)"""
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            if body is None:
+                cursor.execute(IDEMPOTENCY_RELEASE_SQL, scope)
+            else:
+                cursor.execute(IDEMPOTENCY_COMPLETE_SQL, (status, body, *scope))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def idempotent(endpoint):
+    """
+    Honour the Idempotency-Key header on a JWT-protected view
+    Place under @jwt_required()
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            error = check_key(key)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+
+            scope = (get_jwt_identity(), endpoint, key)
+            early = _begin(scope, request_fingerprint(request.form, request.files))
+            if early is not None:
+                return early
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                _finish(scope, None, None)
+                raise
+
+            try:
+                if storable(response):
+                    _finish(scope, response.status_code, response.get_data(as_text=True))
+                else:
+                    _finish(scope, None, None)
+            except Exception as e:
+                # The work is done; a retry will wait for the lock to expire and run again
+                current_app.logger.warning(f"Could not record idempotent response: {e}")
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,345 @@
+"""
+Perceptual Image Hashes
+Near-duplicate detection for claim images.
+
+Every claim image gets a 64-bit pHash (DCT of a 32x32 grayscale thumbnail) and
+dHash (horizontal gradients of a 9x8 thumbnail), computed with NumPy and
+stored in claim_image_hashes together with the image's AI analysis. Each
+process keeps the pHashes in a BK-tree, so finding every stored image within
+IMAGE_HASH_MAX_DISTANCE bits of an upload takes well under a millisecond; the
+dHash must also be within that distance for a hit.
+
+An exact hit (both hashes equal) on one of the same user's images lets
+submit-final reuse the stored analysis instead of running the model again.
+Near hits on other claims, any user's, are only logged as possible duplicate
+claims: another user's image never supplies a claim's figures.
+The index is refreshed incrementally from the table before each submission and
+rebuilt every IMAGE_HASH_REBUILD_SECONDS.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.config import current_config
+from app.db import get_db
+from app.metrics import timed
+
+# Claim analysis fields kept for reuse (see claim_submission.prediction_analysis)
+REUSABLE_FIELDS = (
+    "confidence", "crack_percent", "non_crack_percent", "ai_decision",
+    "crack_area", "crack_length", "crack_width",
+)
+
+IMAGE_HASHES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS claim_image_hashes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        image_id INT NOT NULL UNIQUE,
+        claims_id INT NOT NULL,
+        phash BIGINT UNSIGNED NOT NULL,
+        dhash BIGINT UNSIGNED NOT NULL,
+        analysis TEXT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (image_id) REFERENCES claim_property_image(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+IMAGE_HASHES_SINCE_SQL = """
+    SELECT h.id, h.image_id, h.claims_id, c.user_id, h.phash, h.dhash, h.analysis
+    FROM claim_image_hashes h
+    JOIN claims c ON c.id = h.claims_id
+    WHERE h.id > %s
+    ORDER BY h.id
+"""
+
+CLAIM_IMAGE_IDS_SQL = """
+    SELECT id, file_name FROM claim_property_image
+    WHERE claim_property_details_id = %s
+"""
+
+IMAGE_HASH_INSERT_SQL = """
+    INSERT IGNORE INTO claim_image_hashes (image_id, claims_id, phash, dhash, analysis)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+HashEntry = namedtuple("HashEntry", "image_id claims_id user_id dhash analysis")
+
+_table_ready = False
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def _bits_to_int(bits):
+    import numpy as np
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def _dct_matrix(n):
+    import numpy as np
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+
+
+def phash(image):
+    """64-bit DCT hash of a PIL image: low 8x8 frequencies against their median"""
+    import numpy as np
+    from PIL import Image
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(32)
+    low = (dct @ pixels @ dct.T)[:8, :8]
+    # The DC term is overall brightness; leave it out of the median
+    median = np.median(low.flatten()[1:])
+    return _bits_to_int(low > median)
+
+
+def dhash(image):
+    """64-bit gradient hash of a PIL image: is each pixel brighter than its left neighbour"""
+    import numpy as np
+    from PIL import Image
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def image_hashes(source):
+    """(phash, dhash) of an image given as a path or file-like object"""
+    from PIL import Image
+    with timed("image_hash"), Image.open(source) as image:
+        image.draft("L", (64, 64))   # JPEG: decode at reduced size, we only need a thumbnail
+        return phash(image), dhash(image)
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance"""
+
+    def __init__(self):
+        self.root = None   # [hash, [items], {distance: child}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """(distance, item) for every item within max_distance, closest first"""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                found.extend((distance, item) for item in items)
+            # Triangle inequality: only children within [d - max, d + max] can match
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda hit: hit[0])
+        return found
+
+
+class ImageHashIndex:
+    """This process's BK-tree of stored claim image hashes"""
+
+    def __init__(self):
+        self.tree = BKTree()
+        self.last_id = 0
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh_args(self, rebuild_seconds):
+        """
+        Parameters for IMAGE_HASHES_SINCE_SQL
+        Starts over after rebuild_seconds so rows committed out of id order are picked up
+        """
+        with self._lock:
+            if time.monotonic() - self.built_at >= rebuild_seconds:
+                return (0,)
+            return (self.last_id,)
+
+    def ingest(self, rows, full=False):
+        """Add rows from IMAGE_HASHES_SINCE_SQL; full=True replaces the tree"""
+        with self._lock:
+            if full:
+                self.last_id = 0
+            target = BKTree() if full else self.tree
+            for row in rows:
+                if row["id"] <= self.last_id:
+                    continue
+                analysis = json.loads(row["analysis"]) if row["analysis"] else None
+                target.add(int(row["phash"]), HashEntry(
+                    row["image_id"], row["claims_id"], row["user_id"], int(row["dhash"]), analysis
+                ))
+                self.last_id = max(self.last_id, row["id"])
+            if full:
+                self.tree = target
+                self.built_at = time.monotonic()
+
+    def find(self, phash_value, dhash_value, max_distance):
+        """[(distance, HashEntry)] of stored images near the given hashes"""
+        with self._lock:
+            hits = self.tree.search(phash_value, max_distance)
+        return [(distance, entry) for distance, entry in hits
+                if hamming(dhash_value, entry.dhash) <= max_distance]
+
+
+index = ImageHashIndex()
+
+
+class ImageFingerprint:
+    """Hashes of one incoming image and its near-duplicates among stored images"""
+
+    def __init__(self, phash_value, dhash_value, matches):
+        self.phash = phash_value
+        self.dhash = dhash_value
+        self.matches = matches
+        self.analysis = None   # set once this image's analysis is known, stored with the hashes
+
+    def reusable(self, user_id):
+        """An identical image (both hashes equal) of user_id's that carries an AI analysis, or None"""
+        return next((
+            entry for distance, entry in self.matches
+            if entry.analysis and distance == 0 and entry.dhash == self.dhash
+            and str(entry.user_id) == str(user_id)
+        ), None)
+
+    def duplicates(self, claims_id=None):
+        """Matches on claims other than claims_id"""
+        return [
+            {"image_id": entry.image_id, "claims_id": entry.claims_id, "distance": distance}
+            for distance, entry in self.matches if entry.claims_id != claims_id
+        ]
+
+
+def fingerprint_image(source):
+    """ImageFingerprint for an image, or None if hashing is disabled or fails"""
+    config = current_config()
+    if not config.get("IMAGE_HASH_ENABLED", True):
+        return None
+    try:
+        phash_value, dhash_value = image_hashes(source)
+    except Exception:
+        return None
+    with timed("image_hash_lookup"):
+        matches = index.find(phash_value, dhash_value, config.get("IMAGE_HASH_MAX_DISTANCE", 8))
+    return ImageFingerprint(phash_value, dhash_value, matches)
+
+
+def ensure_image_hashes_table(cursor):
+    """Create the claim_image_hashes table once per process"""
+    global _table_ready
+    if not _table_ready:
+        cursor.execute(IMAGE_HASHES_TABLE_SQL)
+        _table_ready = True
+
+
+def refresh_index(cursor):
+    """Load hashes stored since the last refresh (all of them when a rebuild is due)"""
+    config = current_config()
+    if not config.get("IMAGE_HASH_ENABLED", True):
+        return
+    ensure_image_hashes_table(cursor)
+    args = index.refresh_args(config.get("IMAGE_HASH_REBUILD_SECONDS", 300))
+    cursor.execute(IMAGE_HASHES_SINCE_SQL, args)
+    index.ingest(cursor.fetchall(), full=args == (0,))
+
+
+def hash_rows(image_rows, claims_id, fingerprints):
+    """
+    IMAGE_HASH_INSERT_SQL parameters for the images of one claim
+    image_rows: CLAIM_IMAGE_IDS_SQL result; fingerprints: {file_name: ImageFingerprint}
+    """
+    rows = []
+    for image in image_rows:
+        fingerprint = fingerprints.get(image["file_name"])
+        if fingerprint is None:
+            continue
+        analysis = json.dumps(fingerprint.analysis, default=float) if fingerprint.analysis else None
+        rows.append((image["id"], claims_id, fingerprint.phash, fingerprint.dhash, analysis))
+    return rows
+
+
+def claim_image_ids(cursor, claim_property_details_id):
+    """id and file_name of the images inserted for one property details row"""
+    cursor.execute(CLAIM_IMAGE_IDS_SQL, (claim_property_details_id,))
+    return cursor.fetchall()
+
+
+def store_hashes(cursor, image_rows, claims_id, fingerprints):
+    """
+    Save the hashes of newly inserted claim images (same transaction as the image rows)
+    image_rows: claim_image_ids() result
+    """
+    if not fingerprints:
+        return
+    ensure_image_hashes_table(cursor)
+    rows = hash_rows(image_rows, claims_id, fingerprints)
+    if rows:
+        cursor.executemany(IMAGE_HASH_INSERT_SQL, rows)
+
+
+def duplicate_report(fingerprints, claims_id):
+    """[{file_name, matches}] for images that closely match images of other claims"""
+    report = []
+    for file_name, fingerprint in fingerprints.items():
+        duplicates = fingerprint.duplicates(claims_id)
+        if duplicates:
+            report.append({"file_name": file_name, "matches": duplicates})
+    return report
+
+
+@click.command("backfill-image-hashes")
+@with_appcontext
+def backfill_image_hashes_command():
+    """Hash claim images stored before claim_image_hashes existed (analysis is left empty)"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    conn = get_db()
+    hashed = missing = 0
+    try:
+        with conn.cursor() as cursor:
+            ensure_image_hashes_table(cursor)
+            cursor.execute("""
+                SELECT cpi.id, cpi.file_name, cpd.claims_id
+                FROM claim_property_image cpi
+                JOIN claim_property_details cpd ON cpd.id = cpi.claim_property_details_id
+                LEFT JOIN claim_image_hashes h ON h.image_id = cpi.id
+                WHERE h.image_id IS NULL
+            """)
+            for image in cursor.fetchall():
+                path = os.path.join(upload_folder, image['file_name'])
+                try:
+                    phash_value, dhash_value = image_hashes(path)
+                except Exception:
+                    missing += 1
+                    continue
+                cursor.execute(IMAGE_HASH_INSERT_SQL, (
+                    image['id'], image['claims_id'], phash_value, dhash_value, None
+                ))
+                hashed += 1
+        conn.commit()
+        click.echo(f"Hashed {hashed} images ({missing} missing or unreadable)")
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"Error backfilling image hashes: {e}")
+        raise
+    finally:
+        conn.close()
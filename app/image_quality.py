@@ -0,0 +1,116 @@
+"""
+Image Quality Gate
+Cheap pre-check that runs before the CNN, OpenCV and matplotlib stages.
+
+The image is decoded at reduced size (JPEG draft mode: an eighth of a 12 MP
+photo) to a grayscale thumbnail of at most ANALYSIS_SIZE pixels, and three
+NumPy checks run on it:
+- resolution: shorter side of the original against QUALITY_MIN_SIDE
+- sharpness: variance of the 4-neighbour Laplacian (low = blurred or out of focus)
+- exposure: mean brightness and the share of clipped (near black/white) pixels
+
+QUALITY_GATE selects what happens to a failing image: "flag" analyses it and
+returns the report alongside the result, "reject" stops before inference with
+HTTP 422 and the reasons, "off" skips the check. Every reason says how to
+retake the photo.
+"""
+from app.config import current_config
+from app.metrics import timed
+
+ANALYSIS_SIZE = 512
+CLIP_LOW = 5
+CLIP_HIGH = 250
+
+REJECTED_ERROR = "Image failed the quality check"
+
+
+def _measure(image):
+    """Sharpness and exposure metrics of a PIL image"""
+    import numpy as np
+    # Draft picks the smallest DCT scale that still covers the requested size
+    image.draft("L", (ANALYSIS_SIZE // 2, ANALYSIS_SIZE // 2))
+    gray = image.convert("L")
+    gray.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    pixels = np.asarray(gray, dtype=np.uint8)
+
+    p = pixels.astype(np.float32)
+    laplacian = p[1:-1, :-2] + p[1:-1, 2:] + p[:-2, 1:-1] + p[2:, 1:-1] - 4 * p[1:-1, 1:-1]
+    histogram = np.bincount(pixels.ravel(), minlength=256)
+    total = pixels.size
+    return {
+        "sharpness": round(float(laplacian.var()), 1) if laplacian.size else 0.0,
+        "brightness": round(float(np.dot(histogram, np.arange(256)) / total), 1),
+        "clipped_fraction": round(float((histogram[:CLIP_LOW + 1].sum() + histogram[CLIP_HIGH:].sum()) / total), 3),
+    }
+
+
+def check_image_quality(source):
+    """
+    Quality report for an image given as a path or file-like object
+    Returns {"passed", "reasons", "metrics"}; a file-like source is rewound afterwards
+    """
+    from PIL import Image
+    config = current_config()
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with timed("quality_check"), Image.open(source) as image:
+            width, height = image.size
+            metrics = {"width": width, "height": height, **_measure(image)}
+    finally:
+        if position is not None:
+            source.seek(position)
+
+    reasons = []
+    min_side = config.get("QUALITY_MIN_SIDE", 224)
+    if min(width, height) < min_side:
+        reasons.append(
+            f"Image is too small ({width}x{height}; at least {min_side} px on the shorter side): "
+            "move closer or use a higher camera resolution"
+        )
+    exposure = None
+    if metrics["brightness"] < config.get("QUALITY_MIN_BRIGHTNESS", 40):
+        exposure = (
+            f"Image is too dark (mean brightness {metrics['brightness']} of 255): "
+            "add light or turn on the flash"
+        )
+    elif metrics["brightness"] > config.get("QUALITY_MAX_BRIGHTNESS", 220):
+        exposure = (
+            f"Image is overexposed (mean brightness {metrics['brightness']} of 255): "
+            "avoid direct sunlight or flash glare on the wall"
+        )
+    min_sharpness = config.get("QUALITY_MIN_SHARPNESS", 40)
+    if exposure:
+        # Bad exposure flattens contrast, so the sharpness figure means nothing until it is fixed
+        reasons.append(exposure)
+    elif metrics["sharpness"] < min_sharpness:
+        reasons.append(
+            f"Image is blurry (sharpness {metrics['sharpness']}, minimum {min_sharpness:g}): "
+            "hold the camera steady and tap to focus on the damage"
+        )
+    if metrics["clipped_fraction"] > config.get("QUALITY_MAX_CLIPPED", 0.4):
+        reasons.append(
+            f"{metrics['clipped_fraction']:.0%} of the image is pure black or white: "
+            "reshoot with even lighting so the surface detail is visible"
+        )
+    return {"passed": not reasons, "reasons": reasons, "metrics": metrics}
+
+
+def quality_gate(source):
+    """
+    (report, rejected) for an image under the configured QUALITY_GATE mode
+    report is None when the gate is off; an unreadable image is left to the model to reject
+    """
+    mode = current_config().get("QUALITY_GATE", "flag")
+    if mode == "off":
+        return None, False
+    try:
+        report = check_image_quality(source)
+    except Exception as e:
+        return {"passed": True, "reasons": [], "metrics": {}, "error": f"Quality check failed: {e}"}, False
+    return report, mode == "reject" and not report["passed"]
+
+
+def rejection(report, **extra):
+    """JSON body for an image the gate rejected (sent with HTTP 422)"""
+    return {"success": False, "error": f"{REJECTED_ERROR}: " + "; ".join(report["reasons"]),
+            "quality": report, **extra}
@@ -0,0 +1,210 @@
+"""
+Inference
+Single entry point for crack classification and crack measurement.
+
+INFERENCE_BACKEND selects where the work runs:
+- "local":  in this process (torch, timm, OpenCV and matplotlib are imported
+            on first use)
+- "remote": in the inference server (python -m app.inference_server), reached
+            over INFERENCE_SOCKET (Unix socket) or INFERENCE_URL; this process
+            then imports none of the heavy libraries
+"""
+import http.client
+import io
+import json
+import os
+import socket
+import threading
+from urllib.parse import urlparse
+from app.config import current_config
+from app.metrics import timed
+
+
+class InferenceError(RuntimeError):
+    """Raised when the inference server rejects a request or cannot be reached"""
+
+
+def _read_source(source):
+    """Bytes of an image given as a path or a file-like object"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    return source.read()
+
+
+class LocalBackend:
+    """Runs the model and OpenCV measurement in this process"""
+
+    def __init__(self):
+        from app.models import crack_classifier
+        from app.routes.image_area_calculater import calculate_crack_area
+        self.classifier = crack_classifier
+        self.calculate_crack_area = calculate_crack_area
+        # pyplot keeps global figure state and is not thread-safe
+        self._measure_lock = threading.Lock()
+
+    def preprocess(self, source):
+        """Decode and transform one image into a model input tensor"""
+        from PIL import Image
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        with timed("pil_decode"):
+            img = Image.open(source).convert("RGB")
+        with timed("transforms"):
+            return self.classifier.inference_transforms(img)
+
+    def predict(self, tensors, embeddings=False):
+        """
+        Run a batch of preprocessed tensors through the model
+        embeddings=True adds each image's L2-normalised backbone features ("embedding")
+        """
+        import torch
+        from app.profiling import torch_span
+
+        model = self.classifier.model
+        batch = torch.stack(tensors).to(self.classifier.device)
+        with timed("forward"), torch_span("forward"), torch.no_grad():
+            features = model.forward_features(batch)
+            output = model.classifier(features)
+        probabilities = torch.softmax(output, dim=1).tolist()
+        vectors = torch.nn.functional.normalize(features, dim=1).tolist() if embeddings else None
+
+        labels = self.classifier.CLASS_LABELS
+        results = []
+        for position, probs in enumerate(probabilities):
+            index = max(range(len(probs)), key=probs.__getitem__)
+            result = {
+                "class_index": index,
+                "predicted_class": labels[index],
+                "confidence": round(probs[index] * 100, 2),
+                "probabilities": {labels[i]: round(p * 100, 2) for i, p in enumerate(probs)},
+            }
+            if vectors:
+                result["embedding"] = vectors[position]
+            results.append(result)
+        return results
+
+    def first_stage(self, source):
+        """Cascade answer without the model, or None (see app/cascade.py)"""
+        from app.cascade import first_stage
+        return first_stage(source, self.classifier.CLASS_LABELS)
+
+    def classify(self, source, with_embedding=False):
+        # Only the model produces embeddings, so those requests skip the cascade
+        result = None if with_embedding else self.first_stage(source)
+        if result is None:
+            result = self.predict([self.preprocess(source)], embeddings=with_embedding)[0]
+        return result
+
+    def measure(self, image_path, save_plot=True, save_path=None):
+        with self._measure_lock:
+            return self.calculate_crack_area(image_path, save_plot=save_plot, save_path=save_path)
+
+    def reattach(self):
+        self.classifier.reattach_model()
+
+    def warmup(self):
+        return self.classifier.warmup_model()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class RemoteBackend:
+    """Client for the inference server"""
+
+    def __init__(self, socket_path=None, url=None, timeout=30):
+        self.socket_path = socket_path
+        self.url = urlparse(url or "http://127.0.0.1:5100")
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, self.timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, body=None, content_type="application/json"):
+        conn = self._connection()
+        try:
+            with timed("inference_rpc"):
+                conn.request(method, path, body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                payload = response.read()
+        except OSError as e:
+            raise InferenceError(f"Inference server unreachable: {e}") from e
+        finally:
+            conn.close()
+
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            raise InferenceError(f"Invalid response from inference server (HTTP {response.status})")
+        if response.status != 200:
+            raise InferenceError(data.get("error", f"Inference server returned HTTP {response.status}"))
+        return data
+
+    def classify(self, source, with_embedding=False):
+        path = "/classify?embedding=1" if with_embedding else "/classify"
+        return self._request("POST", path, _read_source(source), "application/octet-stream")
+
+    def measure(self, image_path, save_plot=True, save_path=None):
+        # The server shares this filesystem; paths must not depend on our working directory
+        body = json.dumps({
+            "image_path": os.path.abspath(image_path),
+            "save_plot": save_plot,
+            "save_path": os.path.abspath(save_path) if save_path else None,
+        })
+        return self._request("POST", "/measure", body)
+
+    def reattach(self):
+        pass
+
+    def warmup(self):
+        self._request("GET", "/health")
+        return 0.0
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Backend for this process, created on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = current_config()
+                if config.get("INFERENCE_BACKEND") == "remote":
+                    _backend = RemoteBackend(
+                        config.get("INFERENCE_SOCKET") or None,
+                        config.get("INFERENCE_URL"),
+                        config.get("INFERENCE_TIMEOUT", 30),
+                    )
+                else:
+                    _backend = LocalBackend()
+    return _backend
+
+
+def classify_image(source, with_embedding=False):
+    """
+    Classify an image given as a path or file-like object
+    Returns class_index, predicted_class, confidence and probabilities (percentages);
+    with_embedding=True adds "embedding", the normalised 1280-d backbone
+    features computed in the same forward pass
+    """
+    return get_backend().classify(source, with_embedding=with_embedding)
+
+
+def measure_crack(image_path, save_plot=True, save_path=None):
+    """Crack length/width/area for an image on disk; same result as calculate_crack_area"""
+    return get_backend().measure(image_path, save_plot=save_plot, save_path=save_path)
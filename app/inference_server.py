@@ -0,0 +1,215 @@
+"""
+Inference Server
+Runs CrackClassifier and crack measurement in a dedicated local process, so
+web workers started with INFERENCE_BACKEND=remote need none of torch, timm,
+OpenCV or matplotlib and can be scaled independently.
+
+    python -m app.inference_server                               # INFERENCE_SOCKET or INFERENCE_URL
+    python -m app.inference_server --socket /run/eda/inference.sock
+    python -m app.inference_server --port 5100
+
+Endpoints:
+- POST /classify   raw image bytes -> prediction JSON (?embedding=1 adds the backbone embedding)
+- POST /measure    {"image_path", "save_plot", "save_path"} -> calculate_crack_area result
+- GET  /health
+
+/measure only reads and writes files inside UPLOAD_FOLDER (--upload-folder);
+other paths get 403. A /classify request that waits longer than
+INFERENCE_TIMEOUT gets 503 and its image is dropped from the queue.
+
+Concurrent /classify requests are decoded in parallel and run through the
+model together, up to INFERENCE_MAX_BATCH images per forward pass, waiting at
+most INFERENCE_BATCH_WAIT_MS for a batch to fill. With CASCADE_ENABLED, images
+the edge-density first stage can decide never reach the batcher.
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from app.config import Config
+from app.inference import LocalBackend
+from app.metrics import QUEUE_DEPTH
+
+
+class Batcher:
+    """Collects preprocessed images from request threads into model batches"""
+
+    def __init__(self, backend, max_batch=8, wait_ms=5):
+        self.backend = backend
+        self.max_batch = max(1, max_batch)
+        self.wait = wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor, timeout=None):
+        future = Future()
+        QUEUE_DEPTH.labels(queue="inference").inc()
+        self._queue.put((tensor, future))
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            # Nobody waits for it any more: a queued image is skipped, a running batch just finishes
+            future.cancel()
+            raise
+
+    def _next_batch(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        QUEUE_DEPTH.labels(queue="inference").dec(len(items))
+        return items
+
+    def _run(self):
+        while True:
+            items = [(tensor, future) for tensor, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not items:
+                continue
+            try:
+                # Embeddings come from the same forward pass; handlers drop them when not requested
+                results = self.backend.predict([tensor for tensor, _ in items], embeddings=True)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "EDAInference/1.0"
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _upload_path(self, path):
+        """Absolute path if it lies inside the upload folder, otherwise None"""
+        folder = self.server.upload_folder
+        path = os.path.realpath(path)
+        return path if os.path.commonpath([folder, path]) == folder else None
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send_json(404, {"error": "Not found"})
+        self._send_json(200, {"status": "ok", "max_batch": self.server.batcher.max_batch})
+
+    def do_POST(self):
+        try:
+            url = urlparse(self.path)
+            if url.path == "/classify":
+                body = self._body()
+                if not body:
+                    return self._send_json(400, {"error": "Image body missing"})
+                with_embedding = "embedding=1" in url.query.split("&")
+                result = None if with_embedding else self.server.backend.first_stage(body)
+                if result is None:
+                    tensor = self.server.backend.preprocess(body)
+                    result = dict(self.server.batcher.submit(tensor, timeout=self.server.timeout_seconds))
+                    if not with_embedding:
+                        result.pop("embedding", None)
+            elif url.path == "/measure":
+                data = json.loads(self._body() or b"{}")
+                if not data.get("image_path"):
+                    return self._send_json(400, {"error": "image_path missing"})
+                image_path = self._upload_path(data["image_path"])
+                save_path = self._upload_path(data["save_path"]) if data.get("save_path") else None
+                if image_path is None or (data.get("save_path") and save_path is None):
+                    return self._send_json(403, {"error": "Paths must be inside the upload folder"})
+                result = self.server.backend.measure(image_path, data.get("save_plot", True), save_path)
+            else:
+                return self._send_json(404, {"error": "Not found"})
+        except FuturesTimeout:
+            # Before OSError: TimeoutError is one since Python 3.3, and overload is not a bad request
+            return self._send_json(503, {"error": "Inference server overloaded; request timed out"})
+        except (ValueError, OSError) as e:
+            return self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            return self._send_json(500, {"error": str(e)})
+        self._send_json(200, result)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def build_server(socket_path=None, host="127.0.0.1", port=5100, max_batch=8, wait_ms=5,
+                 timeout_seconds=30, verbose=False, upload_folder=Config.UPLOAD_FOLDER):
+    backend = LocalBackend()
+    backend.warmup()
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, InferenceRequestHandler)
+        os.chmod(socket_path, 0o660)
+    else:
+        server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+        server.daemon_threads = True
+
+    server.backend = backend
+    server.batcher = Batcher(backend, max_batch, wait_ms)
+    server.timeout_seconds = timeout_seconds
+    server.upload_folder = os.path.realpath(upload_folder)
+    server.verbose = verbose
+    return server
+
+
+def main():
+    url = urlparse(Config.INFERENCE_URL)
+    parser = argparse.ArgumentParser(description="Local crack detection inference server")
+    parser.add_argument("--socket", default=Config.INFERENCE_SOCKET or None, help="Unix socket path")
+    parser.add_argument("--host", default=url.hostname or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=url.port or 5100)
+    parser.add_argument("--max-batch", type=int, default=Config.INFERENCE_MAX_BATCH)
+    parser.add_argument("--batch-wait-ms", type=float, default=Config.INFERENCE_BATCH_WAIT_MS)
+    parser.add_argument("--upload-folder", default=Config.UPLOAD_FOLDER,
+                        help="the only folder /measure may read images from and write plots to")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = build_server(args.socket, args.host, args.port, args.max_batch, args.batch_wait_ms,
+                          Config.INFERENCE_TIMEOUT, args.verbose, args.upload_folder)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"[*] Inference server listening on {where} (max batch {args.max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
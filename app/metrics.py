@@ -0,0 +1,105 @@
+"""
+Metrics
+Per-stage timing histograms and counters exported on /metrics in the
+Prometheus text format.
+
+Multiprocess (gunicorn) mode: set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before the workers start; every worker then writes its
+samples there and /metrics aggregates them across all workers.
+"""
+import os
+import time
+from contextlib import ContextDecorator
+from flask import Blueprint, Response, request, g
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+)
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "eda_stage_seconds",
+    "Time spent in each processing stage (file save, decode, transforms, forward, opencv, matplotlib, db)",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+REQUEST_SECONDS = Histogram(
+    "eda_request_seconds",
+    "End-to-end request latency by endpoint",
+    ["endpoint", "method", "status"],
+    buckets=STAGE_BUCKETS,
+)
+
+CACHE_EVENTS = Counter(
+    "eda_cache_events",
+    "Response cache lookups by result",
+    ["result"],
+)
+
+CASCADE_DECISIONS = Counter(
+    "eda_cascade_decisions",
+    "Model cascade first-stage outcomes (edge_crack, edge_no_crack, escalated)",
+    ["outcome"],
+)
+
+QUEUE_DEPTH = Gauge(
+    "eda_queue_depth",
+    "Work items queued or running in bounded executors",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+
+
+class timed(ContextDecorator):
+    """Record the duration of a block or function under a stage label"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def _recreate_cm(self):
+        # Fresh instance per decorated call so concurrent calls don't share a start time
+        return timed(self.stage)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.labels(stage=self.stage).observe(time.perf_counter() - self._start)
+        return False
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Register /metrics and per-request latency hooks"""
+    app.register_blueprint(metrics_bp)
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("_request_started", None)
+        if started is not None and request.endpoint != "metrics.metrics":
+            REQUEST_SECONDS.labels(
+                endpoint=request.endpoint or "unknown",
+                method=request.method,
+                status=response.status_code,
+            ).observe(time.perf_counter() - started)
+        return response
@@ -5,6 +5,9 @@ import timm
 from PIL import Image
 import os
 import sys
+import time
+from app.config import Config
+from app.topology import torch_thread_settings
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, 'models', 'best_model.pth')
@@ -19,6 +22,34 @@ CLASS_LABELS = {0: "Negative (No Crack)", 1: "Positive (Crack Detected)"}
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+# Set by gunicorn.conf.py in a preloading master: build the model on one torch
+# thread and on the CPU, and leave thread pools and the GPU to each forked
+# worker (reattach_model). Neither a started thread pool nor a CUDA context is
+# usable in a child after fork.
+FORK_SAFE_LOAD = os.getenv("TORCH_FORK_SAFE_LOAD", "false").lower() == "true"
+
+
+def configure_torch_threads(num_threads=None, interop_threads=None, workers=None):
+    """Apply intra-op / interop thread counts before the first forward pass"""
+    intra_op, interop = torch_thread_settings(
+        Config.TORCH_NUM_THREADS if num_threads is None else num_threads,
+        Config.TORCH_INTEROP_THREADS if interop_threads is None else interop_threads,
+        Config.WEB_CONCURRENCY if workers is None else workers,
+    )
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_interop_threads(interop)
+    except RuntimeError:
+        # Can only be set once per process, before any inter-op work has started
+        pass
+    return intra_op, interop
+
+
+if FORK_SAFE_LOAD:
+    torch.set_num_threads(1)
+else:
+    configure_torch_threads()
+
 class CrackClassifier(nn.Module):
     def __init__(self, num_classes=2, pretrained=False, dropout=0.2):
         super().__init__()
@@ -46,11 +77,14 @@ class CrackClassifier(nn.Module):
                 if m.bias is not None:
                     nn.init.constant_(m.bias, 0)
 
-    def forward(self, x):
+    def forward_features(self, x):
+        """Pooled 1280-d backbone features, before the classifier head"""
         if x.dim() == 3:
             x = x.unsqueeze(0)
-        features = self.backbone(x)
-        return self.classifier(features)
+        return self.backbone(x)
+
+    def forward(self, x):
+        return self.classifier(self.forward_features(x))
 
 inference_transforms = transforms.Compose([
     transforms.Resize((CONFIG['img_size'], CONFIG['img_size'])),
@@ -65,6 +99,25 @@ model = CrackClassifier(num_classes=CONFIG['num_classes'],
 if not os.path.exists(MODEL_PATH):
     raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
 
-model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
-model.to(device)
+load_device = torch.device("cpu") if FORK_SAFE_LOAD else device
+model.load_state_dict(torch.load(MODEL_PATH, map_location=load_device))
+model.to(load_device)
 model.eval()
+
+
+def reattach_model():
+    """Set up per-process torch state in a worker forked from a preloaded master"""
+    configure_torch_threads()
+    if device.type == "cuda":
+        # The master kept the weights on the CPU; CUDA is first initialised
+        # here, so each worker holds its own copy on the GPU
+        model.to(device)
+
+
+def warmup_model():
+    """Run one forward pass so the first real request does not pay for lazy initialisation"""
+    start = time.perf_counter()
+    img = Image.new("RGB", (CONFIG['img_size'], CONFIG['img_size']))
+    with torch.no_grad():
+        model(inference_transforms(img).unsqueeze(0).to(device))
+    return (time.perf_counter() - start) * 1000.0
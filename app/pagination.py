@@ -0,0 +1,95 @@
+"""
+Keyset Pagination and Field Selection
+Helpers for listing endpoints ordered by (created_at DESC, id DESC)
+
+Query parameters:
+- limit:  page size (capped by PAGE_MAX_LIMIT)
+- cursor: opaque token from the previous page's next_cursor
+- fields: comma-separated list of columns to return
+"""
+import base64
+import datetime
+from flask import current_app, request
+
+
+class PaginationError(ValueError):
+    """Raised when limit, cursor or fields query parameters are invalid"""
+
+
+def encode_cursor(created_at, row_id):
+    """Build an opaque cursor from the last row of a page"""
+    if isinstance(created_at, datetime.datetime):
+        created_at = created_at.isoformat()
+    raw = f"{created_at}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into (created_at, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def get_page_args():
+    """Read limit and cursor from the query string"""
+    default_limit = current_app.config.get("PAGE_DEFAULT_LIMIT", 100)
+    max_limit = current_app.config.get("PAGE_MAX_LIMIT", 500)
+    try:
+        limit = int(request.args.get("limit", default_limit))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    limit = min(limit, max_limit)
+
+    cursor = request.args.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def select_columns(field_map, required=()):
+    """
+    Build the SELECT column list from the optional fields= parameter
+    field_map maps output names to SQL expressions; required columns are
+    always selected (e.g. the keyset columns) and stripped later if not asked for
+    """
+    fields_param = request.args.get("fields")
+    if fields_param:
+        fields = [f.strip() for f in fields_param.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in field_map]
+        if unknown:
+            raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    else:
+        fields = list(field_map)
+
+    selected = fields + [name for name in required if name not in fields]
+    columns = ",\n                    ".join(f"{field_map[name]} AS {name}" for name in selected)
+    return columns, fields
+
+
+def keyset_condition(created_col, id_col, page_cursor):
+    """WHERE fragment and params that continue after the given cursor"""
+    if page_cursor is None:
+        return "", ()
+    created_at, row_id = page_cursor
+    return (
+        f" AND ({created_col} < %s OR ({created_col} = %s AND {id_col} < %s))",
+        (created_at, created_at, row_id)
+    )
+
+
+def finish_page(rows, limit, fields, created_key, id_key):
+    """
+    Trim the look-ahead row, compute next_cursor and drop columns that were
+    only selected for the keyset
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1][created_key], rows[-1][id_key])
+    rows = [{name: row[name] for name in fields} for row in rows]
+    return rows, next_cursor
@@ -0,0 +1,130 @@
+"""
+Password Hashing
+Runs bcrypt on a small bounded thread pool so bursts of logins cannot starve
+the request workers, and throttles login attempts with token buckets: every
+attempt counts against the username, only failed ones against the client IP
+(so an office behind one NAT address is not locked out by its own logins).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from flask_bcrypt import Bcrypt
+from app.metrics import QUEUE_DEPTH
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated or too slow to answer in time"""
+
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by an arbitrary string"""
+
+    def __init__(self, rate_per_minute=10, burst=5, max_keys=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        """Take one token; returns 0 when allowed, otherwise seconds until the next token"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed = (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return allowed
+
+    def wait(self, key):
+        """Seconds until a token is available, without taking one"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        return 0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # Full buckets carry no state worth keeping
+        full_after = self.burst / self.rate
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[key]
+
+
+class PasswordHasher:
+    """Bounded bcrypt executor with transparent rehash on cost changes"""
+
+    def __init__(self):
+        self.bcrypt = Bcrypt()
+        self.executor = None
+        self.limiter = None
+
+    def init_app(self, app):
+        config = app.config
+        self.bcrypt.init_app(app)
+        self.log_rounds = config.get("BCRYPT_LOG_ROUNDS", 12)
+        self.timeout = config.get("HASH_TIMEOUT_SECONDS", 10)
+        max_workers = config.get("HASH_MAX_WORKERS", 2)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_workers + config.get("HASH_MAX_QUEUE", 16))
+        self.limiter = TokenBucketLimiter(
+            config.get("LOGIN_RATE_PER_MINUTE", 10),
+            config.get("LOGIN_BURST", 5)
+        )
+
+    def _release(self, _future=None):
+        QUEUE_DEPTH.labels(queue="bcrypt").dec()
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        QUEUE_DEPTH.labels(queue="bcrypt").inc()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # The slot is held until bcrypt finishes, even if this request stops waiting for it
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            raise HasherBusy()
+
+    def generate_password_hash(self, password):
+        return self._run(self.bcrypt.generate_password_hash, password, self.log_rounds).decode("utf-8")
+
+    def check_password_hash(self, stored_hash, password):
+        return self._run(self.bcrypt.check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True when the stored hash was made with a different cost factor"""
+        try:
+            return int(stored_hash.split("$")[2]) != self.log_rounds
+        except (IndexError, ValueError):
+            return False
+
+    def throttle(self, *keys):
+        """Consume a token from each bucket; returns the longest wait, or 0 if allowed"""
+        return max((self.limiter.consume(key) for key in keys if key), default=0)
+
+    def retry_after(self, *keys):
+        """Longest wait of the buckets without consuming from them, or 0 if allowed"""
+        return max((self.limiter.wait(key) for key in keys if key), default=0)
+
+    def charge(self, *keys):
+        """Take a token from each bucket, e.g. for a failed login"""
+        for key in keys:
+            if key:
+                self.limiter.consume(key)
+
+
+hasher = PasswordHasher()
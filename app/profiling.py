@@ -0,0 +1,235 @@
+"""
+Profiling
+Opt-in per-request profiling. A request is profiled when an admin sends the
+X-Profile header (or ?_profile=1), or when it is picked by PROFILE_SAMPLE_RATE.
+The profile is written to PROFILE_DIR and listed on /admin/profiles.
+
+X-Profile: torch (or ?_profile=torch) also records torch.profiler traces for
+the inference spans wrapped in torch_span().
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import Blueprint, current_app, g, has_request_context, jsonify, request, send_from_directory
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
+from werkzeug.utils import secure_filename
+from app.db import get_db
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_ARG = "_profile"
+
+# cProfile and pyinstrument hook the interpreter, so only one request is profiled at a time
+_profiler_lock = threading.Lock()
+
+profiling_bp = Blueprint("profiling", __name__)
+
+
+def is_admin(username):
+    """True when the user has the admin role"""
+    if not username:
+        return False
+    conn = get_db()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT role FROM users WHERE username = %s", (username,))
+            row = cursor.fetchone()
+    finally:
+        conn.close()
+    return bool(row) and row["role"] == "admin"
+
+
+def _requested_mode():
+    """Profile mode asked for by the client: None, "python" or "torch" """
+    flag = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+    if not flag or flag.lower() in ("0", "false", "off"):
+        return None
+    return "torch" if flag.lower() == "torch" else "python"
+
+
+def _admin_identity():
+    try:
+        verify_jwt_in_request(optional=True)
+        username = get_jwt_identity()
+    except Exception:
+        return None
+    return username if is_admin(username) else None
+
+
+class _CProfileRunner:
+    extension = "prof"
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def cancel(self):
+        self.profiler.disable()
+
+    def stop(self, path):
+        self.cancel()
+        self.profiler.dump_stats(path)
+
+
+class _PyinstrumentRunner:
+    extension = "html"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler()
+
+    def start(self):
+        self.profiler.start()
+
+    def cancel(self):
+        self.profiler.stop()
+
+    def stop(self, path):
+        self.cancel()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.profiler.output_html())
+
+
+def _make_runner(name):
+    if name == "pyinstrument":
+        try:
+            return _PyinstrumentRunner()
+        except ImportError:
+            current_app.logger.warning("pyinstrument is not installed, falling back to cProfile")
+    return _CProfileRunner()
+
+
+def _profile_name(suffix):
+    endpoint = secure_filename(request.endpoint or "unknown")
+    return f"{g._profile_id}_{endpoint}{suffix}"
+
+
+def _prune(directory, keep):
+    files = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory)),
+        key=os.path.getmtime,
+    )
+    if keep and len(files) > keep:
+        for path in files[:-keep]:
+            os.remove(path)
+
+
+@contextmanager
+def torch_span(name):
+    """Record a torch.profiler trace for this block when the request asked for one"""
+    if not has_request_context() or not g.get("_profile_torch"):
+        yield
+        return
+
+    import torch
+    from torch.profiler import ProfilerActivity, profile, record_function
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+
+    with profile(activities=activities, record_shapes=True) as prof:
+        with record_function(name):
+            yield
+
+    g._profile_spans = g.get("_profile_spans", 0) + 1
+    path = os.path.join(
+        current_app.config["PROFILE_DIR"],
+        _profile_name(f"_{secure_filename(name)}_{g._profile_spans}.trace.json"),
+    )
+    prof.export_chrome_trace(path)
+
+
+@profiling_bp.route("/admin/profiles", methods=["GET"])
+@jwt_required()
+def list_profiles():
+    """List saved profiles, newest first"""
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"success": False, "message": "Admin access required"}), 403
+
+    directory = current_app.config["PROFILE_DIR"]
+    profiles = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            stat = os.stat(os.path.join(directory, name))
+            profiles.append({
+                "name": name,
+                "size_bytes": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            })
+    profiles.sort(key=lambda p: p["created_at"], reverse=True)
+    return jsonify({"success": True, "profiles": profiles})
+
+
+@profiling_bp.route("/admin/profiles/<path:name>", methods=["GET"])
+@jwt_required()
+def download_profile(name):
+    """Download one saved profile"""
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"success": False, "message": "Admin access required"}), 403
+    return send_from_directory(current_app.config["PROFILE_DIR"], secure_filename(name), as_attachment=True)
+
+
+def init_app(app):
+    """Register /admin/profiles and, when enabled, the profiling request hooks"""
+    app.register_blueprint(profiling_bp)
+    if not app.config.get("PROFILING_ENABLED"):
+        return
+
+    os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+
+    @app.before_request
+    def _start_profile():
+        if request.blueprint == profiling_bp.name:
+            return
+        mode = _requested_mode()
+        if mode and not _admin_identity():
+            mode = None
+        if not mode and random.random() < app.config["PROFILE_SAMPLE_RATE"]:
+            mode = "python"
+        if not mode or not _profiler_lock.acquire(blocking=False):
+            return
+
+        g._profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.randrange(16 ** 6):06x}"
+        g._profile_torch = mode == "torch" and app.config["PROFILE_TORCH_ENABLED"]
+        g._profile_started = time.perf_counter()
+        try:
+            g._profile_runner = _make_runner(app.config["PROFILER"])
+            g._profile_runner.start()
+        except Exception:
+            g.pop("_profile_runner", None)
+            _profiler_lock.release()
+            app.logger.exception("Could not start request profiler")
+
+    @app.after_request
+    def _finish_profile(response):
+        runner = g.pop("_profile_runner", None)
+        if runner is None:
+            return response
+        try:
+            elapsed_ms = int((time.perf_counter() - g._profile_started) * 1000)
+            path = os.path.join(
+                app.config["PROFILE_DIR"],
+                _profile_name(f"_{request.method}_{elapsed_ms}ms.{runner.extension}"),
+            )
+            runner.stop(path)
+            _prune(app.config["PROFILE_DIR"], app.config["PROFILE_MAX_FILES"])
+            response.headers["X-Profile-Id"] = g._profile_id
+        except Exception:
+            app.logger.exception("Could not write request profile")
+        finally:
+            _profiler_lock.release()
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request is skipped when the response itself failed; never leave the lock held
+        runner = g.pop("_profile_runner", None)
+        if runner is not None:
+            runner.cancel()
+            _profiler_lock.release()
@@ -0,0 +1,59 @@
+"""
+Page Data Repository
+Fetches the data each page route needs in a single round-trip.
+
+Each function takes an open cursor and returns plain dicts; the page routes
+only render or redirect. assert_max_queries() in app/db.py guards the
+per-page query budgets (see test_page_queries.py).
+"""
+import json
+from app.claim_summary import DAMAGE_CALCULATION_SQL, nest_images
+
+NEW_REPORT_SQL = """
+    SELECT
+        c.id AS claims_id,
+        c.user_id,
+        c.insurance_id,
+        c.policy_number,
+        (SELECT JSON_ARRAYAGG(i.insurance_code) FROM insurance i WHERE i.user_id = c.user_id) AS insurance_codes,
+        (SELECT MAX(cpd.id) FROM claim_property_details cpd WHERE cpd.claims_id = c.id) AS claim_property_details_id
+    FROM claims c
+    WHERE c.claims_code = %s
+"""
+
+# Always returns one row, so the duplicate check and the owner's username
+# (for cache invalidation) cost a single statement
+CLAIM_CREATE_CHECK_SQL = """
+    SELECT
+        (SELECT username FROM users WHERE id = %s) AS username,
+        EXISTS(SELECT 1 FROM claims WHERE claims_code = %s) AS code_taken
+"""
+
+
+def get_new_report_data(cursor, claims_code):
+    """
+    Claim, the owner's insurance codes and the latest property details id for
+    the new_report page, or None if the claim does not exist
+    """
+    cursor.execute(NEW_REPORT_SQL, (claims_code,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    codes = row["insurance_codes"]
+    if isinstance(codes, (str, bytes)):
+        codes = json.loads(codes)
+    row["insurance_codes"] = [{"insurance_code": code} for code in codes or []]
+    return row
+
+
+def get_damage_calculation(cursor, claims_id):
+    """One row for the claim with its images nested, or an empty list"""
+    cursor.execute(DAMAGE_CALCULATION_SQL, (claims_id,))
+    return nest_images(cursor.fetchall())
+
+
+def get_claim_create_check(cursor, user_id, claims_code):
+    """(username of user_id or None, whether claims_code is already used)"""
+    cursor.execute(CLAIM_CREATE_CHECK_SQL, (user_id, claims_code))
+    row = cursor.fetchone()
+    return row["username"], bool(row["code_taken"])
@@ -3,21 +3,50 @@ Authentication API Routes
 Handles login, signup, logout, and token verification endpoints
 """
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity
-from flask_bcrypt import Bcrypt
+from flask_jwt_extended import (
+    create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt, get_jwt_identity
+)
 import pymysql
 import datetime
+import math
 from app.blocklist import BLOCKLIST
+from app.password_hashing import hasher, HasherBusy
 
 auth_api_bp = Blueprint("auth_api", __name__, url_prefix="/api/auth")
-bcrypt = Bcrypt()
+
+
+def _too_many_requests(retry_after):
+    response = jsonify({"success": False, "message": "Too many attempts. Please try again later."})
+    response.headers["Retry-After"] = str(int(math.ceil(retry_after)))
+    return response, 429
+
+
+def _server_busy():
+    return jsonify({"success": False, "message": "Server busy. Please try again shortly."}), 503
+
+
+def _inactive_account():
+    return jsonify({
+        "success": False,
+        "message": "Your account is currently inactive. Please contact the system administrator to activate your account or for further assistance."
+    }), 403
+
+
+def _issue_tokens(username):
+    """Create a short-lived access token and a longer-lived refresh token"""
+    access_expires = datetime.timedelta(minutes=current_app.config["ACCESS_TOKEN_EXPIRE_MINUTES"])
+    refresh_expires = datetime.timedelta(days=current_app.config["REFRESH_TOKEN_EXPIRE_DAYS"])
+    return (
+        create_access_token(identity=username, expires_delta=access_expires),
+        create_refresh_token(identity=username, expires_delta=refresh_expires)
+    )
 
 
 @auth_api_bp.route("/login", methods=["POST"])
 def login():
     """
     User login endpoint
-    Returns JWT token on successful authentication
+    Returns JWT access and refresh tokens on successful authentication
     """
     data = request.get_json()
     username = data.get("username")
@@ -26,6 +55,12 @@ def login():
     if not username or not password:
         return jsonify({"success": False, "message": "Username and password required"}), 400
 
+    # Every attempt counts against the username, only failures against the client IP
+    ip_key = f"login:ip:{request.remote_addr}"
+    retry_after = max(hasher.throttle(f"login:user:{username}"), hasher.retry_after(ip_key))
+    if retry_after:
+        return _too_many_requests(retry_after)
+
     conn = pymysql.connect(
         host=current_app.config["DB_HOST"],
         user=current_app.config["DB_USER"],
@@ -41,22 +76,33 @@ def login():
             row = cursor.fetchone()
 
             if row is None:
+                hasher.charge(ip_key)
                 return jsonify({"success": False, "message": "User not found"}), 404
 
             stored_hash, status = row
 
-            if not bcrypt.check_password_hash(stored_hash, password):
+            if not hasher.check_password_hash(stored_hash, password):
+                hasher.charge(ip_key)
                 return jsonify({"success": False, "message": "Invalid credentials"}), 401
 
             if status.lower() != "active":
-                return jsonify({
-                    "success": False,
-                    "message": "Your account is currently inactive. Please contact the system administrator to activate your account or for further assistance."
-                }), 403
-
-            expires = datetime.timedelta(minutes=current_app.config["ACCESS_TOKEN_EXPIRE_MINUTES"])
-            token = create_access_token(identity=username, expires_delta=expires)
-            return jsonify({"success": True, "token": token})
+                return _inactive_account()
+
+            # Upgrade the stored hash when the configured cost factor has changed
+            if hasher.needs_rehash(stored_hash):
+                try:
+                    cursor.execute(
+                        "UPDATE users SET password=%s WHERE username=%s",
+                        (hasher.generate_password_hash(password), username)
+                    )
+                    conn.commit()
+                except Exception as e:
+                    current_app.logger.warning(f"Password rehash failed for {username}: {e}")
+
+            token, refresh_token = _issue_tokens(username)
+            return jsonify({"success": True, "token": token, "refresh_token": refresh_token})
+    except HasherBusy:
+        return _server_busy()
     finally:
         conn.close()
 
@@ -82,8 +128,15 @@ def signup():
     if not all([name, email, username, password]):
         return jsonify({"success": False, "message": "Missing required fields"}), 400
 
-    # Hash password using Flask-Bcrypt
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    retry_after = hasher.throttle(f"signup:ip:{request.remote_addr}")
+    if retry_after:
+        return _too_many_requests(retry_after)
+
+    # Hash password using Flask-Bcrypt on the bounded hashing pool
+    try:
+        hashed_password = hasher.generate_password_hash(password)
+    except HasherBusy:
+        return _server_busy()
 
     conn = pymysql.connect(
         host=current_app.config["DB_HOST"],
@@ -115,15 +168,53 @@ def signup():
         conn.close()
 
 
+@auth_api_bp.route("/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Token refresh endpoint
+    Exchanges a refresh token for a new access token without re-checking the password.
+    Refresh tokens rotate: the one presented is revoked and a new one is returned.
+    Accounts deleted or deactivated since login get 403 and their token is revoked.
+    """
+    from app.db import get_db
+
+    claims = get_jwt()
+    username = get_jwt_identity()
+    BLOCKLIST.add(claims["jti"], claims["exp"])
+
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT status FROM users WHERE username = %s", (username,))
+            user = cursor.fetchone()
+    finally:
+        conn.close()
+    if not user or (user['status'] or "").lower() != "active":
+        return _inactive_account()
+
+    token, refresh_token = _issue_tokens(username)
+    return jsonify({"success": True, "token": token, "refresh_token": refresh_token}), 200
+
+
 @auth_api_bp.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
     """
     User logout endpoint
-    Adds JWT token to blocklist
+    Adds JWT token (and the refresh token, if sent) to blocklist until they expire
     """
-    jti = get_jwt()["jti"]
-    BLOCKLIST.add(jti)
+    claims = get_jwt()
+    BLOCKLIST.add(claims["jti"], claims["exp"])
+
+    data = request.get_json(silent=True) or {}
+    if data.get("refresh_token"):
+        try:
+            refresh_claims = decode_token(data["refresh_token"])
+            if refresh_claims.get("sub") == claims.get("sub"):
+                BLOCKLIST.add(refresh_claims["jti"], refresh_claims["exp"])
+        except Exception as e:
+            current_app.logger.warning(f"Could not revoke refresh token on logout: {e}")
     return jsonify({"success": True, "message": "Successfully logged out"}), 200
 
 
@@ -4,13 +4,16 @@ Handles claims-specific API operations
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.db import get_db
+from app.db import get_db, read_replica
+from app.data_version import conditional_get
 
 claims_api_bp = Blueprint("claims_api", __name__, url_prefix="/api")
 
 
 @claims_api_bp.route("/insurance_claims_detail", methods=["GET"])
 @jwt_required()
+@read_replica
+@conditional_get("insurance_claims_detail")
 def insurance_claims_detail_api():
     """Get insurance codes for the current user to start a new claim"""
     conn = get_db()
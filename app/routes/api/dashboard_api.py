@@ -2,15 +2,22 @@
 Dashboard API Routes
 Provides dashboard data and statistics
 """
+import pymysql
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.db import get_db
+from app.db import get_db, read_replica
+from app.cache import cached_response
+from app.data_version import conditional_get
+from app.user_stats import ensure_user_stats_table, refresh_user_stats
 
 dashboard_api_bp = Blueprint("dashboard_api", __name__, url_prefix="/api/dashboard")
 
 
 @dashboard_api_bp.route("/stats", methods=["GET"])
 @jwt_required()
+@read_replica
+@conditional_get("dashboard_stats")
+@cached_response("dashboard_stats")
 def get_dashboard_stats():
     """
     Get dashboard statistics for the current user
@@ -34,35 +41,47 @@ def get_dashboard_stats():
             sql = """
                 SELECT 
                     u.name, u.email, u.mobile, u.address,
-                    COUNT(DISTINCT i.id) AS total_insurance_count,
-                    COUNT(DISTINCT c.id) AS total_claims_count,
-                    COUNT(DISTINCT cpi.id) AS total_picture_tests,
-                    COUNT(DISTINCT i.policy_number) AS total_policy_number,
-                    SUM(cv.claim_recommended) AS total_claim_you_get
+                    us.total_insurance_count,
+                    us.total_claims_count,
+                    us.total_picture_tests,
+                    us.total_policy_number,
+                    us.total_claim_you_get
                 FROM users u
-                LEFT JOIN insurance i ON u.id = i.user_id
-                LEFT JOIN claims c ON u.id = c.user_id
-                LEFT JOIN claim_property_details cpd ON cpd.claims_id = c.id
-                LEFT JOIN claims_value cv ON cv.claims_id = cpd.claims_id
-                LEFT JOIN claim_property_image cpi ON cpi.claim_property_details_id = cpd.id
+                JOIN user_stats us ON us.user_id = u.id
                 WHERE u.id = %s
-                GROUP BY u.name, u.email, u.mobile, u.address
             """
-            cursor.execute(sql, (user_id,))
-            counts = cursor.fetchone()
+            try:
+                cursor.execute(sql, (user_id,))
+                counts = cursor.fetchone()
+            except pymysql.err.ProgrammingError:
+                # user_stats table not created yet
+                counts = None
             
-            return jsonify({
-                "success": True,
-                "total_insurance_count": counts.get('total_insurance_count', 0) if counts else 0,
-                "total_claims_count": counts.get('total_claims_count', 0) if counts else 0,
-                "total_picture_tests": counts.get('total_picture_tests', 0) if counts else 0,
-                "total_claim_you_get": counts.get('total_claim_you_get', 0) if counts else 0,
-                "total_policy_number": counts.get('total_policy_number', 0) if counts else 0,
-                "name": counts.get('name', 'NA') if counts else 'NA',
-                "email": counts.get('email', 'NA') if counts else 'NA',
-                "mobile": counts.get('mobile', 'NA') if counts else 'NA',
-                "address": counts.get('address', 'NA') if counts else 'NA'
-            })
+        # Summary row not built yet for this user - compute it once on the primary
+        if not counts:
+            primary = get_db(use_replica=False)
+            try:
+                with primary.cursor() as cursor:
+                    ensure_user_stats_table(cursor)
+                    refresh_user_stats(cursor, user_id)
+                    primary.commit()
+                    cursor.execute(sql, (user_id,))
+                    counts = cursor.fetchone()
+            finally:
+                primary.close()
+            
+        return jsonify({
+            "success": True,
+            "total_insurance_count": counts.get('total_insurance_count', 0) if counts else 0,
+            "total_claims_count": counts.get('total_claims_count', 0) if counts else 0,
+            "total_picture_tests": counts.get('total_picture_tests', 0) if counts else 0,
+            "total_claim_you_get": counts.get('total_claim_you_get', 0) if counts else 0,
+            "total_policy_number": counts.get('total_policy_number', 0) if counts else 0,
+            "name": counts.get('name', 'NA') if counts else 'NA',
+            "email": counts.get('email', 'NA') if counts else 'NA',
+            "mobile": counts.get('mobile', 'NA') if counts else 'NA',
+            "address": counts.get('address', 'NA') if counts else 'NA'
+        })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     finally:
@@ -3,13 +3,11 @@ Detection API Routes
 Handles AI-based crack/earthquake detection
 """
 from flask import Blueprint, request, jsonify
-import torch
-from PIL import Image
 import os
 from werkzeug.utils import secure_filename
-from app.models.crack_classifier import CrackClassifier, inference_transforms, device, model, CLASS_LABELS
-from app.routes.image_area_calculater import calculate_crack_area
-from app.routes.earthquake_detection import e_detect_earthquake
+from app.inference import classify_image, measure_crack
+from app.image_quality import quality_gate, rejection
+from app.metrics import timed
 
 detection_api_bp = Blueprint("detection_api", __name__, url_prefix="/api/detection")
 
@@ -29,23 +27,18 @@ def detect_crack():
         return jsonify({"success": False, "error": "No file selected"}), 400
     
     try:
-        img = Image.open(image_file).convert("RGB")
-        img_tensor = inference_transforms(img).to(device)
-        
-        with torch.no_grad():
-            output = model(img_tensor.unsqueeze(0))
-        
-        probabilities = torch.softmax(output, dim=1).squeeze().tolist()
-        max_prob_idx = int(torch.argmax(output, dim=1).item())
+        quality, rejected = quality_gate(image_file.stream)
+        if rejected:
+            return jsonify(rejection(quality)), 422
+
+        prediction = classify_image(image_file)
 
         result = {
             "success": True,
-            "predicted_class": CLASS_LABELS[max_prob_idx], 
-            "confidence": round(probabilities[max_prob_idx] * 100, 2),
-            "probabilities": {
-                CLASS_LABELS[i]: round(p * 100, 2) 
-                for i, p in enumerate(probabilities)
-            }
+            "predicted_class": prediction["predicted_class"],
+            "confidence": prediction["confidence"],
+            "probabilities": prediction["probabilities"],
+            "quality": quality
         }
         return jsonify(result), 200
 
@@ -77,23 +70,22 @@ def detect_crack_with_visualization():
         import time
         base_name = f"temp_{int(time.time())}_{filename}"
         filepath = os.path.join(upload_folder, base_name)
-        image_file.save(filepath)
+        with timed("file_save"):
+            image_file.save(filepath)
+
+        # Reject unusable photos before the model and OpenCV stages
+        quality, rejected = quality_gate(filepath)
+        if rejected:
+            return jsonify(rejection(quality, original_image_url=f"/static/upload_image/{base_name}")), 422
         
         # Run AI detection
-        img = Image.open(filepath).convert("RGB")
-        img_tensor = inference_transforms(img).to(device)
-        
-        with torch.no_grad():
-            output = model(img_tensor.unsqueeze(0))
-        
-        probabilities = torch.softmax(output, dim=1).squeeze().tolist()
-        max_prob_idx = int(torch.argmax(output, dim=1).item())
+        prediction = classify_image(filepath)
         
         # Generate crack visualization using OpenCV (handle errors gracefully)
         crack_data = None
         processed_image_url = None
         try:
-            crack_data = calculate_crack_area(filepath)
+            crack_data = measure_crack(filepath)
             if crack_data and crack_data.get('status') == 'success' and crack_data.get('plot_path'):
                 # The plot_path is the full path to the visualization image
                 # Extract just the filename to create a URL
@@ -102,24 +94,19 @@ def detect_crack_with_visualization():
             print(f"Warning: Crack area calculation failed: {crack_error}")
             crack_data = None
         
-        # Note: e_detect_earthquake returns a Flask Response object, not a dict
-        # So we won't include it in the JSON response (it's already handled by the main model above)
-        
         result = {
             "success": True,
-            "predicted_class": CLASS_LABELS[max_prob_idx], 
-            "confidence": round(probabilities[max_prob_idx] * 100, 2),
-            "probabilities": {
-                CLASS_LABELS[i]: round(p * 100, 2) 
-                for i, p in enumerate(probabilities)
-            },
+            "predicted_class": prediction["predicted_class"],
+            "confidence": prediction["confidence"],
+            "probabilities": prediction["probabilities"],
             "processed_image_url": processed_image_url,
             "crack_data": {
                 "length_ft": crack_data.get('length_ft', 0) if crack_data and crack_data.get('status') == 'success' else 0,
                 "width_ft": crack_data.get('width_ft', 0) if crack_data and crack_data.get('status') == 'success' else 0,
                 "area_sqft": crack_data.get('crack_area', 0) if crack_data and crack_data.get('status') == 'success' else 0
             },
-            "original_image_url": f"/static/upload_image/{base_name}"
+            "original_image_url": f"/static/upload_image/{base_name}",
+            "quality": quality
         }
         
         return jsonify(result), 200
@@ -159,23 +146,22 @@ def batch_analyze_images():
             filename = secure_filename(image_file.filename)
             base_name = f"batch_{int(time.time())}_{idx}_{filename}"
             filepath = os.path.join(upload_folder, base_name)
-            image_file.save(filepath)
+            with timed("file_save"):
+                image_file.save(filepath)
+
+            quality, rejected = quality_gate(filepath)
+            if rejected:
+                results.append(rejection(quality, filename=filename))
+                continue
             
             # Run AI detection
-            img = Image.open(filepath).convert("RGB")
-            img_tensor = inference_transforms(img).to(device)
-            
-            with torch.no_grad():
-                output = model(img_tensor.unsqueeze(0))
-            
-            probabilities = torch.softmax(output, dim=1).squeeze().tolist()
-            max_prob_idx = int(torch.argmax(output, dim=1).item())
+            prediction = classify_image(filepath)
             
             # Generate crack visualization using OpenCV
             crack_data = None
             processed_image_url = None
             try:
-                crack_data = calculate_crack_area(filepath)
+                crack_data = measure_crack(filepath)
                 if crack_data and crack_data.get('status') == 'success' and crack_data.get('plot_path'):
                     processed_image_url = f"/static/upload_image/{os.path.basename(crack_data['plot_path'])}"
             except Exception as crack_error:
@@ -186,20 +172,18 @@ def batch_analyze_images():
             result = {
                 "success": True,
                 "filename": filename,
-                "predicted_class": CLASS_LABELS[max_prob_idx], 
-                "confidence": round(probabilities[max_prob_idx] * 100, 2),
-                "probabilities": {
-                    CLASS_LABELS[i]: round(p * 100, 2) 
-                    for i, p in enumerate(probabilities)
-                },
-                "crack_detected": max_prob_idx == 1,
+                "predicted_class": prediction["predicted_class"],
+                "confidence": prediction["confidence"],
+                "probabilities": prediction["probabilities"],
+                "crack_detected": prediction["class_index"] == 1,
                 "processed_image_url": processed_image_url,
                 "crack_data": {
                     "length_ft": crack_data.get('length_ft', 0) if crack_data and crack_data.get('status') == 'success' else 0,
                     "width_ft": crack_data.get('width_ft', 0) if crack_data and crack_data.get('status') == 'success' else 0,
                     "area_sqft": crack_data.get('crack_area', 0) if crack_data and crack_data.get('status') == 'success' else 0
                 },
-                "original_image_url": f"/static/upload_image/{base_name}"
+                "original_image_url": f"/static/upload_image/{base_name}",
+                "quality": quality
             }
             
             results.append(result)
@@ -5,21 +5,110 @@ Handles all insurance and claims data operations
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-from app.db import get_db
+from app.db import get_db, read_replica
+from app.user_stats import apply_user_stats_delta, claim_value_change
+from app.cache import cached_response, invalidate_user_cache, PUBLIC_SCOPE
+from app.data_version import conditional_get, bump_data_version
+from app.metrics import timed
+from app.idempotency import idempotent
+from app.claim_submission import (
+    CLAIM_INSERT_SQL, PROPERTY_DETAILS_INSERT_SQL, CLAIM_IMAGE_INSERT_SQL, ASSESSMENT_INSERT_SQL,
+    CLAIM_VALUE_INSERT_SQL, CLAIM_ACTIVATE_SQL, analyze_claim_image, uploaded_file_analysis
+)
+from app.uploads import UploadError, finalize_session, consume_session
+from app.image_hash import (
+    refresh_index, claim_image_ids, store_hashes, duplicate_report
+)
+from app.embeddings import store_embeddings, similar_images
+from app.pagination import (
+    PaginationError, get_page_args, select_columns, keyset_condition, finish_page
+)
+from app.claim_summary import (
+    LATEST_DETAILS_JOIN, LATEST_ASSESSMENT_JOIN, LATEST_VALUE_JOIN, CLAIM_IMAGES_SQL, FIRST_IMAGE_SQL,
+    nest_images
+)
+from app import repository
 import os
 import traceback
 
 insurance_api_bp = Blueprint("insurance_api", __name__, url_prefix="/api/insurance")
 
+# Selectable fields (fields= query parameter) for the listing endpoints
+POLICY_FIELDS = {
+    "id": "id",
+    "insurance_code": "insurance_code",
+    "policy_number": "policy_number",
+    "insurance_from": "insurance_from",
+    "insurance_to": "insurance_to",
+    "insurance_type": "insurance_type",
+    "insured": "insured",
+    "occupation": "occupation",
+    "status": "status",
+    "created_at": "created_at",
+}
+
+CLAIM_FIELDS = {
+    "id": "c.id",
+    "claims_code": "c.claims_code",
+    "policy_number": "c.policy_number",
+    "insurance_id": "c.insurance_id",
+    "incident_date": "c.time_of_loss",
+    "description": "c.claim_details",
+    "situation_of_loss": "c.situation_of_loss",
+    "cause_of_loss": "c.cause_of_loss",
+    "claim_status": "c.status",
+    "claim_date": "c.created_at",
+    "insured": "i.insured",
+    "insurance_type": "i.insurance_type",
+    "insurance_code": "i.insurance_code",
+    "total_claim_value": "COALESCE(cv.claim_recommended, 0)",
+    "claim_recommended": """CASE 
+                        WHEN cv.claim_recommended > 0 THEN 'yes'
+                        WHEN cv.claim_recommended = 0 THEN 'no'
+                        ELSE NULL
+                    END""",
+}
+
+REPORT_FIELDS = {
+    "name": "u.name",
+    "email": "u.email",
+    "insurance_code": "i.insurance_code",
+    "insurance_type": "i.insurance_type",
+    "policy_number": "c.policy_number",
+    "claims_code": "c.claims_code",
+    "property_type": "cpd.property_type",
+    "wall_type": "cpd.wall_type",
+    "damage_area": "cpd.damage_area",
+    "rate_per_sqft": "cpd.rate_per_sqft",
+    "confidence": "cpa.confidence",
+    "crack_percent": "cpa.crack_percent",
+    "non_crack_percent": "cpa.non_crack_percent",
+    "ai_decision": "cpa.ai_decision",
+    "file_name": FIRST_IMAGE_SQL,
+    "images": CLAIM_IMAGES_SQL,
+    "claims_id": "c.id",
+    "claim_date": "c.created_at",
+}
+
 
 @insurance_api_bp.route("/policies", methods=["GET"])
 @jwt_required()
+@read_replica
+@conditional_get("policies")
+@cached_response("policies")
 def get_user_insurance_policies():
-    """Get all insurance policies for the current user with full details"""
+    """
+    Get insurance policies for the current user with full details
+    Paginated newest first; supports limit, cursor and fields query parameters
+    """
     conn = get_db()
     user_identity = get_jwt_identity()
 
     try:
+        limit, page_cursor = get_page_args()
+        columns, fields = select_columns(POLICY_FIELDS, required=("created_at", "id"))
+        keyset_sql, keyset_params = keyset_condition("created_at", "id", page_cursor)
+
         with conn.cursor() as cursor:
             # Get user id from username
             sql_user_id = "SELECT id FROM users WHERE username = %s"
@@ -31,31 +120,28 @@ def get_user_insurance_policies():
             
             user_id = row['id']
 
-            # Get all insurance policies with full details for this user
-            sql_insurance = """
+            # Get one page of insurance policies for this user
+            sql_insurance = f"""
                 SELECT 
-                    id,
-                    insurance_code, 
-                    policy_number,
-                    insurance_from,
-                    insurance_to,
-                    insurance_type,
-                    insured,
-                    occupation,
-                    status,
-                    created_at
+                    {columns}
                 FROM insurance 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC
+                WHERE user_id = %s{keyset_sql}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
             """
-            cursor.execute(sql_insurance, (user_id,))
-            insurance_policies = cursor.fetchall()
+            cursor.execute(sql_insurance, (user_id, *keyset_params, limit + 1))
+            insurance_policies, next_cursor = finish_page(
+                cursor.fetchall(), limit, fields, "created_at", "id"
+            )
             
         return jsonify({
             "success": True,
             "user_id": user_id,
-            "insurance_policies": insurance_policies
+            "insurance_policies": insurance_policies,
+            "next_cursor": next_cursor
         })
+    except PaginationError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     finally:
@@ -63,6 +149,7 @@ def get_user_insurance_policies():
 
 
 @insurance_api_bp.route("/policy-numbers", methods=["GET"])
+@cached_response("policy_numbers", scope=PUBLIC_SCOPE)
 def get_policy_numbers():
     """Get policy numbers for a specific insurance code"""
     insurance_code = request.args.get('insurance_code')
@@ -89,12 +176,22 @@ def get_policy_numbers():
 
 @insurance_api_bp.route("/claims/all", methods=["GET"])
 @jwt_required()
+@read_replica
+@conditional_get("claims_all")
+@cached_response("claims_all")
 def get_all_user_claims():
-    """Get all claims for the current user with full details"""
+    """
+    Get claims for the current user with full details
+    Paginated newest first; supports limit, cursor and fields query parameters
+    """
     conn = get_db()
     user_identity = get_jwt_identity()
 
     try:
+        limit, page_cursor = get_page_args()
+        columns, fields = select_columns(CLAIM_FIELDS, required=("claim_date", "id"))
+        keyset_sql, keyset_params = keyset_condition("c.created_at", "c.id", page_cursor)
+
         with conn.cursor() as cursor:
             # Get user id from username
             sql_user_id = "SELECT id FROM users WHERE username = %s"
@@ -106,42 +203,30 @@ def get_all_user_claims():
             
             user_id = row['id']
 
-            # Get all claims with full details for this user
-            sql_claims = """
+            # Get one page of claims with full details for this user
+            sql_claims = f"""
                 SELECT 
-                    c.id,
-                    c.claims_code,
-                    c.policy_number,
-                    c.insurance_id,
-                    c.time_of_loss as incident_date,
-                    c.claim_details as description,
-                    c.situation_of_loss,
-                    c.cause_of_loss,
-                    c.status as claim_status,
-                    c.created_at as claim_date,
-                    i.insured,
-                    i.insurance_type,
-                    i.insurance_code,
-                    COALESCE(cv.claim_recommended, 0) as total_claim_value,
-                    CASE 
-                        WHEN cv.claim_recommended > 0 THEN 'yes'
-                        WHEN cv.claim_recommended = 0 THEN 'no'
-                        ELSE NULL
-                    END as claim_recommended
+                    {columns}
                 FROM claims c
                 LEFT JOIN insurance i ON c.insurance_id = i.insurance_code
-                LEFT JOIN claims_value cv ON c.id = cv.claims_id
-                WHERE c.user_id = %s 
-                ORDER BY c.created_at DESC
+                LEFT JOIN {LATEST_VALUE_JOIN}
+                WHERE c.user_id = %s{keyset_sql}
+                ORDER BY c.created_at DESC, c.id DESC
+                LIMIT %s
             """
-            cursor.execute(sql_claims, (user_id,))
-            claims = cursor.fetchall()
+            cursor.execute(sql_claims, (user_id, *keyset_params, limit + 1))
+            claims, next_cursor = finish_page(
+                cursor.fetchall(), limit, fields, "claim_date", "id"
+            )
             
         return jsonify({
             "success": True,
             "user_id": user_id,
-            "claims": claims
+            "claims": claims,
+            "next_cursor": next_cursor
         })
+    except PaginationError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -188,9 +273,9 @@ def get_assessment_data():
     conn = get_db()
     try:
         with conn.cursor() as cursor:
-            sql = """
+            sql = f"""
                 SELECT 
-                    cpi.file_name,
+                    {FIRST_IMAGE_SQL} AS file_name,
                     cpa.ai_decision,
                     cpa.confidence,
                     cpa.crack_percent,
@@ -200,10 +285,9 @@ def get_assessment_data():
                     cpd.damage_breadth,
                     cpa.id as cpa_id
                 FROM claims as c 
-                LEFT JOIN claim_property_details cpd ON cpd.claims_id = c.id
-                LEFT JOIN claim_property_image cpi ON cpi.claim_property_details_id = cpd.id
-                LEFT JOIN claim_property_assessment cpa ON cpa.claims_id = c.id
-                LEFT JOIN claims_value cv ON cv.claims_id = c.id
+                LEFT JOIN {LATEST_DETAILS_JOIN}
+                LEFT JOIN {LATEST_ASSESSMENT_JOIN}
+                LEFT JOIN {LATEST_VALUE_JOIN}
                 WHERE c.claims_code = %s
             """
             cursor.execute(sql, (claims_code,))
@@ -244,6 +328,7 @@ def get_assessment_data():
 
 @insurance_api_bp.route("/claims/submit-final", methods=["POST"])
 @jwt_required()
+@idempotent("claims_submit_final")
 def submit_final_claim():
     """Submit final claim with all steps data - creates claim record and adds property details, images, and analysis"""
     from werkzeug.utils import secure_filename
@@ -276,8 +361,9 @@ def submit_final_claim():
         damage_height = float(data.get('damage_height', 1))
         rate_per_sqft = float(data.get('rate_per_sqft', 350))
         
-        # Step 2: Get images
+        # Step 2: Get images (or a resumable upload session from /api/uploads)
         images = request.files.getlist('images')
+        upload_id = data.get('upload_id')
         
         # Step 4: Get manual overrides (if any)
         manual_overrides_json = data.get('manual_overrides')
@@ -313,148 +399,173 @@ def submit_final_claim():
             cursor.execute("SELECT id, user_id FROM claims WHERE claims_code = %s", (claims_code,))
             claim_row = cursor.fetchone()
             
+            if claim_row and str(claim_row['user_id']) != str(user_id):
+                return jsonify({"success": False, "error": "Unauthorized - claim belongs to another user"}), 403
+            
+            # Pick up image hashes stored by other workers since the last submission
+            try:
+                refresh_index(cursor)
+            except Exception as e:
+                # Only dedup and analysis reuse depend on it; the claim can still be filed
+                current_app.logger.warning(f"Could not refresh the image hash index: {e}")
+        
+        # End the read-only snapshot before the slow AI work starts
+        conn.commit()
+        
+        uploaded_files = []
+        if upload_id:
+            try:
+                uploaded_files, done = finalize_session(upload_id, user_identity)
+            except UploadError as e:
+                return jsonify({"success": False, "error": str(e)}), e.status
+            if not done:
+                return jsonify({"success": False, "error": "Uploaded images are still being analyzed; retry shortly"}), 409
+        
+        # Process images outside the transaction so no row locks are held during analysis
+        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'app/static/upload_image')
+        os.makedirs(upload_folder, exist_ok=True)
+        
+        total_crack_area = 0
+        analysis_count = 0
+        total_confidence = 0
+        image_rows = []
+        fingerprints = {}
+        embeddings = {}
+        
+        for image_index, image_file in enumerate(images):
+            if image_file and image_file.filename:
+                # Save image
+                filename = secure_filename(image_file.filename)
+                timestamp = int(time.time())
+                unique_filename = f"{timestamp}_{filename}"
+                filepath = os.path.join(upload_folder, unique_filename)
+                with timed("file_save"):
+                    image_file.save(filepath)
+                
+                # Check if there's a manual override for this image
+                override_data = manual_overrides.get(image_index)
+                
+                # Run AI analysis
+                try:
+                    analysis = analyze_claim_image(filepath, override_data, user_id)
+                    if analysis["is_override"]:
+                        current_app.logger.info(f"Using manual override for image {image_index}: {analysis['ai_decision']}")
+                    elif analysis.get("reused_from"):
+                        current_app.logger.info(f"Image {image_index} matches image {analysis['reused_from']}; reusing its analysis")
+                    if analysis["fingerprint"]:
+                        fingerprints[unique_filename] = analysis["fingerprint"]
+                    if analysis["embedding"] is not None:
+                        embeddings[unique_filename] = analysis["embedding"]
+                    confidence = analysis["confidence"]
+                    crack_percent = analysis["crack_percent"]
+                    non_crack_percent = analysis["non_crack_percent"]
+                    ai_decision = analysis["ai_decision"]
+                    crack_area = analysis["crack_area"]
+                    
+                    total_crack_area += crack_area
+                    total_confidence += confidence
+                    analysis_count += 1
+                    
+                    # Queue image record; claim_property_details_id is filled in once it exists
+                    file_ext = os.path.splitext(filename)[1]
+                    image_rows.append((unique_filename, file_ext, f"Uploaded: {filename}"))
+                    
+                except Exception as e:
+                    current_app.logger.error(f"Error processing image {filename}: {e}")
+                    # Continue with other images
+                    continue
+        
+        # Files from an upload session were analyzed while they were being received
+        for uploaded in uploaded_files:
+            analysis = uploaded_file_analysis(
+                uploaded, os.path.join(upload_folder, uploaded['stored_name']),
+                manual_overrides.get(uploaded['file_index'])
+            )
+            if analysis["fingerprint"]:
+                fingerprints[uploaded['stored_name']] = analysis["fingerprint"]
+            if analysis["embedding"]:
+                embeddings[uploaded['stored_name']] = analysis["embedding"]
+            crack_percent = analysis["crack_percent"]
+            non_crack_percent = analysis["non_crack_percent"]
+            ai_decision = analysis["ai_decision"]
+            total_crack_area += analysis["crack_area"]
+            total_confidence += analysis["confidence"]
+            analysis_count += 1
+            file_ext = os.path.splitext(uploaded['file_name'])[1]
+            image_rows.append((uploaded['stored_name'], file_ext, f"Uploaded: {uploaded['file_name']}"))
+        
+        # Calculate claim value
+        claim_recommended = damage_area * rate_per_sqft
+        
+        # Write everything in one short transaction
+        with timed("db.claim_write_transaction"), conn.cursor() as cursor:
+            if upload_id:
+                try:
+                    consume_session(cursor, upload_id)
+                except UploadError as e:
+                    conn.rollback()
+                    return jsonify({"success": False, "error": str(e)}), e.status
+            
             if claim_row:
-                # Claim exists, verify ownership
                 claims_id = claim_row['id']
-                if str(claim_row['user_id']) != str(user_id):
-                    return jsonify({"success": False, "error": "Unauthorized - claim belongs to another user"}), 403
             else:
                 # Create new claim record
-                sql_claim = """
-                    INSERT INTO claims
-                    (user_id, claims_code, insurance_id, claim_details, time_of_loss, 
-                     situation_of_loss, cause_of_loss, policy_number, is_active, status, created_by)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1, 'inactive', %s)
-                """
-                cursor.execute(sql_claim, (
+                cursor.execute(CLAIM_INSERT_SQL, (
                     user_id, claims_code, insurance_code, claim_details,
                     time_of_loss, situation_of_loss, cause_of_loss, policy_number, user_id
                 ))
                 claims_id = cursor.lastrowid
             
             # Insert into claim_property_details
-            sql_property = """
-                INSERT INTO claim_property_details
-                (claims_id, property_type, wall_type, damage_area, damage_length, 
-                 damage_breadth, damage_height, rate_per_sqft, is_active, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1, 'active')
-            """
-            cursor.execute(sql_property, (
+            cursor.execute(PROPERTY_DETAILS_INSERT_SQL, (
                 claims_id, property_type, wall_type, damage_area,
                 damage_length, damage_breadth, damage_height, rate_per_sqft
             ))
             claim_property_details_id = cursor.lastrowid
             
-            # Process images
-            upload_folder = current_app.config.get('UPLOAD_FOLDER', 'app/static/upload_image')
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            total_crack_area = 0
-            analysis_count = 0
-            total_confidence = 0
-            
-            for image_index, image_file in enumerate(images):
-                if image_file and image_file.filename:
-                    # Save image
-                    filename = secure_filename(image_file.filename)
-                    timestamp = int(time.time())
-                    unique_filename = f"{timestamp}_{filename}"
-                    filepath = os.path.join(upload_folder, unique_filename)
-                    image_file.save(filepath)
-                    
-                    # Check if there's a manual override for this image
-                    override_data = manual_overrides.get(image_index)
-                    
-                    # Run AI analysis
-                    try:
-                        if override_data and override_data.get('is_override'):
-                            # Use manual override values
-                            confidence = override_data.get('confidence', 0)
-                            ai_decision = override_data.get('ai_decision', 'Unknown')
-                            crack_length = override_data.get('length_ft', 0)
-                            crack_width = override_data.get('width_ft', 0)
-                            crack_area = override_data.get('area_sqft', 0)
-                            
-                            # Set crack percentages based on decision
-                            if override_data.get('crack_detected'):
-                                crack_percent = confidence
-                                non_crack_percent = 100 - confidence
-                            else:
-                                crack_percent = 0
-                                non_crack_percent = confidence
-                            
-                            current_app.logger.info(f"Using manual override for image {image_index}: {ai_decision}")
-                        else:
-                            # Use AI analysis
-                            from app.routes.earthquake_detection import e_detect_earthquake
-                            from app.routes.image_area_calculater import calculate_crack_area
-                            
-                            # AI Detection
-                            with open(filepath, 'rb') as img_file:
-                                response, status_code = e_detect_earthquake(img_file)
-                                detection_data = response.json
-                                confidence = detection_data.get("confidence", 0)
-                                crack_percent = detection_data.get("probabilities", {}).get("Positive (Crack Detected)", 0)
-                                non_crack_percent = detection_data.get("probabilities", {}).get("Negative (No Crack)", 0)
-                                ai_decision = detection_data.get("predicted_class", "Unknown")
-                            
-                            # Crack area calculation
-                            image_response = calculate_crack_area(filepath)
-                            crack_area = image_response.get('crack_area', 0)
-                            crack_length = image_response.get('length_ft', 0)
-                            crack_width = image_response.get('width_ft', 0)
-                        
-                        total_crack_area += crack_area
-                        total_confidence += confidence
-                        analysis_count += 1
-                        
-                        # Save image record
-                        sql_image = """
-                            INSERT INTO claim_property_image
-                            (claim_property_details_id, file_name, file_format, file_desc)
-                            VALUES (%s, %s, %s, %s)
-                        """
-                        file_ext = os.path.splitext(filename)[1]
-                        cursor.execute(sql_image, (
-                            claim_property_details_id, unique_filename, file_ext, f"Uploaded: {filename}"
-                        ))
-                        
-                    except Exception as e:
-                        current_app.logger.error(f"Error processing image {filename}: {e}")
-                        # Continue with other images
-                        continue
+            # Save all image records in a single multi-row insert
+            image_ids = []
+            if image_rows:
+                cursor.executemany(CLAIM_IMAGE_INSERT_SQL, [
+                    (claim_property_details_id, file_name, file_format, file_desc)
+                    for file_name, file_format, file_desc in image_rows
+                ])
+                if fingerprints or embeddings:
+                    image_ids = claim_image_ids(cursor, claim_property_details_id)
+                store_hashes(cursor, image_ids, claims_id, fingerprints)
             
             # Save assessment (average of all images)
             if analysis_count > 0:
                 avg_confidence = total_confidence / analysis_count
-                sql_assessment = """
-                    INSERT INTO claim_property_assessment
-                    (claims_id, confidence, crack_percent, non_crack_percent, ai_decision)
-                    VALUES (%s, %s, %s, %s, %s)
-                """
-                cursor.execute(sql_assessment, (
+                cursor.execute(ASSESSMENT_INSERT_SQL, (
                     claims_id, avg_confidence, crack_percent, non_crack_percent, ai_decision
                 ))
             
-            # Calculate claim value
-            claim_recommended = damage_area * rate_per_sqft
-            
             # Save to claims_value
-            sql_value = """
-                INSERT INTO claims_value
-                (claims_id, claim_recommended)
-                VALUES (%s, %s)
-            """
-            cursor.execute(sql_value, (claims_id, claim_recommended))
+            value_delta = claim_value_change(cursor, claims_id, claim_recommended)
+            cursor.execute(CLAIM_VALUE_INSERT_SQL, (claims_id, claim_recommended))
             
             # Update claim status to active
-            cursor.execute(
-                "UPDATE claims SET status = 'active' WHERE id = %s",
-                (claims_id,)
-            )
+            cursor.execute(CLAIM_ACTIVATE_SQL, (claims_id,))
             
+            apply_user_stats_delta(
+                cursor, user_id, claims=0 if claim_row else 1, pictures=len(image_rows), claim_value=value_delta
+            )
+            bump_data_version(cursor, user_id)
             conn.commit()
         
+        invalidate_user_cache(user_identity)
+        
+        try:
+            store_embeddings(image_ids, embeddings)
+        except Exception as e:
+            current_app.logger.warning(f"Could not store image embeddings for claim {claims_code}: {e}")
+        
+        # Matches name other users' claims, so they go to the adjusters' log, not to the submitter
+        possible_duplicates = duplicate_report(fingerprints, claims_id)
+        if possible_duplicates:
+            current_app.logger.warning(f"Claim {claims_code} has images matching other claims: {possible_duplicates}")
+        
         return jsonify({
             "success": True,
             "message": "Claim submitted successfully",
@@ -462,7 +573,7 @@ def submit_final_claim():
             "claims_code": claims_code,
             "claim_property_details_id": claim_property_details_id,
             "total_claim_value": claim_recommended,
-            "images_processed": len(images)
+            "images_processed": len(images) + len(uploaded_files)
         }), 201
         
     except Exception as e:
@@ -561,9 +672,12 @@ def save_manual_override():
                 length_ft, width_ft, area_sqft, claim_recommended, crack_detected
             ))
             
+            bump_data_version(cursor, claim_row['user_id'])
             conn.commit()
             
             override_id = cursor.lastrowid if cursor.lastrowid else None
+        
+        invalidate_user_cache(user_identity)
             
         return jsonify({
             "success": True,
@@ -583,12 +697,21 @@ def save_manual_override():
 
 @insurance_api_bp.route("/reports", methods=["GET"])
 @jwt_required()
+@read_replica
+@conditional_get("reports")
+@cached_response("reports")
 def get_insurance_reports():
-    """Get all insurance reports for the current user"""
+    """
+    Get insurance reports for the current user
+    Paginated by claim, newest first; supports limit, cursor and fields query parameters
+    """
     conn = get_db()
     
     try:
         user_identity = get_jwt_identity()
+        limit, page_cursor = get_page_args()
+        columns, fields = select_columns(REPORT_FIELDS, required=("claim_date", "claims_id"))
+        keyset_sql, keyset_params = keyset_condition("c.created_at", "c.id", page_cursor)
 
         with conn.cursor() as cursor:
             sql_user_id = "SELECT id FROM users WHERE username = %s"
@@ -596,44 +719,61 @@ def get_insurance_reports():
             user_row = cursor.fetchone()
             
             if not user_row:
-                return jsonify({"success": True, "reports": []}), 200
+                return jsonify({"success": True, "reports": [], "next_cursor": None}), 200
             
             user_id = user_row['id']
 
-        with conn.cursor() as cursor:
-            sql_data = """
+            # One row per claim: latest details and assessment, images nested
+            sql_data = f"""
                 SELECT 
-                    u.name,
-                    u.email,
-                    i.insurance_code,
-                    i.insurance_type,
-                    c.policy_number,
-                    c.claims_code,
-                    cpd.property_type,
-                    cpd.wall_type,
-                    cpd.damage_area,
-                    cpd.rate_per_sqft,
-                    cpa.confidence,
-                    cpa.crack_percent,
-                    cpa.non_crack_percent,
-                    cpa.ai_decision,
-                    cpi.file_name
+                    {columns}
                 FROM users AS u
                 INNER JOIN insurance AS i ON i.user_id = u.id
                 INNER JOIN claims AS c ON c.insurance_id = i.insurance_code
-                INNER JOIN claim_property_details AS cpd ON cpd.claims_id = c.id
-                INNER JOIN claim_property_assessment AS cpa ON cpa.claims_id = cpd.claims_id
-                INNER JOIN claim_property_image AS cpi ON cpi.claim_property_details_id = cpd.id
-                WHERE u.id = %s
+                INNER JOIN {LATEST_DETAILS_JOIN}
+                INNER JOIN {LATEST_ASSESSMENT_JOIN}
+                WHERE u.id = %s{keyset_sql}
+                ORDER BY c.created_at DESC, c.id DESC
+                LIMIT %s
             """
-            cursor.execute(sql_data, (user_id,))
-            records = cursor.fetchall()
+            cursor.execute(sql_data, (user_id, *keyset_params, limit + 1))
+            records, next_cursor = finish_page(
+                cursor.fetchall(), limit, fields, "claim_date", "claims_id"
+            )
+            nest_images(records)
 
         return jsonify({
             "success": True,
-            "reports": records if records else []
+            "reports": records if records else [],
+            "next_cursor": next_cursor
         })
 
+    except PaginationError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        conn.close()
+
+
+@insurance_api_bp.route("/similar-images", methods=["GET"])
+@jwt_required()
+@read_replica
+def get_similar_images():
+    """
+    Claim images with the most similar damage to a given image (cosine similarity of model embeddings)
+    Query: image_id, k (default 10)
+    """
+    image_id = request.args.get('image_id', type=int)
+    if not image_id:
+        return jsonify({"success": False, "message": "image_id parameter required"}), 400
+    k = request.args.get('k', 10, type=int)
+
+    conn = get_db()
+    try:
+        with conn.cursor() as cursor:
+            status, payload = similar_images(cursor, get_jwt_identity(), image_id, k)
+        return jsonify(payload), status
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     finally:
@@ -651,37 +791,10 @@ def get_damage_calculation():
     conn = get_db()
     try:
         with conn.cursor() as cursor:
-            sql_user_id = "SELECT user_id FROM claims WHERE id=%s"
-            cursor.execute(sql_user_id, (claims_id,))
-            result = cursor.fetchone()
-            
-            if not result:
-                return jsonify({"success": False, "message": "Claim not found"}), 404
-            
-            user_id = result.get('user_id')
-            
-            sql = """
-                SELECT 
-                    u.name,
-                    c.insurance_id AS insurance_id,
-                    c.policy_number AS policy_number,
-                    c.claims_code AS claim_id,
-                    cpi.file_name,
-                    cpa.ai_decision,
-                    cpa.confidence,
-                    cpa.crack_percent,
-                    cpa.non_crack_percent,
-                    cv.claim_recommended
-                FROM users as u
-                INNER JOIN claims as c ON c.user_id = u.id
-                LEFT JOIN claim_property_details cpd ON cpd.claims_id = c.id
-                LEFT JOIN claim_property_image cpi ON cpi.claim_property_details_id = cpd.id
-                LEFT JOIN claim_property_assessment cpa ON cpa.claims_id = c.id
-                LEFT JOIN claims_value cv ON cv.claims_id = c.id
-                WHERE u.id = %s
-            """
-            cursor.execute(sql, (user_id,))
-            records = cursor.fetchall()
+            records = repository.get_damage_calculation(cursor, claims_id)
+
+        if not records:
+            return jsonify({"success": False, "message": "Claim not found"}), 404
         
         return jsonify({
             "success": True,
@@ -0,0 +1,97 @@
+"""
+Uploads API Routes
+Resumable chunked uploads for large claim image sets
+"""
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.uploads import (
+    UploadError, create_session, session_status, write_chunk, finalize_session, batch_result
+)
+
+uploads_api_bp = Blueprint("uploads_api", __name__, url_prefix="/api/uploads")
+
+
+@uploads_api_bp.route("", methods=["POST"])
+@jwt_required()
+def create_upload():
+    """
+    Open an upload session
+    Body: {"files": [{"name": "wall.jpg", "size": 12345678}, ...]}
+    """
+    payload = request.get_json(silent=True) or {}
+    files = payload.get("files")
+    if not isinstance(files, list):
+        return jsonify({"success": False, "error": "files list is required"}), 400
+
+    try:
+        upload_id, entries = create_session(get_jwt_identity(), files)
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "upload_id": upload_id,
+        "chunk_size": current_app.config.get("UPLOAD_CHUNK_SIZE"),
+        "files": entries
+    }), 201
+
+
+@uploads_api_bp.route("/<upload_id>", methods=["GET"])
+@jwt_required()
+def get_upload(upload_id):
+    """Received byte ranges per file, so an interrupted client can resend only the gaps"""
+    try:
+        status = session_status(upload_id, get_jwt_identity())
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, **status}), 200
+
+
+@uploads_api_bp.route("/<upload_id>/files/<int:file_index>", methods=["PUT"])
+@jwt_required()
+def put_chunk(upload_id, file_index):
+    """
+    Store one chunk of a file
+    Query: offset=<byte offset>; body: the raw chunk bytes
+    """
+    offset = request.args.get("offset", type=int)
+    try:
+        status = write_chunk(
+            upload_id, get_jwt_identity(), file_index, offset, request.stream, request.content_length
+        )
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "complete": status["received_bytes"] == status["size"],
+        **status
+    }), 200
+
+
+@uploads_api_bp.route("/<upload_id>/finalize", methods=["POST"])
+@jwt_required()
+def finalize_upload(upload_id):
+    """
+    Close the session and return every file's analysis in the batch-analyze format
+    Answers 202 if some files are still being analyzed; call again to collect them
+    """
+    try:
+        files, done = finalize_session(upload_id, get_jwt_identity())
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "upload_id": upload_id,
+        "complete": done,
+        "results": [batch_result(file) for file in files]
+    }), 200 if done else 202
@@ -1,7 +1,6 @@
 from flask import Blueprint, request, jsonify
-import torch
-from PIL import Image
-from app.models.crack_classifier import CrackClassifier, inference_transforms, device, model, CLASS_LABELS  # your model file path
+from app.inference import classify_image
+from app.image_quality import quality_gate, rejection
 
 earthquake_bp = Blueprint("earthquake", __name__)
 
@@ -15,17 +14,18 @@ def detect_earthquake_route():
 
 def e_detect_earthquake(image_file):
     try:
-        img = Image.open(image_file).convert("RGB")
-        img_tensor = inference_transforms(img).to(device)
-        with torch.no_grad():
-            output = model(img_tensor.unsqueeze(0))
-        probabilities = torch.softmax(output, dim=1).squeeze().tolist()
-        max_prob_idx = int(torch.argmax(output, dim=1).item())
+        quality, rejected = quality_gate(getattr(image_file, "stream", image_file))
+        if rejected:
+            body = rejection(quality)
+            return jsonify({"error": body["error"], "quality": quality}), 422
+
+        prediction = classify_image(image_file)
 
         result = {
-            "predicted_class": CLASS_LABELS[max_prob_idx], 
-            "confidence": round(probabilities[max_prob_idx]*100, 2),  # percentage
-            "probabilities": {CLASS_LABELS[i]: round(p*100, 2) for i, p in enumerate(probabilities)}
+            "predicted_class": prediction["predicted_class"],
+            "confidence": prediction["confidence"],  # percentage
+            "probabilities": prediction["probabilities"],
+            "quality": quality
         }
         return jsonify(result), 200
 
@@ -192,34 +192,36 @@ matplotlib.use('Agg')  # ✅ Prevent GUI crash in Flask threads
 import matplotlib.pyplot as plt
 import os
 import random
+from app.metrics import timed
 
 def calculate_crack_area(image_path, pixels_per_inch=96, save_plot=True, save_path=None):
     """
     Detect crack length and width, convert both to feet, calculate area (sq.ft),
     and save a compact crack detection plot image for frontend use.
     """
-    # --- Load Image ---
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"Image not found or unreadable: {image_path}")
-
-    # --- Convert to Grayscale & Enhance ---
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    gray = cv2.equalizeHist(gray)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-    # --- Edge Detection ---
-    edges = cv2.Canny(blurred, 40, 150)
-    kernel = np.ones((3, 3), np.uint8)
-    dilated = cv2.dilate(edges, kernel, iterations=2)
-
-    # --- Find Contours ---
-    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    if not contours:
-        return {'status': 'error', 'message': 'No cracks detected'}
-
-    # --- Largest Contour (main crack) ---
-    largest_contour = max(contours, key=cv2.contourArea)
+    with timed("opencv"):
+        # --- Load Image ---
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Image not found or unreadable: {image_path}")
+
+        # --- Convert to Grayscale & Enhance ---
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = cv2.equalizeHist(gray)
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        # --- Edge Detection ---
+        edges = cv2.Canny(blurred, 40, 150)
+        kernel = np.ones((3, 3), np.uint8)
+        dilated = cv2.dilate(edges, kernel, iterations=2)
+
+        # --- Find Contours ---
+        contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return {'status': 'error', 'message': 'No cracks detected'}
+
+        # --- Largest Contour (main crack) ---
+        largest_contour = max(contours, key=cv2.contourArea)
 
     # --- Bounding box for length and width ---
     rect = cv2.minAreaRect(largest_contour)
@@ -242,32 +244,33 @@ def calculate_crack_area(image_path, pixels_per_inch=96, save_plot=True, save_pa
     saved_plot_path = None
     filename = None
     if save_plot:
-        overlay = image.copy()
-        cv2.drawContours(overlay, [largest_contour], -1, (255, 0, 0), 2)  # Red cracks
-
-        # Create smaller figure for frontend
-        fig, ax = plt.subplots(1, 2, figsize=(7, 4))
-        ax[0].imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-        ax[0].set_title("Original")
-        ax[0].axis("off")
-
-        ax[1].imshow(cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB))
-        ax[1].set_title(f"Crack\nL: {length_ft:.2f} ft | W: {width_ft:.2f} ft\nA: {area_sqft:.3f} sq.ft")
-        ax[1].axis("off")
-
-        plt.tight_layout()
-
-        # ✅ Proper unique filename
-        if save_path is None:
-            filename = f"crack_detection_result_small_{random_number}.png"
-            save_path = os.path.join(os.path.dirname(image_path), filename)
-        else:
-            filename = os.path.basename(save_path)
-
-        plt.savefig(save_path, dpi=100, bbox_inches='tight')
-        plt.close(fig)
-        saved_plot_path = save_path
-        print(f"Plot saved (frontend size): {save_path}")
+        with timed("matplotlib"):
+            overlay = image.copy()
+            cv2.drawContours(overlay, [largest_contour], -1, (255, 0, 0), 2)  # Red cracks
+
+            # Create smaller figure for frontend
+            fig, ax = plt.subplots(1, 2, figsize=(7, 4))
+            ax[0].imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            ax[0].set_title("Original")
+            ax[0].axis("off")
+
+            ax[1].imshow(cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB))
+            ax[1].set_title(f"Crack\nL: {length_ft:.2f} ft | W: {width_ft:.2f} ft\nA: {area_sqft:.3f} sq.ft")
+            ax[1].axis("off")
+
+            plt.tight_layout()
+
+            # ✅ Proper unique filename
+            if save_path is None:
+                filename = f"crack_detection_result_small_{random_number}.png"
+                save_path = os.path.join(os.path.dirname(image_path), filename)
+            else:
+                filename = os.path.basename(save_path)
+
+            plt.savefig(save_path, dpi=100, bbox_inches='tight')
+            plt.close(fig)
+            saved_plot_path = save_path
+            print(f"Plot saved (frontend size): {save_path}")
 
     return {
         'status': 'success',
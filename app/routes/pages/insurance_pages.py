@@ -5,6 +5,13 @@ Handles form submissions and data processing
 """
 from flask import Blueprint, render_template, request, redirect, current_app, jsonify, abort
 from app.db import get_db
+from app.user_stats import (
+    apply_user_stats_delta, apply_user_stats_delta_for_claim, is_new_policy, claim_value_change
+)
+from app.cache import invalidate_user_cache, invalidate_claim_owner_cache
+from app.data_version import bump_data_version, bump_data_version_for_claim
+from app.metrics import timed
+from app.repository import get_new_report_data, get_damage_calculation, get_claim_create_check
 from werkzeug.utils import secure_filename
 import os
 import traceback
@@ -63,6 +70,7 @@ def submit_insurance_detail():
                 return jsonify({"success": False, "message": "User not found"}), 404
             
             user_id = row['id']
+            new_policy = is_new_policy(cursor, user_id, policy_number)
             
             # Insert insurance record
             sql = """
@@ -75,7 +83,10 @@ def submit_insurance_detail():
                 insurance_type, insured, occupation, insurance_details,
                 status, user_id, policy_number
             ))
+            apply_user_stats_delta(cursor, user_id, insurances=1, policies=int(new_policy))
+            bump_data_version(cursor, user_id)
             conn.commit()
+            invalidate_user_cache(username, public=True)
             return redirect('/insurance_claims_detail?user_id=' + str(user_id))
     except Exception as e:
         conn.rollback()
@@ -117,10 +128,9 @@ def submit_insurance_claims():
 
     try:
         with conn.cursor() as cursor:
-            # Check if claims_code already exists
-            cursor.execute("SELECT id FROM claims WHERE claims_code = %s", (claims_code,))
-            existing = cursor.fetchone()
-            if existing:
+            # Check if claims_code already exists (and get the owner's username)
+            username, code_taken = get_claim_create_check(cursor, user_id, claims_code)
+            if code_taken:
                 return jsonify({"success": False, "error": "Claims code already exists. Please use a different code."}), 400
             
             sql = """
@@ -133,8 +143,11 @@ def submit_insurance_claims():
                 time_of_loss, situation_of_loss, cause_of_loss,
                 1, 'inactive', user_id, policy_number
             ))
-            conn.commit()
             inserted_id = cursor.lastrowid
+            apply_user_stats_delta(cursor, user_id, claims=1)
+            bump_data_version(cursor, user_id)
+            conn.commit()
+            invalidate_user_cache(username)
         
         # Return JSON success response instead of redirect
         return jsonify({
@@ -179,12 +192,13 @@ def submit_damaged_property_image():
     os.makedirs(upload_folder, exist_ok=True)
 
     filepath = os.path.join(upload_folder, filename)
-    file.save(filepath)
+    with timed("file_save"):
+        file.save(filepath)
     
     try:
         # Image Analysis - Calculate crack area
-        from app.routes.image_area_calculater import calculate_crack_area
-        image_response = calculate_crack_area(filepath)
+        from app.inference import measure_crack
+        image_response = measure_crack(filepath)
         crack_area = image_response['crack_area']
         crack_file_image_path = image_response['plot_path']
         crack_filename = image_response['filename']
@@ -199,6 +213,9 @@ def submit_damaged_property_image():
         from app.routes.earthquake_detection import e_detect_earthquake
         response, status_code = e_detect_earthquake(img_file)
         detection_data = response.json
+        if status_code == 422:
+            return jsonify({"success": False, "message": detection_data["error"],
+                            "quality": detection_data["quality"]}), 422
         confidence = detection_data.get("confidence")
         crack_percent = detection_data.get("probabilities", {}).get("Positive (Crack Detected)")
         non_crack_percent = detection_data.get("probabilities", {}).get("Negative (No Crack)")
@@ -244,7 +261,12 @@ def submit_damaged_property_image():
                 claim_property_details_id, crack_filename, crack_file_image_path,
                 file_format, file_desc, 1, 'inactive'
             ))
+            if claims_id:
+                apply_user_stats_delta_for_claim(cursor, claims_id, pictures=1)
+                bump_data_version_for_claim(cursor, claims_id)
             conn.commit()
+            if claims_id:
+                invalidate_claim_owner_cache(cursor, claims_id)
     except Exception as e:
         conn.rollback()
         error_message = f"Error saving file or assessment info: {e}\n{traceback.format_exc()}"
@@ -317,13 +339,17 @@ def submit_damaged_property():
             ))
             
             if claims_id and claim_recommended:
+                value_delta = claim_value_change(cursor, claims_id, claim_recommended_usd)
                 sql_claims_value = """
                     INSERT INTO claims_value (claims_id, claim_recommended)
                     VALUES (%s, %s)
                 """
                 cursor.execute(sql_claims_value, (claims_id, claim_recommended_usd))
+                apply_user_stats_delta_for_claim(cursor, claims_id, claim_value=value_delta)
             
+            bump_data_version_for_claim(cursor, claims_id)
             conn.commit()
+            invalidate_claim_owner_cache(cursor, claims_id)
     except Exception as e:
         conn.rollback()
         current_app.logger.error(f"Error updating damaged property: {e}")
@@ -348,23 +374,14 @@ def new_report():
     conn = get_db()
     try:
         with conn.cursor() as cursor:
-            # Get claim details including claims_id, user_id, insurance_id, and policy_number
-            cursor.execute(
-                "SELECT id, user_id, insurance_id, policy_number FROM claims WHERE claims_code=%s", 
-                (claims_code,)
-            )
-            claim_data = cursor.fetchone()
+            # Claim, the user's insurance codes and latest property details in one query
+            claim_data = get_new_report_data(cursor, claims_code)
             
             if claim_data is None:
                 abort(404, description="Claim not found")
             
-            # Extract data from claim
-            claims_id = claim_data['id']
-            user_id = claim_data['user_id']
-            
-            # Get insurance codes for user
-            cursor.execute("SELECT insurance_code FROM insurance WHERE user_id=%s", (user_id,))
-            all_insurance_code = cursor.fetchall()
+            claims_id = claim_data['claims_id']
+            all_insurance_code = claim_data['insurance_codes']
 
             # Get selected insurance
             selected_insurance = {'insurance_id': claim_data['insurance_id']}
@@ -375,15 +392,9 @@ def new_report():
             # Get selected claim
             selected_claim = {'claims_code': claims_code}
             
-            # Get claim_property_details_id if not provided
+            # Latest claim_property_details_id if not provided
             if not claim_property_details_id:
-                cursor.execute(
-                    "SELECT id FROM claim_property_details WHERE claims_id=%s ORDER BY id DESC LIMIT 1",
-                    (claims_id,)
-                )
-                cpd = cursor.fetchone()
-                if cpd:
-                    claim_property_details_id = cpd['id']
+                claim_property_details_id = claim_data['claim_property_details_id']
 
         return render_template(
             'new_report.html',
@@ -423,7 +434,11 @@ def submit_claim_report():
                 WHERE id = %s
             """
             cursor.execute(sql, (user_inference, final_damage_area, final_damage_cost, cpa_id))
+            if claims_id:
+                bump_data_version_for_claim(cursor, claims_id)
             conn.commit()
+            if claims_id:
+                invalidate_claim_owner_cache(cursor, claims_id)
 
         return redirect(f'/new_report?claims_id={claims_id}&claim_property_details_id={claim_property_details_id}&claims_code={claims_code}&user_inference={user_inference}&final_damage_area={final_damage_area}&final_damage_cost={final_damage_cost}')
     finally:
@@ -438,29 +453,7 @@ def damaged_property_calculation():
     
     try:
         with conn.cursor() as cursor:
-            sql_user_id = "SELECT user_id FROM claims WHERE id=%s"
-            cursor.execute(sql_user_id, (claims_id,))
-            result = cursor.fetchone()
-            
-            user_id = result.get('user_id') if result else 'NULL'
-            
-            sql = """
-                SELECT 
-                    u.name, c.insurance_id AS insurance_id,
-                    c.policy_number AS policy_number, c.claims_code AS claim_id,
-                    cpi.file_name, cpa.ai_decision, cpa.confidence,
-                    cpa.crack_percent, cpa.non_crack_percent,
-                    cv.claim_recommended
-                FROM users as u
-                INNER JOIN claims as c ON c.user_id = u.id
-                LEFT JOIN claim_property_details cpd ON cpd.claims_id = c.id
-                LEFT JOIN claim_property_image cpi ON cpi.claim_property_details_id = cpd.id
-                LEFT JOIN claim_property_assessment cpa ON cpa.claims_id = c.id
-                LEFT JOIN claims_value cv ON cv.claims_id = c.id
-                WHERE u.id= %s
-            """
-            cursor.execute(sql, (user_id,))
-            records = cursor.fetchall()
+            records = get_damage_calculation(cursor, claims_id)
         
         return render_template('damaged_property_calculation.html', records=records)
     except Exception as e:
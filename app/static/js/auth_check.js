@@ -5,6 +5,24 @@ function checkAuth() {
   }
 }
 
+async function refreshToken() {
+  const refresh = localStorage.getItem('refresh_token');
+  if (!refresh) {
+    return false;
+  }
+  const response = await fetch('/api/auth/refresh', {
+    method: 'POST',
+    headers: { 'Authorization': 'Bearer ' + refresh }
+  });
+  if (!response.ok) {
+    return false;
+  }
+  const result = await response.json();
+  localStorage.setItem('token', result.token);
+  localStorage.setItem('refresh_token', result.refresh_token);
+  return true;
+}
+
 async function verifyToken() {
   const token = localStorage.getItem('token');
   if (!token) {
@@ -14,8 +32,10 @@ async function verifyToken() {
       method: 'GET',
       headers: { 'Authorization': 'Bearer ' + token }
     });
-    if (!response.ok) {
+    // Expired access token: try the refresh token before sending the user back to login
+    if (!response.ok && !(await refreshToken())) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       window.location.href = '/';  // Redirect to login if token invalid
     }
   }
@@ -37,6 +37,7 @@ document.getElementById('loginForm').addEventListener('submit', async function(e
     if (result.success) {
         // Store the token on successful login
         localStorage.setItem('token', result.token);
+        localStorage.setItem('refresh_token', result.refresh_token);
         
         messageBox.textContent = "Login successful";
         messageBox.style.color = "limegreen";
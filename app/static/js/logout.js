@@ -6,9 +6,14 @@ document.addEventListener('DOMContentLoaded', function () {
       const token = localStorage.getItem('token');
       await fetch('/api/auth/logout', {
         method: 'POST',
-        headers: { 'Authorization': 'Bearer ' + token }
+        headers: {
+          'Authorization': 'Bearer ' + token,
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ refresh_token: localStorage.getItem('refresh_token') })
       });
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       window.location.href = '/'; // redirect to login
     });
   }
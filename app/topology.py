@@ -0,0 +1,43 @@
+"""
+Worker Topology
+Picks gunicorn workers x torch intra-op threads so that together they use the
+available cores without oversubscribing them. Kept free of torch imports so
+server config files can use it.
+"""
+import os
+
+
+def available_cpus():
+    """Cores this process may run on (respects taskset / container cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def recommended_topology(cpus=None, workers=None):
+    """
+    Workers and threads per worker for CPU inference
+    Small per-worker thread counts scale better than one wide worker for
+    single-image requests, so threads grow only once there are spare cores.
+    """
+    cpus = cpus or available_cpus()
+    if workers:
+        workers = max(1, min(workers, cpus))
+    else:
+        threads = 1 if cpus < 4 else 2 if cpus < 16 else 4
+        workers = max(1, cpus // threads)
+    return {
+        "workers": workers,
+        "intra_op_threads": max(1, cpus // workers),
+        "interop_threads": 1,
+    }
+
+
+def torch_thread_settings(num_threads=0, interop_threads=0, workers=0):
+    """Resolve (intra_op, interop) thread counts; 0 means derive from the recommended topology"""
+    topology = recommended_topology(workers=workers or None)
+    return (
+        num_threads or topology["intra_op_threads"],
+        interop_threads or topology["interop_threads"],
+    )
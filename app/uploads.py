@@ -0,0 +1,528 @@
+"""
+Resumable Uploads
+Chunked upload sessions for large claim image sets on unreliable networks.
+
+A session lists its files up front; each file is preallocated in
+UPLOAD_FOLDER and chunks are written straight into it at their offset, so
+nothing is reassembled afterwards. Received byte ranges are kept in
+upload_chunks, which lets a client that lost its connection ask what
+arrived and resend only the gaps. As soon as a file is complete, its crack
+classification and measurement start on a background thread; finalizing the
+session only waits for whatever analysis is still running.
+
+Finalized sessions are read by /api/uploads/<id>/finalize (batch-analyze
+results) and consumed by claim submit-final (upload_id form field), which
+marks the session 'consumed' in the claim's transaction so its images are
+attached to one claim only. An analysis still 'analyzing' after
+UPLOAD_ANALYSIS_STALE_SECONDS (its worker died or was recycled) is started
+again by the next finalize.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app.db import get_db
+from app.embeddings import get_store
+from app.image_quality import quality_gate, rejection
+from app.inference import classify_image, measure_crack
+from app.metrics import QUEUE_DEPTH, timed
+
+COPY_BUFFER_BYTES = 1024 * 1024
+POLL_INTERVAL_SECONDS = 0.5
+# Finalize blocks a web worker; stay far below gunicorn's 120 s timeout whatever the config says
+MAX_WAIT_SECONDS = 30
+
+UPLOAD_SESSIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS upload_sessions (
+        id CHAR(32) PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'open',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_upload_sessions_created (created_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+UPLOAD_FILES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS upload_files (
+        upload_id CHAR(32) NOT NULL,
+        file_index INT NOT NULL,
+        file_name VARCHAR(255) NOT NULL,
+        stored_name VARCHAR(255) NOT NULL,
+        size BIGINT NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'receiving',
+        analysis_started_at TIMESTAMP NULL,
+        analysis MEDIUMTEXT NULL,
+        PRIMARY KEY (upload_id, file_index),
+        FOREIGN KEY (upload_id) REFERENCES upload_sessions(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+UPLOAD_CHUNKS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS upload_chunks (
+        upload_id CHAR(32) NOT NULL,
+        file_index INT NOT NULL,
+        start_offset BIGINT NOT NULL,
+        end_offset BIGINT NOT NULL,
+        PRIMARY KEY (upload_id, file_index, start_offset),
+        FOREIGN KEY (upload_id, file_index) REFERENCES upload_files(upload_id, file_index) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+SESSION_FILES_SQL = """
+    SELECT s.username, s.status AS session_status, f.file_index, f.file_name,
+           f.stored_name, f.size, f.status, f.analysis
+    FROM upload_sessions s
+    JOIN upload_files f ON f.upload_id = s.id
+    WHERE s.id = %s
+    ORDER BY f.file_index
+"""
+
+CHUNK_INSERT_SQL = """
+    INSERT INTO upload_chunks (upload_id, file_index, start_offset, end_offset)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE end_offset = GREATEST(end_offset, VALUES(end_offset))
+"""
+
+FILE_LOCK_SQL = """
+    SELECT status FROM upload_files
+    WHERE upload_id = %s AND file_index = %s
+    FOR UPDATE
+"""
+
+# Locking read, so it sees chunks committed while this transaction waited for FILE_LOCK_SQL
+FILE_CHUNKS_SQL = """
+    SELECT start_offset, end_offset FROM upload_chunks
+    WHERE upload_id = %s AND file_index = %s
+    FOR UPDATE
+"""
+
+# Only one worker wins the switch to 'analyzing' and starts the analysis
+FILE_COMPLETE_SQL = """
+    UPDATE upload_files SET status = 'analyzing', analysis_started_at = NOW()
+    WHERE upload_id = %s AND file_index = %s AND status = 'receiving'
+"""
+
+# Take over an analysis whose worker died or was recycled; one finalizer wins each file
+FILE_REQUEUE_SQL = """
+    UPDATE upload_files SET analysis_started_at = NOW()
+    WHERE upload_id = %s AND file_index = %s AND status = 'analyzing'
+      AND analysis_started_at < NOW() - INTERVAL %s SECOND
+"""
+
+# Sessions that hold files on disk without belonging to a claim yet
+PENDING_SESSIONS_SQL = """
+    SELECT COUNT(*) AS pending FROM upload_sessions
+    WHERE username = %s AND status IN ('open', 'finalized')
+"""
+
+SESSION_CONSUME_SQL = """
+    UPDATE upload_sessions SET status = 'consumed'
+    WHERE id = %s AND status = 'finalized'
+"""
+
+FILE_ANALYZED_SQL = """
+    UPDATE upload_files SET status = %s, analysis = %s
+    WHERE upload_id = %s AND file_index = %s
+"""
+
+_tables_ready = False
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """Invalid upload request; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def ensure_upload_tables(cursor):
+    """Create the upload tables once per process"""
+    global _tables_ready
+    if not _tables_ready:
+        cursor.execute(UPLOAD_SESSIONS_TABLE_SQL)
+        cursor.execute(UPLOAD_FILES_TABLE_SQL)
+        cursor.execute(UPLOAD_CHUNKS_TABLE_SQL)
+        _tables_ready = True
+
+
+def merge_ranges(chunks):
+    """Merge (start, end) byte ranges into sorted, non-overlapping [start, end] pairs"""
+    merged = []
+    for start, end in sorted(chunks):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _file_path(stored_name):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], stored_name)
+
+
+def _purge_expired(cursor):
+    """
+    Drop sessions older than UPLOAD_SESSION_TTL_HOURS
+    Files of sessions no claim consumed (open or finalized) are deleted; consumed ones belong to a claim.
+    The rows stay locked until the caller commits, so a claim cannot consume a session being purged.
+    """
+    cursor.execute(
+        "SELECT id, status FROM upload_sessions WHERE created_at < NOW() - INTERVAL %s HOUR FOR UPDATE",
+        (current_app.config.get("UPLOAD_SESSION_TTL_HOURS", 24),)
+    )
+    for row in cursor.fetchall():
+        if row['status'] != 'consumed':
+            cursor.execute("SELECT stored_name FROM upload_files WHERE upload_id = %s", (row['id'],))
+            for file_row in cursor.fetchall():
+                try:
+                    os.remove(_file_path(file_row['stored_name']))
+                except OSError:
+                    pass
+        cursor.execute("DELETE FROM upload_sessions WHERE id = %s", (row['id'],))
+
+
+def create_session(username, files):
+    """
+    Open a session for the given [{"name", "size"}] list and preallocate each file
+    Returns (upload_id, [{"file_index", "file_name", "size"}])
+    """
+    config = current_app.config
+    if not files:
+        raise UploadError("No files listed")
+    if len(files) > config.get("UPLOAD_MAX_FILES", 100):
+        raise UploadError(f"At most {config.get('UPLOAD_MAX_FILES', 100)} files per upload")
+
+    upload_id = secrets.token_hex(16)
+    entries = []
+    for index, item in enumerate(files):
+        name = secure_filename(str(item.get("name") or ""))
+        try:
+            size = int(item.get("size"))
+        except (TypeError, ValueError):
+            raise UploadError(f"File {index}: size must be an integer")
+        if not name:
+            raise UploadError(f"File {index}: name is required")
+        if size <= 0 or size > config.get("UPLOAD_MAX_FILE_BYTES", 200 * 1024 * 1024):
+            raise UploadError(f"File {index}: size must be between 1 and {config.get('UPLOAD_MAX_FILE_BYTES')} bytes", 413)
+        entries.append((index, name, f"upload_{upload_id[:12]}_{index}_{name}", size))
+
+    os.makedirs(config['UPLOAD_FOLDER'], exist_ok=True)
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            ensure_upload_tables(cursor)
+            _purge_expired(cursor)
+            # Its files are already gone; keep the purge even if this session is refused
+            conn.commit()
+            cursor.execute(PENDING_SESSIONS_SQL, (username,))
+            if cursor.fetchone()['pending'] >= config.get("UPLOAD_MAX_OPEN_SESSIONS", 5):
+                raise UploadError(
+                    "Too many unfinished uploads; submit or let them expire before starting another", 429
+                )
+            cursor.execute("INSERT INTO upload_sessions (id, username) VALUES (%s, %s)", (upload_id, username))
+            cursor.executemany(
+                "INSERT INTO upload_files (upload_id, file_index, file_name, stored_name, size) VALUES (%s, %s, %s, %s, %s)",
+                [(upload_id, index, name, stored_name, size) for index, name, stored_name, size in entries]
+            )
+        for _, _, stored_name, size in entries:
+            with open(_file_path(stored_name), "wb") as f:
+                f.truncate(size)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return upload_id, [{"file_index": index, "file_name": name, "size": size} for index, name, _, size in entries]
+
+
+def _load_session(cursor, upload_id, username):
+    cursor.execute(SESSION_FILES_SQL, (upload_id,))
+    rows = cursor.fetchall()
+    if not rows or rows[0]['username'] != username:
+        raise UploadError("Upload not found", 404)
+    return rows
+
+
+def _received_ranges(cursor, upload_id):
+    """{file_index: merged ranges} for a session"""
+    cursor.execute(
+        "SELECT file_index, start_offset, end_offset FROM upload_chunks WHERE upload_id = %s",
+        (upload_id,)
+    )
+    chunks = {}
+    for row in cursor.fetchall():
+        chunks.setdefault(row['file_index'], []).append((row['start_offset'], row['end_offset']))
+    return {index: merge_ranges(ranges) for index, ranges in chunks.items()}
+
+
+def _file_ranges(cursor, upload_id, file_index):
+    cursor.execute(FILE_CHUNKS_SQL, (upload_id, file_index))
+    return merge_ranges((r['start_offset'], r['end_offset']) for r in cursor.fetchall())
+
+
+def _file_status(row, ranges):
+    received = sum(end - start for start, end in ranges)
+    status = {
+        "file_index": row['file_index'],
+        "file_name": row['file_name'],
+        "size": row['size'],
+        "received_bytes": received,
+        "received_ranges": ranges,
+        "status": row['status'],
+    }
+    return status
+
+
+def session_status(upload_id, username):
+    """Session state with the byte ranges received so far for every file"""
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            ensure_upload_tables(cursor)
+            rows = _load_session(cursor, upload_id, username)
+            ranges = _received_ranges(cursor, upload_id)
+        conn.commit()
+    finally:
+        conn.close()
+    return {
+        "upload_id": upload_id,
+        "status": rows[0]['session_status'],
+        "files": [_file_status(row, ranges.get(row['file_index'], [])) for row in rows],
+    }
+
+
+def write_chunk(upload_id, username, file_index, offset, stream, length):
+    """
+    Write one chunk at offset straight into the stored file and record its range
+    Starts the file's analysis when this chunk completes it
+    """
+    config = current_app.config
+    if offset is None or offset < 0:
+        raise UploadError("offset query parameter is required")
+    if not length:
+        raise UploadError("Empty chunk")
+    if length > config.get("UPLOAD_MAX_CHUNK_BYTES", 16 * 1024 * 1024):
+        raise UploadError(f"Chunks may be at most {config.get('UPLOAD_MAX_CHUNK_BYTES')} bytes", 413)
+
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            ensure_upload_tables(cursor)
+            rows = _load_session(cursor, upload_id, username)
+            row = next((r for r in rows if r['file_index'] == file_index), None)
+            if row is None:
+                raise UploadError("File not found in this upload", 404)
+            if row['session_status'] != 'open':
+                raise UploadError("Upload is already finalized", 409)
+            if offset + length > row['size']:
+                raise UploadError("Chunk extends past the declared file size", 416)
+            conn.commit()
+
+            written = 0
+            with timed("file_save"), open(_file_path(row['stored_name']), "r+b") as f:
+                f.seek(offset)
+                while written < length:
+                    data = stream.read(min(COPY_BUFFER_BYTES, length - written))
+                    if not data:
+                        break
+                    f.write(data)
+                    written += len(data)
+            if written != length:
+                # Connection dropped mid-chunk; only whole chunks are recorded
+                raise UploadError(f"Chunk truncated: received {written} of {length} bytes")
+
+            # Serialise chunk commits per file: two parallel last chunks must not each
+            # miss the other's range and leave the file 'receiving' for good
+            cursor.execute(FILE_LOCK_SQL, (upload_id, file_index))
+            cursor.execute(CHUNK_INSERT_SQL, (upload_id, file_index, offset, offset + length))
+            ranges = _file_ranges(cursor, upload_id, file_index)
+            started = False
+            if ranges == [[0, row['size']]]:
+                cursor.execute(FILE_COMPLETE_SQL, (upload_id, file_index))
+                started = cursor.rowcount == 1
+        conn.commit()
+    finally:
+        conn.close()
+
+    if started:
+        _start_analysis(upload_id, file_index, _file_path(row['stored_name']))
+        row = dict(row, status='analyzing')
+    return _file_status(row, ranges)
+
+
+def _get_executor():
+    """Analysis threads for this process, created on first use (after gunicorn forks)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get("UPLOAD_ANALYSIS_WORKERS", 2),
+                    thread_name_prefix="upload-analysis"
+                )
+    return _executor
+
+
+def analyze_file(filepath):
+    """Classification and crack measurement for a completed file, as stored in upload_files.analysis"""
+    result = {"prediction": None, "crack_data": None, "error": None}
+    # Classified even when the gate rejects it: the file may go into a claim, and claims are
+    # never dropped for photo quality. Only the batch-analyze result reports the rejection
+    quality, rejected = quality_gate(filepath)
+    result["quality"] = quality
+    result["rejected"] = rejected
+    try:
+        # The embedding is kept with the prediction until the file is submitted with a claim
+        result["prediction"] = classify_image(filepath, with_embedding=get_store() is not None)
+    except Exception as e:
+        result["error"] = f"Classification failed: {e}"
+        return result
+    try:
+        result["crack_data"] = measure_crack(filepath)
+    except Exception as e:
+        # Same as batch-analyze: the classification stands without measurements
+        current_app.logger.warning(f"Crack measurement failed for {filepath}: {e}")
+    return result
+
+
+def _run_analysis(app, upload_id, file_index, filepath):
+    with app.app_context():
+        try:
+            result = analyze_file(filepath)
+            status = "failed" if result["error"] else "analyzed"
+            conn = get_db(use_replica=False)
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(FILE_ANALYZED_SQL, (
+                        status, json.dumps(result, default=float), upload_id, file_index
+                    ))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            app.logger.exception(f"Analysis of upload {upload_id} file {file_index} failed")
+        finally:
+            QUEUE_DEPTH.labels(queue="upload_analysis").dec()
+
+
+def _start_analysis(upload_id, file_index, filepath):
+    QUEUE_DEPTH.labels(queue="upload_analysis").inc()
+    _get_executor().submit(
+        _run_analysis, current_app._get_current_object(), upload_id, file_index, filepath
+    )
+
+
+def finalize_session(upload_id, username, wait_seconds=None):
+    """
+    Close the session and wait (up to wait_seconds) for every file's analysis
+    Returns (files, done): files carry the decoded analysis where available
+    """
+    config = current_app.config
+    if wait_seconds is None:
+        wait_seconds = config.get("UPLOAD_ANALYSIS_WAIT_SECONDS", 20)
+    deadline = time.monotonic() + min(wait_seconds, MAX_WAIT_SECONDS)
+
+    conn = get_db(use_replica=False)
+    try:
+        with conn.cursor() as cursor:
+            ensure_upload_tables(cursor)
+            rows = _load_session(cursor, upload_id, username)
+            if rows[0]['session_status'] == 'consumed':
+                raise UploadError("Upload is already attached to a claim", 409)
+            incomplete = []
+            recovered = []
+            for row in rows:
+                if row['status'] != 'receiving':
+                    continue
+                # Complete files left 'receiving' (e.g. by a worker that died between commit and start)
+                cursor.execute(FILE_LOCK_SQL, (upload_id, row['file_index']))
+                if _file_ranges(cursor, upload_id, row['file_index']) != [[0, row['size']]]:
+                    incomplete.append(row['file_index'])
+                    continue
+                cursor.execute(FILE_COMPLETE_SQL, (upload_id, row['file_index']))
+                if cursor.rowcount == 1:
+                    recovered.append(row)
+            for row in rows:
+                if row['status'] == 'analyzing':
+                    cursor.execute(FILE_REQUEUE_SQL, (
+                        upload_id, row['file_index'], config.get("UPLOAD_ANALYSIS_STALE_SECONDS", 300)
+                    ))
+                    if cursor.rowcount == 1:
+                        current_app.logger.warning(f"Restarting stale analysis of upload {upload_id} file {row['file_index']}")
+                        recovered.append(row)
+            if incomplete:
+                conn.rollback()
+                raise UploadError(f"Files not fully received: {incomplete}", 409)
+            cursor.execute("UPDATE upload_sessions SET status = 'finalized' WHERE id = %s AND status = 'open'", (upload_id,))
+            conn.commit()
+            for row in recovered:
+                _start_analysis(upload_id, row['file_index'], _file_path(row['stored_name']))
+            rows = [dict(row, status='analyzing') if row in recovered else row for row in rows]
+
+            while any(row['status'] == 'analyzing' for row in rows) and time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL_SECONDS)
+                cursor.execute(SESSION_FILES_SQL, (upload_id,))
+                rows = cursor.fetchall()
+                conn.commit()
+    finally:
+        conn.close()
+
+    files = []
+    for row in rows:
+        analysis = json.loads(row['analysis']) if row['analysis'] else None
+        files.append(dict(row, analysis=analysis))
+    return files, all(row['status'] != 'analyzing' for row in rows)
+
+
+def consume_session(cursor, upload_id):
+    """
+    Mark a finalized session as used by a claim, inside the claim's write transaction
+    Raises UploadError (409) if another claim already took it
+    """
+    cursor.execute(SESSION_CONSUME_SQL, (upload_id,))
+    if cursor.rowcount != 1:
+        raise UploadError("Upload is already attached to a claim", 409)
+
+
+def batch_result(file):
+    """One finalized file in the /api/detection/batch-analyze result format"""
+    analysis = file['analysis'] or {}
+    prediction = analysis.get("prediction")
+    if file['status'] == 'analyzing':
+        return {"success": False, "filename": file['file_name'], "status": "analyzing"}
+    if analysis.get("rejected"):
+        return rejection(analysis["quality"], filename=file['file_name'])
+    if not prediction:
+        return {"success": False, "filename": file['file_name'], "error": analysis.get("error") or "Analysis failed",
+                "quality": analysis.get("quality")}
+
+    crack_data = analysis.get("crack_data")
+    ok = crack_data and crack_data.get('status') == 'success'
+    processed_image_url = None
+    if ok and crack_data.get('plot_path'):
+        processed_image_url = f"/static/upload_image/{os.path.basename(crack_data['plot_path'])}"
+    return {
+        "success": True,
+        "filename": file['file_name'],
+        "predicted_class": prediction["predicted_class"],
+        "confidence": prediction["confidence"],
+        "probabilities": prediction["probabilities"],
+        "crack_detected": prediction["class_index"] == 1,
+        "processed_image_url": processed_image_url,
+        "crack_data": {
+            "length_ft": crack_data.get('length_ft', 0) if ok else 0,
+            "width_ft": crack_data.get('width_ft', 0) if ok else 0,
+            "area_sqft": crack_data.get('crack_area', 0) if ok else 0
+        },
+        "original_image_url": f"/static/upload_image/{file['stored_name']}",
+        "quality": analysis.get("quality")
+    }
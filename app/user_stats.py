@@ -0,0 +1,166 @@
+"""
+Per-user dashboard statistics
+Maintains the user_stats summary table so the dashboard reads a single row
+instead of aggregating across insurance, claims, details, values and images.
+
+Writes apply their own change to the row (apply_user_stats_delta) in the same
+transaction, at a cost that does not grow with the user's history. The full
+recompute (refresh_user_stats) only builds a missing row on the first
+dashboard read and backs the rebuild-user-stats command. A claim's value is
+its latest claims_value row, as in the dashboard and report queries, so a
+resubmitted claim replaces its value instead of adding to it.
+"""
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.claim_summary import LATEST_VALUE_JOIN
+from app.db import get_db
+
+USER_STATS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INT PRIMARY KEY,
+        total_insurance_count INT NOT NULL DEFAULT 0,
+        total_policy_number INT NOT NULL DEFAULT 0,
+        total_claims_count INT NOT NULL DEFAULT 0,
+        total_picture_tests INT NOT NULL DEFAULT 0,
+        total_claim_you_get DECIMAL(15, 2) NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+# Each figure is aggregated on its own table, so nothing fans out across joins
+USER_STATS_REFRESH_SQL = f"""
+    INSERT INTO user_stats
+    (user_id, total_insurance_count, total_policy_number, total_claims_count,
+     total_picture_tests, total_claim_you_get)
+    SELECT
+        u.id,
+        (SELECT COUNT(*) FROM insurance i WHERE i.user_id = u.id),
+        (SELECT COUNT(DISTINCT i.policy_number) FROM insurance i WHERE i.user_id = u.id),
+        (SELECT COUNT(*) FROM claims c WHERE c.user_id = u.id),
+        (SELECT COUNT(*)
+            FROM claim_property_image cpi
+            JOIN claim_property_details cpd ON cpi.claim_property_details_id = cpd.id
+            JOIN claims c ON cpd.claims_id = c.id
+            WHERE c.user_id = u.id),
+        (SELECT COALESCE(SUM(cv.claim_recommended), 0)
+            FROM claims c
+            JOIN {LATEST_VALUE_JOIN}
+            WHERE c.user_id = u.id)
+    FROM users u
+    WHERE {{where}}
+    ON DUPLICATE KEY UPDATE
+        total_insurance_count = VALUES(total_insurance_count),
+        total_policy_number = VALUES(total_policy_number),
+        total_claims_count = VALUES(total_claims_count),
+        total_picture_tests = VALUES(total_picture_tests),
+        total_claim_you_get = VALUES(total_claim_you_get)
+"""
+
+# A user without a row yet is left alone; the dashboard builds the row in full on first read
+USER_STATS_DELTA_SQL = """
+    UPDATE user_stats SET
+        total_insurance_count = total_insurance_count + %s,
+        total_policy_number = total_policy_number + %s,
+        total_claims_count = total_claims_count + %s,
+        total_picture_tests = total_picture_tests + %s,
+        total_claim_you_get = total_claim_you_get + %s
+    WHERE user_id = %s
+"""
+
+NEW_POLICY_SQL = """
+    SELECT NOT EXISTS(SELECT 1 FROM insurance WHERE user_id = %s AND policy_number = %s) AS is_new
+"""
+
+LATEST_CLAIM_VALUE_SQL = """
+    SELECT claim_recommended FROM claims_value WHERE claims_id = %s ORDER BY id DESC LIMIT 1
+"""
+
+_table_ready = False
+
+
+def ensure_user_stats_table(cursor):
+    """Create the user_stats table once per process"""
+    global _table_ready
+    if not _table_ready:
+        cursor.execute(USER_STATS_TABLE_SQL)
+        _table_ready = True
+
+
+def refresh_user_stats(cursor, user_id):
+    """
+    Recompute the summary row for one user
+    Call inside the same transaction as the write that changed the user's data
+    """
+    ensure_user_stats_table(cursor)
+    cursor.execute(USER_STATS_REFRESH_SQL.format(where="u.id = %s"), (user_id,))
+
+
+def delta_args(user_id, insurances=0, policies=0, claims=0, pictures=0, claim_value=0):
+    """USER_STATS_DELTA_SQL parameters"""
+    return (insurances, policies, claims, pictures, claim_value, user_id)
+
+
+def apply_user_stats_delta(cursor, user_id, **changes):
+    """
+    Add one write's changes (insurances, policies, claims, pictures, claim_value) to the summary row
+    Call inside the same transaction as the write
+    """
+    ensure_user_stats_table(cursor)
+    cursor.execute(USER_STATS_DELTA_SQL, delta_args(user_id, **changes))
+
+
+def apply_user_stats_delta_for_claim(cursor, claims_id, **changes):
+    """apply_user_stats_delta for the owner of a claim"""
+    cursor.execute("SELECT user_id FROM claims WHERE id = %s", (claims_id,))
+    row = cursor.fetchone()
+    if row:
+        apply_user_stats_delta(cursor, row['user_id'], **changes)
+
+
+def is_new_policy(cursor, user_id, policy_number):
+    """Whether policy_number is not yet among the user's policies (call before inserting it)"""
+    if policy_number is None:
+        return False
+    cursor.execute(NEW_POLICY_SQL, (user_id, policy_number))
+    return bool(cursor.fetchone()['is_new'])
+
+
+def value_change(previous, claim_recommended):
+    """Change in total_claim_you_get when a claim's latest value goes from previous (row or None) to claim_recommended"""
+    old = float(previous['claim_recommended'] or 0) if previous else 0.0
+    return float(claim_recommended or 0) - old
+
+
+def claim_value_change(cursor, claims_id, claim_recommended):
+    """value_change for a new claims_value row (call before inserting it)"""
+    cursor.execute(LATEST_CLAIM_VALUE_SQL, (claims_id,))
+    return value_change(cursor.fetchone(), claim_recommended)
+
+
+def rebuild_user_stats(cursor):
+    """Recompute the summary rows for every user"""
+    ensure_user_stats_table(cursor)
+    cursor.execute(USER_STATS_REFRESH_SQL.format(where="1 = 1"))
+    return cursor.rowcount
+
+
+@click.command("rebuild-user-stats")
+@with_appcontext
+def rebuild_user_stats_command():
+    """Rebuild the user_stats summary table from the source tables"""
+    conn = get_db()
+    try:
+        with conn.cursor() as cursor:
+            rebuild_user_stats(cursor)
+            cursor.execute("SELECT COUNT(*) AS total FROM user_stats")
+            total = cursor.fetchone()['total']
+        conn.commit()
+        click.echo(f"user_stats rebuilt for {total} users")
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"Error rebuilding user_stats: {e}")
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,2 @@
+# Benchmarks Package
+# Performance benchmarks: python -m benchmarks.run
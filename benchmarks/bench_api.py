@@ -0,0 +1,191 @@
+"""
+API Benchmarks
+Full request path through the Flask test client: detection endpoints with
+fixture uploads, and DB-heavy endpoints.
+
+The DB endpoints run by default against a stub connection (api.stubdb.*)
+that answers every statement from memory: routing, JWT, ETag and cache
+handling, row shaping and JSON are measured, the database is not. With a
+username (--db-user) they run against the configured database instead
+(api.db.*).
+"""
+import datetime
+import io
+import os
+import sys
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.db import TimedDictCursor, get_db
+from benchmarks.fixtures import fixture_path
+from benchmarks.harness import measure, skipped
+
+DB_ENDPOINTS = (
+    "/api/dashboard/stats",
+    "/api/insurance/policies",
+    "/api/insurance/claims/all",
+    "/api/insurance/reports",
+)
+
+STUB_USERNAME = "bench_user"
+# Rows the stub returns per statement: a typical page of policies, claims or reports
+STUB_PAGE_ROWS = 50
+STUB_CREATED_AT = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+class _StubRow(dict):
+    """Row that answers any column an endpoint selects with a plausible value"""
+
+    def __missing__(self, column):
+        if column == "images":
+            return "[]"
+        if column in ("created_at", "claim_date") or column.endswith("_date"):
+            return STUB_CREATED_AT
+        if column == "id" or column.endswith(("_id", "_count", "version")):
+            return 1
+        return f"{column} value"
+
+
+class _StubCursor:
+    """Cursor answering every statement from memory, instrumented like TimedDictCursor"""
+
+    _run = TimedDictCursor._run
+    rowcount = 0
+    lastrowid = 1
+
+    def __init__(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _answer(self, query, args):
+        # Seeded with an id so the row is truthy, like any real one
+        self._rows = [_StubRow(id=index + 1) for index in range(STUB_PAGE_ROWS)]
+        self.rowcount = len(self._rows)
+        return self.rowcount
+
+    def execute(self, query, args=None):
+        return self._run(self._answer, query, args)
+
+    def executemany(self, query, args):
+        return self._run(self._answer, query, args)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class _StubConnection:
+    def cursor(self):
+        return _StubCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def _stub_database():
+    """Replace get_db in every app module that imported it, and in this one"""
+    modules = [name for name, module in list(sys.modules.items())
+               if (name.split(".")[0] == "app" or name == __name__) and getattr(module, "get_db", None) is get_db]
+    with ExitStack() as stack:
+        for name in modules:
+            stack.enter_context(mock.patch(f"{name}.get_db", lambda use_replica=None: _StubConnection()))
+        yield
+
+
+def _upload(path, field="image"):
+    with open(path, "rb") as f:
+        data = f.read()
+    return lambda: {field: (io.BytesIO(data), os.path.basename(path))}
+
+
+def _run_detection(client, iterations, warmup):
+    results = {}
+    small = _upload(fixture_path("small"))
+    large = _upload(fixture_path("large"))
+
+    def post(url, files):
+        response = client.post(url, data=files(), content_type="multipart/form-data")
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    results["api.detection_crack_small"] = measure(
+        lambda: post("/api/detection/crack", small), iterations, warmup
+    )
+    results["api.detection_crack_large"] = measure(
+        lambda: post("/api/detection/crack", large), iterations, warmup
+    )
+    results["api.detection_crack_with_visualization_small"] = measure(
+        lambda: post("/api/detection/crack-with-visualization", small), iterations, warmup
+    )
+
+    batch_path = fixture_path("small")
+    with open(batch_path, "rb") as f:
+        batch_bytes = f.read()
+
+    def batch_files():
+        return {"images": [(io.BytesIO(batch_bytes), f"batch_{i}.jpg") for i in range(8)]}
+
+    results["api.detection_batch_analyze_8"] = measure(
+        lambda: post("/api/detection/batch-analyze", batch_files), iterations, warmup, items_per_call=8
+    )
+    return results
+
+
+def _run_db(app, client, username, iterations, warmup, prefix="api.db"):
+    results = {}
+    with app.app_context():
+        try:
+            get_db().close()
+        except Exception as e:
+            reason = f"database unreachable: {e}"
+            return {f"{prefix}{url.replace('/', '_')}": skipped(reason) for url in DB_ENDPOINTS}
+        token = create_access_token(identity=username)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for cache_enabled in (False, True):
+        app.config["CACHE_ENABLED"] = cache_enabled
+        suffix = "_cached" if cache_enabled else ""
+        for url in DB_ENDPOINTS:
+            def get():
+                response = client.get(url, headers=headers)
+                assert response.status_code == 200, response.get_data(as_text=True)
+
+            results[f"{prefix}{url.replace('/', '_')}{suffix}"] = measure(get, iterations, warmup)
+    return results
+
+
+def run(iterations=20, warmup=3, db_username=None):
+    app = create_app()
+    app.config["TESTING"] = True
+    client = app.test_client()
+
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    before = set(os.listdir(upload_folder)) if os.path.isdir(upload_folder) else set()
+    try:
+        results = _run_detection(client, iterations, warmup)
+    finally:
+        # Remove the uploads and plots the detection endpoints left behind
+        if os.path.isdir(upload_folder):
+            for name in set(os.listdir(upload_folder)) - before:
+                os.remove(os.path.join(upload_folder, name))
+
+    if db_username:
+        results.update(_run_db(app, client, db_username, iterations, warmup))
+    else:
+        with _stub_database():
+            results.update(_run_db(app, client, STUB_USERNAME, iterations, warmup, prefix="api.stubdb"))
+    return results
@@ -0,0 +1,25 @@
+"""
+Image Area Benchmarks
+calculate_crack_area with and without the matplotlib visualization
+"""
+import os
+import tempfile
+from app.routes.image_area_calculater import calculate_crack_area
+from benchmarks.fixtures import fixture_path
+from benchmarks.harness import measure
+
+
+def run(iterations=20, warmup=3):
+    results = {}
+    plot_path = os.path.join(tempfile.gettempdir(), "bench_crack_plot.png")
+
+    for size in ("small", "medium", "large"):
+        path = fixture_path(size)
+        results[f"image_area.measure_{size}"] = measure(
+            lambda: calculate_crack_area(path, save_plot=False), iterations, warmup
+        )
+        results[f"image_area.measure_and_plot_{size}"] = measure(
+            lambda: calculate_crack_area(path, save_plot=True, save_path=plot_path), iterations, warmup
+        )
+
+    return results
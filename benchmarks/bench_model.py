@@ -0,0 +1,39 @@
+"""
+Model Benchmarks
+Forward-pass latency by batch size and preprocessing cost
+"""
+import torch
+from PIL import Image
+from app.models.crack_classifier import model, inference_transforms, device
+from benchmarks.fixtures import fixture_path
+from benchmarks.harness import measure
+
+BATCH_SIZES = (1, 2, 4, 8, 16)
+
+
+def run(iterations=20, warmup=3):
+    results = {}
+
+    for size in ("small", "large"):
+        path = fixture_path(size)
+        results[f"preprocess.decode_{size}"] = measure(
+            lambda: Image.open(path).convert("RGB"), iterations, warmup
+        )
+        img = Image.open(path).convert("RGB")
+        results[f"preprocess.transforms_{size}"] = measure(
+            lambda: inference_transforms(img), iterations, warmup
+        )
+
+    img_tensor = inference_transforms(Image.open(fixture_path("small")).convert("RGB"))
+    for batch_size in BATCH_SIZES:
+        batch = img_tensor.unsqueeze(0).repeat(batch_size, 1, 1, 1).to(device)
+
+        def forward():
+            with torch.no_grad():
+                model(batch)
+
+        results[f"model.forward_batch_{batch_size}"] = measure(
+            forward, iterations, warmup, items_per_call=batch_size
+        )
+
+    return results
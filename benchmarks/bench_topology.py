@@ -0,0 +1,93 @@
+"""
+Topology Benchmarks
+Workers x intra-op threads matrix for CPU inference. Each worker is a separate
+process (as under gunicorn) running single-image forward passes concurrently;
+throughput is images per second across all workers, latency is per request.
+Combinations up to 2x the core count are included to show oversubscription.
+"""
+import multiprocessing
+import os
+import time
+from app.topology import available_cpus, recommended_topology
+from benchmarks.fixtures import fixture_path
+from benchmarks.harness import summarize
+
+
+def _powers_of_two(limit):
+    value = 1
+    while value <= limit:
+        yield value
+        value *= 2
+
+
+def _worker(threads, iterations, warmup, barrier, queue):
+    # Config is read at import time, so the thread settings must be in the environment first
+    os.environ["TORCH_NUM_THREADS"] = str(threads)
+    os.environ["TORCH_INTEROP_THREADS"] = "1"
+
+    import torch
+    from PIL import Image
+    from app.models.crack_classifier import model, inference_transforms, device
+
+    batch = inference_transforms(Image.open(fixture_path("small")).convert("RGB")).unsqueeze(0).to(device)
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(batch)
+        barrier.wait()
+        started = time.time()
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            model(batch)
+            samples.append((time.perf_counter() - start) * 1000.0)
+    queue.put((started, time.time(), samples, torch.get_num_threads()))
+
+
+def run_combination(workers, threads, iterations=20, warmup=3):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(threads, iterations, warmup, barrier, queue))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    samples = [sample for outcome in outcomes for sample in outcome[2]]
+    wall_seconds = max(o[1] for o in outcomes) - min(o[0] for o in outcomes)
+    result = summarize(samples)
+    result.update({
+        "workers": workers,
+        "intra_op_threads": outcomes[0][3],
+        "throughput_per_s": round(len(samples) / wall_seconds, 3) if wall_seconds else 0.0,
+    })
+    return result
+
+
+def run(iterations=20, warmup=3):
+    fixture_path("small")  # generate fixtures once, before the workers race for them
+    cpus = available_cpus()
+    recommended = recommended_topology(cpus)
+    results = {}
+
+    combinations = [
+        (workers, threads)
+        for workers in _powers_of_two(cpus)
+        for threads in _powers_of_two(cpus)
+        if workers * threads <= 2 * cpus
+    ]
+    if (recommended["workers"], recommended["intra_op_threads"]) not in combinations:
+        combinations.append((recommended["workers"], recommended["intra_op_threads"]))
+
+    for workers, threads in combinations:
+        result = run_combination(workers, threads, iterations, warmup)
+        result["recommended"] = (
+            workers == recommended["workers"] and threads == recommended["intra_op_threads"]
+        )
+        results[f"topology.w{workers}_t{threads}"] = result
+
+    return results
@@ -0,0 +1,42 @@
+"""
+Benchmark Fixtures
+Synthetic wall images with and without crack-like strokes, generated on demand
+so no binary fixtures need to live in the repository
+"""
+import os
+import numpy as np
+import cv2
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+FIXTURE_SIZES = {
+    "small": (480, 640),
+    "medium": (1080, 1440),
+    "large": (3024, 4032),
+}
+
+
+def make_wall_image(height, width, cracked=True, seed=0):
+    """Grey textured wall, optionally with a dark jagged crack"""
+    rng = np.random.default_rng(seed)
+    image = rng.normal(170, 12, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    if cracked:
+        x = width // 4
+        points = []
+        for y in range(height // 8, height - height // 8, max(4, height // 60)):
+            x = int(np.clip(x + rng.integers(-width // 80 - 1, width // 80 + 2), 0, width - 1))
+            points.append((x, y))
+        cv2.polylines(image, [np.array(points, dtype=np.int32)], False, (40, 40, 40),
+                      thickness=max(2, width // 300))
+    return image
+
+
+def fixture_path(size="small", cracked=True):
+    """Path to a fixture image, generating it the first time it is needed"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    name = f"wall_{size}_{'crack' if cracked else 'clean'}.jpg"
+    path = os.path.join(FIXTURE_DIR, name)
+    if not os.path.exists(path):
+        height, width = FIXTURE_SIZES[size]
+        cv2.imwrite(path, make_wall_image(height, width, cracked))
+    return path
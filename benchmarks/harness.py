@@ -0,0 +1,93 @@
+"""
+Benchmark Harness
+Timing, percentile summaries, JSON output and baseline comparison
+"""
+import json
+import os
+import platform
+import statistics
+import time
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(samples_ms, items_per_call=1):
+    """Summary statistics (milliseconds) for a list of samples"""
+    values = sorted(samples_ms)
+    mean = statistics.fmean(values)
+    return {
+        "iterations": len(values),
+        "mean_ms": round(mean, 3),
+        "min_ms": round(values[0], 3),
+        "max_ms": round(values[-1], 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p90_ms": round(percentile(values, 90), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "throughput_per_s": round(items_per_call * 1000.0 / mean, 3) if mean else 0.0,
+    }
+
+
+def measure(fn, iterations=20, warmup=3, items_per_call=1):
+    """Run fn repeatedly and return its latency summary"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return summarize(samples, items_per_call)
+
+
+def skipped(reason):
+    """Result entry for a benchmark that could not run in this environment"""
+    return {"skipped": True, "reason": reason}
+
+
+def environment_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def write_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_to_baseline(results, baseline, tolerance=0.20, metric="p50_ms"):
+    """
+    Compare each benchmark's metric against the baseline
+    A benchmark regresses when it is slower than baseline by more than tolerance
+    """
+    comparison = {}
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or current.get("skipped") or previous.get("skipped"):
+            continue
+        before, after = previous[metric], current[metric]
+        change = (after - before) / before if before else 0.0
+        comparison[name] = {
+            "baseline_" + metric: before,
+            "current_" + metric: after,
+            "change_pct": round(change * 100, 2),
+            "regression": change > tolerance,
+        }
+    return comparison
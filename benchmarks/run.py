@@ -0,0 +1,111 @@
+"""
+Benchmark Runner
+Run from the project root:
+
+    python -m benchmarks.run                          # all suites
+    python -m benchmarks.run --suite model --iterations 50
+    python -m benchmarks.run --db-user john_doe       # DB-heavy endpoints on the real database
+    python -m benchmarks.run --save-baseline          # store results as the new baseline
+    python -m benchmarks.run --suite topology         # workers x torch threads matrix (not part of "all")
+
+Results are written as JSON (percentiles per benchmark). When a baseline file
+exists, each benchmark's p50 is compared against it and the run exits with
+status 1 if any benchmark regressed by more than --tolerance.
+"""
+import argparse
+import importlib
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import (
+    environment_info, write_results, load_results, compare_to_baseline, skipped
+)
+
+SUITES = {
+    "model": "benchmarks.bench_model",
+    "image_area": "benchmarks.bench_image_area",
+    "api": "benchmarks.bench_api",
+    "topology": "benchmarks.bench_topology",
+}
+
+# Slow suites that only run when asked for by name
+OPT_IN_SUITES = {"topology"}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run performance benchmarks")
+    parser.add_argument("--suite", choices=["all"] + list(SUITES), default="all")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--db-user", help="username whose data the DB-heavy endpoints read")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="allowed slowdown vs baseline before flagging a regression (0.20 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    return parser.parse_args()
+
+
+def run_suite(name, args):
+    try:
+        module = importlib.import_module(SUITES[name])
+    except Exception as e:
+        traceback.print_exc()
+        return {f"{name}.import": skipped(f"suite could not be imported: {e}")}
+
+    kwargs = {"iterations": args.iterations, "warmup": args.warmup}
+    if name == "api":
+        kwargs["db_username"] = args.db_user
+    return module.run(**kwargs)
+
+
+def main():
+    args = parse_args()
+    suites = [s for s in SUITES if s not in OPT_IN_SUITES] if args.suite == "all" else [args.suite]
+
+    print("=" * 70)
+    print("  BENCHMARKS")
+    print("=" * 70)
+
+    benchmarks = {}
+    for name in suites:
+        print(f"\n[*] Running suite: {name}")
+        suite_results = run_suite(name, args)
+        for bench, stats in sorted(suite_results.items()):
+            if stats.get("skipped"):
+                print(f"  [SKIP] {bench:55} {stats['reason']}")
+            else:
+                print(f"  [OK]   {bench:55} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms"
+                      f"  {stats['throughput_per_s']:>9.2f}/s{'  (recommended)' if stats.get('recommended') else ''}")
+        benchmarks.update(suite_results)
+
+    results = {"environment": environment_info(), "benchmarks": benchmarks}
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        comparison = compare_to_baseline(results, load_results(args.baseline), args.tolerance)
+        results["comparison"] = comparison
+        regressions = [name for name, c in comparison.items() if c["regression"]]
+        print(f"\n[*] Compared with baseline {args.baseline}")
+        for name, c in sorted(comparison.items()):
+            flag = "[REGRESSION]" if c["regression"] else "[OK]"
+            print(f"  {flag:12} {name:55} {c['change_pct']:+.1f}%")
+        if regressions:
+            print(f"\n[FAIL] {len(regressions)} benchmark(s) regressed beyond {args.tolerance:.0%}")
+            exit_code = 1
+
+    write_results(results, args.output)
+    print(f"\n[*] Results written to {args.output}")
+    if args.save_baseline:
+        write_results(results, args.baseline)
+        print(f"[*] Baseline saved to {args.baseline}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Gunicorn Configuration
+Gunicorn picks this file up automatically when started from the project root:
+
+    gunicorn wsgi:app                                   # inference pool (sync workers)
+    GUNICORN_PROFILE=io GUNICORN_BIND=0.0.0.0:5001 gunicorn wsgi:app
+
+Two profiles, meant to run side by side behind a reverse proxy:
+- "inference": sync workers sized by app.topology so workers x torch threads
+  fill the cores without oversubscribing them; route /api/detection/* and the
+  claim image uploads here
+- "io": gthread workers for the DB/JSON endpoints; each worker is held to one
+  torch thread so stray inference there cannot steal the inference pool's cores
+
+The app is preloaded in the master so model weights are loaded once and shared
+copy-on-write. The master builds the model on one torch thread and on the CPU
+and never runs it, so no thread pool or CUDA context exists when it forks;
+each worker then sets its own thread counts, moves the model to the GPU if
+there is one, and runs a warm-up forward pass before accepting requests. With
+INFERENCE_BACKEND=remote the workers hold no model at all and the warm-up
+only checks that the inference server answers.
+"""
+import glob
+import importlib.util
+import os
+
+
+def _load_topology():
+    # Load app/topology.py on its own: importing the app package here would
+    # evaluate Config before WEB_CONCURRENCY is exported below
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "topology.py")
+    spec = importlib.util.spec_from_file_location("_gunicorn_topology", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+recommended_topology = _load_topology().recommended_topology
+
+profile = os.getenv("GUNICORN_PROFILE", "inference")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+if profile == "io":
+    worker_class = "gthread"
+    workers = int(os.getenv("WEB_CONCURRENCY", 2))
+    threads = int(os.getenv("GUNICORN_THREADS", 8))
+    os.environ.setdefault("TORCH_NUM_THREADS", "1")
+else:
+    worker_class = "sync"
+    workers = int(os.getenv("WEB_CONCURRENCY", 0)) or recommended_topology()["workers"]
+    threads = 1
+
+if preload_app:
+    # Read by app.models.crack_classifier when the master loads the model
+    os.environ["TORCH_FORK_SAFE_LOAD"] = "true"
+    # torch.cuda.is_available() in the master must not initialise CUDA
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+
+# The app reads WEB_CONCURRENCY to split cores between workers; keep it in step with gunicorn
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Recycle workers to bound memory creep from torch/OpenCV allocations; jitter avoids restarting all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+warmup = os.getenv("GUNICORN_WARMUP", "true" if profile == "inference" else "false").lower() == "true"
+
+
+def on_starting(server):
+    # Stale per-pid files from a previous run would be summed into /metrics
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+def pre_fork(server, worker):
+    # Load the model in the master once so every worker shares its weights;
+    # no warm-up here, a forward pass would start the thread pools before fork
+    if preload_app:
+        from app.inference import get_backend
+        get_backend()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.inference import get_backend
+        get_backend().reattach()
+
+
+def post_worker_init(worker):
+    if warmup:
+        from app.inference import get_backend
+        elapsed_ms = get_backend().warmup()
+        worker.log.info("Worker %s warmed up in %.1f ms", worker.pid, elapsed_ms)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
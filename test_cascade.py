@@ -0,0 +1,114 @@
+"""
+Model Cascade Test Script
+Checks the edge-density first stage (app/cascade.py): decide answers outside
+the thresholds with 90% confidence at either threshold and escalates in
+between, plain walls score near zero and lined ones high, first_stage follows
+CASCADE_ENABLED and escalates unreadable images, and evaluate summarises a
+labeled set against the model alone.
+"""
+import io
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+from flask import Flask
+from PIL import Image, ImageDraw
+
+from app.cascade import decide, edge_density, evaluate, first_stage, labeled_images
+
+LABELS = {0: "Negative (No Crack)", 1: "Positive (Crack Detected)"}
+NO_CRACK_MAX, CRACK_MIN = 0.002, 0.03
+
+
+def _wall(lines=0, size=(640, 480)):
+    """JPEG of a flat grey wall with some dark zig-zag lines drawn across it"""
+    image = Image.new("RGB", size, (150, 150, 150))
+    draw = ImageDraw.Draw(image)
+    for i in range(lines):
+        y = (i + 1) * size[1] // (lines + 1)
+        draw.line([(x, y + (15 if (x // 40) % 2 else -15)) for x in range(0, size[0] + 40, 40)],
+                  fill=(20, 20, 20), width=4)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def config():
+    app = Flask(__name__)
+    app.config.update(CASCADE_ENABLED=True, CASCADE_NO_CRACK_MAX=NO_CRACK_MAX, CASCADE_CRACK_MIN=CRACK_MIN)
+    with app.app_context():
+        yield app.config
+
+
+@pytest.mark.parametrize("density", [0.0021, 0.01, 0.0299])
+def test_between_thresholds_escalates(density):
+    assert decide(density, NO_CRACK_MAX, CRACK_MIN, LABELS) is None
+
+
+def test_confidence_is_90_percent_at_the_thresholds():
+    no_crack = decide(NO_CRACK_MAX, NO_CRACK_MAX, CRACK_MIN, LABELS)
+    crack = decide(CRACK_MIN, NO_CRACK_MAX, CRACK_MIN, LABELS)
+    assert (no_crack["class_index"], crack["class_index"]) == (0, 1)
+    assert no_crack["confidence"] == pytest.approx(90) and crack["confidence"] == pytest.approx(90)
+    assert crack["predicted_class"] == LABELS[1] and crack["stage"] == "edge_density"
+    assert sum(crack["probabilities"].values()) == pytest.approx(100)
+
+
+def test_confidence_grows_beyond_the_thresholds():
+    assert decide(0.0, NO_CRACK_MAX, CRACK_MIN, LABELS)["confidence"] > 90
+    assert decide(0.2, NO_CRACK_MAX, CRACK_MIN, LABELS)["confidence"] > 99
+    # Extreme densities and degenerate thresholds must not overflow math.exp
+    assert decide(1.0, 0.0, 0.0, LABELS)["confidence"] == 100
+
+
+def test_edge_density_separates_plain_and_lined_walls():
+    plain, lined = edge_density(_wall()), edge_density(_wall(lines=6))
+    assert plain <= NO_CRACK_MAX < CRACK_MIN <= lined
+    assert edge_density(_wall(lines=6).getvalue()) == lined
+
+    source = _wall(lines=6)
+    edge_density(source)
+    assert source.tell() == 0
+
+
+def test_first_stage(config):
+    answer = first_stage(_wall(), LABELS)
+    assert answer["class_index"] == 0 and answer["stage"] == "edge_density"
+    assert first_stage(_wall(lines=6), LABELS)["class_index"] == 1
+    assert first_stage(io.BytesIO(b"not an image"), LABELS) is None
+    config["CASCADE_ENABLED"] = False
+    assert first_stage(_wall(), LABELS) is None
+
+
+def test_labeled_images(tmp_path):
+    for folder, name in [("crack", "a.jpg"), ("Negative", "b.PNG"), ("no_crack", "notes.txt"), ("other", "c.jpg")]:
+        (tmp_path / folder).mkdir(exist_ok=True)
+        (tmp_path / folder / name).write_bytes(b"")
+    found = [(path.rsplit("/", 2)[-2:], label) for path, label in labeled_images(str(tmp_path))]
+    assert sorted(found) == [(["Negative", "b.PNG"], 0), (["crack", "a.jpg"], 1)]
+
+
+def test_evaluate_summarises_the_cascade():
+    # path -> (label, edge density, model's answer)
+    images = {"a": (1, 0.05, 1), "b": (0, 0.001, 0), "c": (1, 0.01, 1), "d": (0, 0.04, 0)}
+    backend = mock.Mock()
+    backend.classifier.CLASS_LABELS = LABELS
+    backend.preprocess.side_effect = lambda path: path
+    backend.predict.side_effect = lambda batch: [{"class_index": images[batch[0]][2]}]
+
+    with mock.patch("app.cascade.edge_density", side_effect=lambda path: images[path][1]):
+        report = evaluate([(path, label) for path, (label, _, _) in images.items()], backend, NO_CRACK_MAX, CRACK_MIN)
+    assert report["images"] == 4
+    assert report["escalation_rate"] == 0.25
+    assert report["model_accuracy"] == 1.0
+    assert report["cascade_accuracy"] == 0.75
+    assert report["first_stage_errors"] == 1 and report["first_stage_disagreements"] == 1
+    assert report["edge_density"]["crack"]["p50"] == 0.05
+    assert evaluate([], backend, NO_CRACK_MAX, CRACK_MIN) == {"images": 0}
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
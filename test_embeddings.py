@@ -0,0 +1,120 @@
+"""
+Embedding Store Test Script
+Checks EmbeddingStore (app/embeddings.py): the blocked float16 scan returns the
+same top-k as a brute-force cosine ranking, with and without allowed/excluded
+ids, an image embedded twice is listed once, a partial row left by a crashed
+writer is dropped on the next append, and similar_images only searches the
+caller's own images unless they are an admin.
+
+Stores are small (16-d) and live in a temporary directory.
+"""
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import numpy as np
+import pytest
+
+from app.embeddings import IMAGE_ACCESS_SQL, IMAGE_DETAILS_SQL, USER_IMAGE_IDS_SQL, EmbeddingStore, similar_images
+
+DIM = 16
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(3)
+    store = EmbeddingStore(str(tmp_path), dim=DIM)
+    vectors = rng.normal(size=(40, DIM))
+    store.add(list(range(100, 120)), vectors[:20])
+    store.add(list(range(120, 140)), vectors[20:])
+    return store
+
+
+def _brute_force(store, query, k, candidates):
+    vectors, ids = store._views()
+    matrix = np.asarray(vectors, dtype=np.float32)
+    scores = matrix @ (query / np.linalg.norm(query))
+    ranked = sorted((int(i) for i in ids if int(i) in candidates), key=lambda i: -scores[list(ids).index(i)])
+    return ranked[:k]
+
+
+@pytest.mark.parametrize("allowed, excluded", [
+    (None, ()),
+    (None, (101, 105, 133)),
+    ([100, 104, 110, 111, 125, 139], ()),
+    ([100, 104, 110, 111, 125, 139], (104,)),
+])
+def test_search_matches_brute_force(store, allowed, excluded):
+    query = np.random.default_rng(9).normal(size=DIM)
+    candidates = set(allowed if allowed is not None else range(100, 140)) - set(excluded)
+    # Blocks smaller than the store, so results are merged across blocks
+    with mock.patch("app.embeddings.SEARCH_BLOCK_ROWS", 7):
+        hits = store.search(query, k=5, allowed_ids=allowed, exclude_ids=excluded)
+    assert [image_id for image_id, _ in hits] == _brute_force(store, query, 5, candidates)
+    assert all(-1 <= score <= 1 for _, score in hits)
+
+
+def test_stored_vector_finds_itself(store):
+    query = store.vector(117)
+    assert query.dtype == np.float32
+    image_id, score = store.search(query, k=1)[0]
+    assert image_id == 117 and score == pytest.approx(1, abs=1e-3)
+    assert store.vector(999) is None
+    assert store.search(query, k=0) == []
+
+
+def test_image_embedded_twice_is_listed_once(store):
+    store.add([117], [store.vector(117)])
+    hits = store.search(store.vector(117), k=3)
+    assert [image_id for image_id, _ in hits].count(117) == 1
+    assert len(hits) == 3
+
+
+def test_partial_row_is_dropped_on_next_append(store):
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\x00" * 10)        # a writer crashed halfway through a row
+    assert len(store) == 40
+    store.add([140], [np.ones(DIM)])
+    assert len(store) == 41
+    assert store.search(np.ones(DIM), k=1)[0][0] == 140
+
+
+class StubCursor:
+    """Answers similar_images' statements for a caller (user 1) and an owner (user 2)"""
+
+    def __init__(self, role="user"):
+        self.role = role
+        self._rows = []
+
+    def execute(self, query, args=None):
+        if query == IMAGE_ACCESS_SQL:
+            owner = 1 if args[0] < 120 else 2
+            self._rows = [{"user_id": 1, "role": self.role, "owner_id": owner}]
+        elif query == USER_IMAGE_IDS_SQL:
+            self._rows = [{"id": image_id} for image_id in range(100, 120)]
+        elif query.startswith(IMAGE_DETAILS_SQL.split("{")[0]):
+            self._rows = [{"image_id": image_id, "file_name": f"{image_id}.jpg", "claims_id": 1,
+                           "claims_code": "CLM001"} for image_id in args]
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_similar_images_is_scoped_to_the_caller(store):
+    with mock.patch("app.embeddings.get_store", return_value=store):
+        status, payload = similar_images(StubCursor(), "alice", 105, k=10)
+        assert status == 200
+        found = [hit["image_id"] for hit in payload["results"]]
+        assert len(found) == 10 and 105 not in found
+        assert all(100 <= image_id < 120 for image_id in found)
+
+        assert similar_images(StubCursor(), "alice", 125)[0] == 404
+        status, payload = similar_images(StubCursor(role="admin"), "root", 125, k=40)
+        assert status == 200 and len(payload["results"]) == 39
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
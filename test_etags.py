@@ -0,0 +1,118 @@
+"""
+ETag Test Script
+Checks conditional GET (app/data_version.py): successful responses carry a
+weak ETag derived from the user's data version, a matching If-None-Match is
+answered with 304 without running the view, and a version bump changes the tag.
+
+get_db is patched with a stub connection that answers the version lookup,
+so no database is needed.
+"""
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+from flask import jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+
+from app import create_app
+from app.data_version import conditional_get
+from app.db import TimedDictCursor
+
+STATE = {"version": 0, "user_found": True}
+CALLS = []
+
+
+class StubCursor:
+    """Answers the data version lookup from STATE, instrumented like TimedDictCursor"""
+
+    _run = TimedDictCursor._run
+
+    def __init__(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _answer(self, query, args):
+        found = query.lstrip().startswith("SELECT") and STATE["user_found"]
+        self._rows = [{"id": 3, "version": STATE["version"]}] if found else []
+        return len(self._rows)
+
+    def execute(self, query, args=None):
+        return self._run(self._answer, query, args)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class StubConnection:
+    def cursor(self):
+        return StubCursor()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+
+    @app.route("/_test/etag")
+    @jwt_required()
+    @conditional_get("test_etag")
+    def etag_view():
+        CALLS.append(1)
+        return jsonify({"ok": True})
+
+    STATE.update(version=0, user_found=True)
+    CALLS.clear()
+    with app.app_context():
+        headers = {"Authorization": "Bearer " + create_access_token(identity="alice")}
+    with mock.patch("app.data_version.get_db", side_effect=lambda *a, **k: StubConnection()):
+        yield app.test_client(), headers
+
+
+def test_response_carries_weak_etag(client):
+    client, headers = client
+    response = client.get("/_test/etag", headers=headers)
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and weak
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+def test_matching_etag_gets_304_without_running_the_view(client):
+    client, headers = client
+    etag = client.get("/_test/etag", headers=headers).headers["ETag"]
+    response = client.get("/_test/etag", headers=dict(headers, **{"If-None-Match": etag}))
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.get_data()
+    assert len(CALLS) == 1
+
+
+def test_version_bump_and_query_string_change_the_etag(client):
+    client, headers = client
+    etag = client.get("/_test/etag", headers=headers).headers["ETag"]
+    assert client.get("/_test/etag?limit=5", headers=headers).headers["ETag"] != etag
+
+    STATE["version"] = 1
+    response = client.get("/_test/etag", headers=dict(headers, **{"If-None-Match": etag}))
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_unknown_user_gets_no_etag(client):
+    client, headers = client
+    STATE["user_found"] = False
+    response = client.get("/_test/etag", headers=headers)
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,174 @@
+"""
+Idempotency Test Script
+Checks Idempotency-Key handling (app/idempotency.py): the first request claims
+the key and its response is replayed to retries, a different body under the
+same key is refused, a key held by a running request answers 409, a key left
+behind by a dead request is taken over, and failures release the key.
+
+get_db is patched with a stub connection that keeps idempotency_keys in a
+dict and answers the module's SQL statements, so no database is needed.
+"""
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+from flask import jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+
+from app import create_app
+from app.db import TimedDictCursor
+from app.idempotency import (
+    IDEMPOTENCY_CLAIM_SQL, IDEMPOTENCY_LOOKUP_SQL, IDEMPOTENCY_TAKEOVER_SQL,
+    IDEMPOTENCY_COMPLETE_SQL, IDEMPOTENCY_RELEASE_SQL, idempotent
+)
+
+KEYS = {}      # (username, endpoint, key) -> row
+CALLS = []
+OUTCOME = {"status": 201}
+
+
+class StubCursor:
+    """Answers the idempotency statements from KEYS, instrumented like TimedDictCursor"""
+
+    _run = TimedDictCursor._run
+
+    def __init__(self):
+        self._rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _answer(self, query, args):
+        self._rows, self.rowcount = [], 0
+        if query == IDEMPOTENCY_CLAIM_SQL:
+            scope, fingerprint = tuple(args[:3]), args[3]
+            if scope not in KEYS:
+                KEYS[scope] = {"request_hash": fingerprint, "status": "in_progress",
+                               "response_status": None, "response_body": None, "stale": False}
+                self.rowcount = 1
+        elif query == IDEMPOTENCY_LOOKUP_SQL:
+            row = KEYS.get(tuple(args))
+            self._rows = [dict(row)] if row else []
+        elif query == IDEMPOTENCY_TAKEOVER_SQL:
+            row = KEYS.get(tuple(args[:3]))
+            if row and row["status"] == "in_progress" and row["request_hash"] == args[3] and row["stale"]:
+                row["stale"] = False
+                self.rowcount = 1
+        elif query == IDEMPOTENCY_COMPLETE_SQL:
+            KEYS[tuple(args[2:])].update(status="completed", response_status=args[0], response_body=args[1])
+            self.rowcount = 1
+        elif query == IDEMPOTENCY_RELEASE_SQL:
+            if KEYS.get(tuple(args), {}).get("status") == "in_progress":
+                del KEYS[tuple(args)]
+                self.rowcount = 1
+        return self.rowcount
+
+    def execute(self, query, args=None):
+        return self._run(self._answer, query, args)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class StubConnection:
+    def cursor(self):
+        return StubCursor()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+
+    @app.route("/_test/submit", methods=["POST"])
+    @jwt_required()
+    @idempotent("test_submit")
+    def submit_view():
+        CALLS.append(1)
+        if OUTCOME["status"] == "raise":
+            raise RuntimeError("model crashed")
+        return jsonify({"success": OUTCOME["status"] < 400, "run": len(CALLS)}), OUTCOME["status"]
+
+    KEYS.clear()
+    CALLS.clear()
+    OUTCOME["status"] = 201
+    with app.app_context():
+        token = create_access_token(identity="alice")
+
+    def post(key="key-1", **form):
+        headers = {"Authorization": "Bearer " + token}
+        if key:
+            headers["Idempotency-Key"] = key
+        return app.test_client().post("/_test/submit", data=form or {"claims_code": "CLM001"}, headers=headers)
+
+    with mock.patch("app.idempotency.get_db", side_effect=lambda *a, **k: StubConnection()):
+        yield post
+
+
+def test_retry_replays_the_stored_response(client):
+    first = client()
+    assert first.status_code == 201
+    retry = client()
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.get_json() == first.get_json()
+    assert len(CALLS) == 1
+
+
+def test_same_key_with_different_body_is_refused(client):
+    client()
+    response = client(claims_code="CLM002")
+    assert response.status_code == 422
+    assert len(CALLS) == 1
+
+
+def test_key_held_by_running_request_answers_409(client):
+    client()                              # claim, then pretend it is still running
+    row = KEYS[("alice", "test_submit", "key-1")]
+    row.update(status="in_progress", response_status=None, response_body=None)
+    response = client()
+    assert response.status_code == 409
+    assert response.headers["Retry-After"]
+    assert len(CALLS) == 1
+
+
+def test_abandoned_key_is_taken_over(client):
+    client()
+    row = KEYS[("alice", "test_submit", "key-1")]
+    row.update(status="in_progress", response_status=None, response_body=None, stale=True)
+    response = client()
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert len(CALLS) == 2
+
+
+@pytest.mark.parametrize("outcome", [503, 409, 500, "raise"])
+def test_failures_release_the_key(client, outcome):
+    OUTCOME["status"] = outcome
+    assert client().status_code == (500 if outcome == "raise" else outcome)
+    assert not KEYS
+
+    OUTCOME["status"] = 201
+    assert client().status_code == 201
+    assert len(CALLS) == 2
+
+
+def test_requests_without_a_key_always_run(client):
+    client(key=None)
+    client(key=None)
+    assert len(CALLS) == 2
+    assert not KEYS
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,105 @@
+"""
+Image Hash Test Script
+Checks near-duplicate detection (app/image_hash.py): the BK-tree finds the same
+hashes as a brute-force scan, pHash and dHash stay close for a re-encoded
+resized copy and far apart for a different picture, and only an identical
+image of the same user's is offered for analysis reuse.
+"""
+import io
+import json
+import random
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.image_hash import (
+    BKTree, HashEntry, ImageFingerprint, ImageHashIndex, hamming, image_hashes
+)
+
+ANALYSIS = {"confidence": 0.93, "ai_decision": "Crack"}
+
+
+def _picture(seed, size=(320, 240)):
+    """Smooth random picture: blurred noise, so resizing keeps its structure"""
+    rng = np.random.default_rng(seed)
+    small = (rng.random((6, 8, 3)) * 255).astype(np.uint8)
+    return Image.fromarray(small).resize(size, Image.BICUBIC)
+
+
+def _jpeg(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    buffer.seek(0)
+    return buffer
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(7)
+    base = [rng.getrandbits(64) for _ in range(50)]
+    # Near copies of the base values so there is something within range to find
+    values = base + [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in base]
+    tree = BKTree()
+    for item, value in enumerate(values):
+        tree.add(value, item)
+    assert tree.size == len(values)
+
+    for query in base[:10] + [rng.getrandbits(64) for _ in range(5)]:
+        for max_distance in (0, 2, 8, 30):
+            expected = sorted((hamming(query, value), item) for item, value in enumerate(values)
+                              if hamming(query, value) <= max_distance)
+            found = tree.search(query, max_distance)
+            assert sorted(found) == expected
+            assert [distance for distance, _ in found] == sorted(distance for distance, _ in found)
+
+
+def test_hashes_survive_reencoding_and_resizing():
+    original = _picture(1)
+    copy = original.resize((200, 150), Image.LANCZOS)
+    first, second = image_hashes(_jpeg(original)), image_hashes(_jpeg(copy, quality=60))
+    other = image_hashes(_jpeg(_picture(2)))
+    assert hamming(first[0], second[0]) <= 8 and hamming(first[1], second[1]) <= 8
+    assert hamming(first[0], other[0]) > 8
+    # Same bytes, same hashes
+    assert image_hashes(_jpeg(original)) == first
+
+
+def test_index_filters_on_dhash_and_ingests_incrementally():
+    index = ImageHashIndex()
+    rows = [
+        {"id": 1, "image_id": 10, "claims_id": 100, "user_id": 5, "phash": 0b1111, "dhash": 0b1010,
+         "analysis": json.dumps(ANALYSIS)},
+        {"id": 2, "image_id": 11, "claims_id": 101, "user_id": 6, "phash": 0b1110, "dhash": 2 ** 40 - 1,
+         "analysis": None},
+    ]
+    index.ingest(rows, full=True)
+    hits = index.find(0b1111, 0b1010, max_distance=4)
+    assert [(distance, entry.image_id) for distance, entry in hits] == [(0, 10)]
+    assert hits[0][1].analysis == ANALYSIS
+
+    # Rows already seen are skipped by an incremental refresh
+    index.ingest(rows + [dict(rows[0], id=3, image_id=12)])
+    assert index.tree.size == 3
+    assert index.refresh_args(rebuild_seconds=300) == (3,)
+    assert index.refresh_args(rebuild_seconds=0) == (0,)
+
+
+def test_only_an_identical_image_of_the_same_user_is_reused():
+    own = HashEntry(10, 100, 5, 0b1010, ANALYSIS)
+    others = HashEntry(11, 101, 6, 0b1010, ANALYSIS)
+    near = HashEntry(12, 102, 5, 0b1011, ANALYSIS)
+    fingerprint = ImageFingerprint(0b1111, 0b1010, [(0, others), (0, own), (1, near)])
+    assert fingerprint.reusable(5) is own
+    assert fingerprint.reusable("5") is own
+    assert fingerprint.reusable(6) is others
+    assert fingerprint.reusable(7) is None
+    assert ImageFingerprint(0b1111, 0b1010, [(1, near)]).reusable(5) is None
+    assert ImageFingerprint(0b1111, 0b1010, [(0, own._replace(analysis=None))]).reusable(5) is None
+
+    assert [d["image_id"] for d in fingerprint.duplicates(claims_id=100)] == [11, 12]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,112 @@
+"""
+Image Quality Test Script
+Checks the quality gate (app/image_quality.py) on synthetic photos: a sharp,
+well-lit image passes, and small, blurred, dark and blown-out ones fail with
+the matching retake advice. QUALITY_GATE decides whether a failure only flags
+the image or rejects it, and unreadable files are left to the model.
+"""
+import io
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+import pytest
+from flask import Flask
+from PIL import Image, ImageFilter
+
+from app.image_quality import REJECTED_ERROR, check_image_quality, quality_gate, rejection
+
+
+@pytest.fixture
+def config():
+    app = Flask(__name__)
+    app.config.update(
+        QUALITY_GATE="flag", QUALITY_MIN_SIDE=224, QUALITY_MIN_SHARPNESS=40,
+        QUALITY_MIN_BRIGHTNESS=40, QUALITY_MAX_BRIGHTNESS=220, QUALITY_MAX_CLIPPED=0.4
+    )
+    with app.app_context():
+        yield app.config
+
+
+def _photo(size=(640, 480), low=60, high=200, blur=0):
+    """JPEG of textured noise between low and high, optionally blurred"""
+    rng = np.random.default_rng(5)
+    pixels = rng.integers(low, high + 1, size=(size[1], size[0]), dtype=np.uint8)
+    image = Image.fromarray(pixels, "L").convert("RGB")
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    buffer.seek(0)
+    return buffer
+
+
+def _reasons(source):
+    return " | ".join(check_image_quality(source)["reasons"])
+
+
+def test_sharp_well_lit_photo_passes(config):
+    report = check_image_quality(_photo())
+    assert report["passed"] and report["reasons"] == []
+    assert report["metrics"]["width"] == 640 and report["metrics"]["height"] == 480
+    assert report["metrics"]["sharpness"] > config["QUALITY_MIN_SHARPNESS"]
+
+
+def test_small_photo_fails(config):
+    assert "too small (200x150" in _reasons(_photo(size=(200, 150)))
+
+
+def test_blurred_photo_fails(config):
+    reasons = _reasons(_photo(blur=6))
+    assert "blurry" in reasons and "hold the camera steady" in reasons
+
+
+def test_dark_photo_reports_exposure_not_blur(config):
+    reasons = _reasons(_photo(low=0, high=30))
+    assert "too dark" in reasons
+    assert "blurry" not in reasons
+
+
+def test_blown_out_photo_fails(config):
+    reasons = _reasons(_photo(low=245, high=255))
+    assert "overexposed" in reasons
+    assert "pure black or white" in reasons
+
+
+def test_thresholds_come_from_config(config):
+    config["QUALITY_MIN_SIDE"] = 100
+    assert check_image_quality(_photo(size=(200, 150)))["passed"]
+
+
+def test_file_like_source_is_rewound(config):
+    source = _photo()
+    check_image_quality(source)
+    assert source.tell() == 0
+    assert Image.open(source).size == (640, 480)
+
+
+def test_gate_modes(config):
+    assert not quality_gate(_photo(blur=6))[1]
+    config["QUALITY_GATE"] = "reject"
+    report, rejected = quality_gate(_photo(blur=6))
+    assert rejected and not report["passed"]
+    assert not quality_gate(_photo())[1]
+    config["QUALITY_GATE"] = "off"
+    assert quality_gate(_photo(blur=6)) == (None, False)
+
+
+def test_unreadable_image_is_left_to_the_model(config):
+    config["QUALITY_GATE"] = "reject"
+    report, rejected = quality_gate(io.BytesIO(b"not an image"))
+    assert not rejected and report["passed"] and "Quality check failed" in report["error"]
+
+
+def test_rejection_body(config):
+    report = check_image_quality(_photo(blur=6))
+    body = rejection(report, filename="wall.jpg")
+    assert body["success"] is False and body["filename"] == "wall.jpg"
+    assert body["error"].startswith(REJECTED_ERROR + ": Image is blurry")
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
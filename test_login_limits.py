@@ -0,0 +1,97 @@
+"""
+Password Hashing and Login Throttle Test Script
+Checks the bounded bcrypt pool and the token buckets (app/password_hashing.py):
+a full pool refuses new work with HasherBusy, a hash that times out keeps its
+slot until bcrypt actually finishes, and buckets allow their burst, then
+report how long to wait and refill at their rate.
+"""
+import sys
+import threading
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+from flask import Flask
+
+from app.password_hashing import HasherBusy, PasswordHasher, TokenBucketLimiter
+
+
+@pytest.fixture
+def hasher():
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=4, HASH_MAX_WORKERS=1, HASH_MAX_QUEUE=0, HASH_TIMEOUT_SECONDS=0.2)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    yield hasher
+    hasher.executor.shutdown(wait=True)
+
+
+def test_hash_and_check(hasher):
+    stored = hasher.generate_password_hash("secret")
+    assert hasher.check_password_hash(stored, "secret")
+    assert not hasher.check_password_hash(stored, "wrong")
+    assert not hasher.needs_rehash(stored)
+    assert hasher.needs_rehash(stored.replace("$04$", "$12$"))
+
+
+def test_full_pool_is_busy(hasher):
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    def login():
+        try:
+            hasher._run(slow)
+        except HasherBusy:
+            pass     # timed out waiting; the slot stays taken until slow() returns
+
+    worker = threading.Thread(target=login)
+    worker.start()
+    started.wait(5)
+    with pytest.raises(HasherBusy):
+        hasher._run(lambda: None)
+    release.set()
+    worker.join()
+
+
+def test_timed_out_hash_keeps_its_slot_until_done(hasher):
+    release = threading.Event()
+    with pytest.raises(HasherBusy):
+        hasher._run(release.wait, 5)      # gives up after HASH_TIMEOUT_SECONDS
+    # bcrypt is still running, so the slot is still taken
+    with pytest.raises(HasherBusy):
+        hasher._run(lambda: None)
+    release.set()
+    hasher.executor.submit(lambda: None).result(5)   # the slow call has returned
+    assert hasher._run(lambda: "ok") == "ok"
+
+
+def test_token_bucket_burst_wait_and_refill():
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=2)
+    clock = [1000.0]
+    with mock.patch("app.password_hashing.time.monotonic", side_effect=lambda: clock[0]):
+        assert limiter.consume("alice") == 0
+        assert limiter.consume("alice") == 0
+        assert limiter.wait("alice") == pytest.approx(1.0)
+        assert limiter.consume("alice") == pytest.approx(1.0)
+        assert limiter.consume("bob") == 0     # buckets are per key
+
+        clock[0] += 1.0                         # one token per second
+        assert limiter.wait("alice") == 0
+        assert limiter.consume("alice") == 0
+        assert limiter.consume("alice") > 0
+
+
+def test_throttle_counts_every_key(hasher):
+    for _ in range(5):
+        assert hasher.throttle("user:alice", "ip:10.0.0.1") == 0
+    assert hasher.throttle("user:alice", None) > 0
+    assert hasher.retry_after("ip:10.0.0.1") > 0
+    assert hasher.retry_after("ip:10.0.0.2") == 0
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,77 @@
+"""
+Metrics Test Script
+Checks the stage timer (app/metrics.py): timed records one observation per
+block or decorated call, including calls that raise and calls running at the
+same time, and /metrics exports the histograms in the Prometheus text format.
+"""
+import sys
+import threading
+import time
+sys.path.insert(0, '.')
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import create_app
+from app.metrics import timed
+
+
+def _samples(stage):
+    """(count, sum) recorded so far for a stage"""
+    labels = {"stage": stage}
+    count = REGISTRY.get_sample_value("eda_stage_seconds_count", labels) or 0
+    total = REGISTRY.get_sample_value("eda_stage_seconds_sum", labels) or 0
+    return count, total
+
+
+def test_context_manager_records_duration():
+    before_count, before_sum = _samples("test_block")
+    with timed("test_block"):
+        time.sleep(0.01)
+    count, total = _samples("test_block")
+    assert count == before_count + 1
+    assert total - before_sum >= 0.01
+
+
+def test_decorator_records_every_call_even_on_error():
+    @timed("test_decorated")
+    def work(fail=False):
+        if fail:
+            raise ValueError("boom")
+        return "done"
+
+    before_count, _ = _samples("test_decorated")
+    assert work() == "done"
+    with pytest.raises(ValueError):
+        work(fail=True)
+    assert _samples("test_decorated")[0] == before_count + 2
+
+
+def test_concurrent_calls_keep_their_own_start_time():
+    @timed("test_concurrent")
+    def work(seconds):
+        time.sleep(seconds)
+
+    before_count, before_sum = _samples("test_concurrent")
+    threads = [threading.Thread(target=work, args=(0.05,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    count, total = _samples("test_concurrent")
+    assert count == before_count + 4
+    # A shared start time would make later calls look shorter than they were
+    assert total - before_sum >= 4 * 0.05
+
+
+def test_metrics_endpoint_exports_stages():
+    with timed("test_exported"):
+        pass
+    response = create_app().test_client().get("/metrics")
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'eda_stage_seconds_count{stage="test_exported"}' in body
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
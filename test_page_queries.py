@@ -0,0 +1,121 @@
+"""
+Page Query Budget Test Script
+Renders the data-heavy pages and fails if any of them executes more
+statements than its budget (N+1 regressions).
+
+The pages run against a stub connection (get_db is patched), so no database
+is needed and the test runs under pytest. The stub's cursor counts statements
+through the same TimedDictCursor instrumentation as a real one, so every
+statement a page issues is counted, answered or not.
+"""
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+from app import create_app
+from app.db import TimedDictCursor, assert_max_queries
+from app.claim_summary import DAMAGE_CALCULATION_SQL
+from app.repository import NEW_REPORT_SQL
+
+SAMPLE_CLAIM = {"claims_id": 7, "claims_code": "CLM007"}
+
+# Canned rows per statement; anything else a page runs gets an empty result
+STUB_RESULTS = {
+    NEW_REPORT_SQL: [{
+        "claims_id": 7, "user_id": 3, "insurance_id": 11, "policy_number": "POL-11",
+        "insurance_codes": '["INS-11", "INS-12"]', "claim_property_details_id": 21,
+    }],
+    DAMAGE_CALCULATION_SQL: [{
+        "name": "Test User", "insurance_id": 11, "policy_number": "POL-11", "claim_id": "CLM007",
+        "file_name": "wall.jpg",
+        "images": '[{"id": 2, "file_name": "wall2.jpg", "file_format": ".jpg"},'
+                  ' {"id": 1, "file_name": "wall.jpg", "file_format": ".jpg"}]',
+        "ai_decision": "Positive (Crack Detected)", "confidence": 91.5,
+        "crack_percent": 91.5, "non_crack_percent": 8.5, "claim_recommended": 12500.0,
+    }],
+}
+
+# (description, url template, max statements)
+PAGE_BUDGETS = [
+    ("New report", "/new_report?claims_code={claims_code}", 1),
+    ("Damaged property calculation", "/damaged_property_calculation?claims_id={claims_id}", 1),
+]
+
+
+class StubCursor:
+    """Cursor answering from STUB_RESULTS, instrumented like TimedDictCursor"""
+
+    _run = TimedDictCursor._run
+
+    def __init__(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _answer(self, query, args):
+        self._rows = [dict(row) for row in STUB_RESULTS.get(query, [])]
+        return len(self._rows)
+
+    def execute(self, query, args=None):
+        return self._run(self._answer, query, args)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class StubConnection:
+    def cursor(self):
+        return StubCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_page_query_budgets():
+    app = create_app()
+    client = app.test_client()
+    failures = []
+    with mock.patch("app.routes.pages.insurance_pages.get_db", return_value=StubConnection()):
+        for description, url, budget in PAGE_BUDGETS:
+            url = url.format(**SAMPLE_CLAIM)
+            try:
+                with assert_max_queries(budget) as queries:
+                    response = client.get(url)
+            except AssertionError as e:
+                print(f"  [FAIL] {description}: {e}")
+                failures.append(description)
+                continue
+            if response.status_code != 200:
+                print(f"  [FAIL] {description}: HTTP {response.status_code}")
+                failures.append(description)
+                continue
+            print(f"  [OK] {description}: {len(queries)} queries (budget {budget}), HTTP {response.status_code}")
+    assert not failures, f"Pages over budget or failing: {failures}"
+
+
+if __name__ == '__main__':
+    print("="*70)
+    print("  PAGE QUERY BUDGET TEST")
+    print("="*70)
+    try:
+        test_page_query_budgets()
+        success = True
+    except AssertionError:
+        success = False
+    print("\n" + "="*70)
+    print("  Status: PASSED" if success else "  Status: FAILED")
+    print("="*70)
+    sys.exit(0 if success else 1)
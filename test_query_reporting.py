@@ -0,0 +1,103 @@
+"""
+Query Reporting Test Script
+Checks the per-request statement instrumentation (app/db.py): slow statements
+are logged with the types of their parameters (values only when
+DB_SLOW_QUERY_LOG_PARAMS is on), repeated statements are flagged as likely
+N+1, and DB_SERVER_TIMING adds the totals in a Server-Timing header.
+
+Statements run on a stub cursor instrumented like TimedDictCursor, so no
+database is needed.
+"""
+import logging
+import sys
+import time
+sys.path.insert(0, '.')
+
+import pytest
+from flask import jsonify
+
+from app import create_app
+from app.db import TimedDictCursor, _format_params
+
+SLOW_SQL = "SELECT id FROM users WHERE username = %s AND password = %s"
+CLAIM_SQL = "SELECT * FROM claims WHERE id = %s"
+
+
+class StubCursor:
+    """Cursor whose statements take a set time, instrumented like TimedDictCursor"""
+
+    _run = TimedDictCursor._run
+
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+
+    def _answer(self, query, args):
+        time.sleep(self.seconds)
+        return 0
+
+    def execute(self, query, args=None):
+        return self._run(self._answer, query, args)
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config.update(
+        DB_SLOW_QUERY_MS=5, DB_SLOW_QUERY_LOG_PARAMS=False, DB_N_PLUS_ONE_THRESHOLD=3, DB_SERVER_TIMING=True
+    )
+
+    @app.route("/_test/slow")
+    def slow_view():
+        StubCursor(seconds=0.01).execute(SLOW_SQL, ("alice", "hunter2-secret"))
+        return jsonify({})
+
+    @app.route("/_test/n-plus-one")
+    def n_plus_one_view():
+        cursor = StubCursor()
+        for claims_id in range(5):
+            cursor.execute(CLAIM_SQL, (claims_id,))
+        return jsonify({})
+
+    return app
+
+
+def test_slow_query_logs_parameter_types_only(app, caplog):
+    with caplog.at_level(logging.WARNING):
+        app.test_client().get("/_test/slow")
+    messages = [r.getMessage() for r in caplog.records if "Slow query" in r.getMessage()]
+    assert len(messages) == 1
+    assert "GET /_test/slow" in messages[0]
+    assert "params=(str[5], str[14])" in messages[0]
+    assert "hunter2-secret" not in messages[0]
+
+
+def test_slow_query_values_are_opt_in(app, caplog):
+    app.config["DB_SLOW_QUERY_LOG_PARAMS"] = True
+    with caplog.at_level(logging.WARNING):
+        app.test_client().get("/_test/slow")
+    assert any("hunter2-secret" in r.getMessage() for r in caplog.records)
+
+
+def test_repeated_statement_is_flagged(app, caplog):
+    with caplog.at_level(logging.WARNING):
+        app.test_client().get("/_test/n-plus-one")
+    messages = [r.getMessage() for r in caplog.records if "Possible N+1" in r.getMessage()]
+    assert len(messages) == 1
+    assert "executed 5 times" in messages[0] and CLAIM_SQL in messages[0]
+
+
+def test_server_timing_header(app):
+    response = app.test_client().get("/_test/n-plus-one")
+    header = response.headers["Server-Timing"]
+    assert header.startswith("db;dur=") and 'desc="5 queries"' in header
+    assert "db-1;dur=" in header
+
+
+def test_executemany_params_are_summarised():
+    rows = [(1, "a.jpg"), (2, "b.jpg"), (3, "c.jpg")]
+    assert _format_params(rows) == "3 rows of (int, str[5])"
+    assert _format_params({"token": "x" * 40}) == "{token: str[40]}"
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
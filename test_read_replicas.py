@@ -0,0 +1,94 @@
+"""
+Read Replica Test Script
+Checks read/write splitting (app/db.py): views under @read_replica read from
+one replica for the whole request, users who wrote within DB_STICKY_SECONDS
+stay on the primary, an unreachable replica falls back to the primary, and
+replicas without a shared sticky marker are refused at startup.
+
+Connections are not opened: app.db._connect is patched to report which host
+each get_db() call would use.
+"""
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pymysql
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+
+from app import create_app, cache, db
+from app.cache import MemoryCacheBackend, mark_recent_write
+from app.db import _replica_settings, get_db, read_replica
+
+REPLICAS = "replica-a:3307,reader:pw@replica-b/eda_ro"
+DOWN = set()
+
+
+def _fake_connect(host, user, password, db, port):
+    if host in DOWN:
+        raise pymysql.err.OperationalError(2003, f"Can't connect to MySQL server on '{host}'")
+    return host
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+    app.config.update(DB_REPLICA_URLS=REPLICAS, DB_HOST="primary", DB_STICKY_SECONDS=5)
+
+    @app.route("/_test/hosts")
+    @jwt_required()
+    @read_replica
+    def hosts_view():
+        return jsonify([get_db() for _ in range(4)] + [get_db(use_replica=False)])
+
+    DOWN.clear()
+    with app.app_context():
+        headers = {"Authorization": "Bearer " + create_access_token(identity="alice")}
+    with mock.patch.object(cache, "_backend", MemoryCacheBackend()), \
+            mock.patch("app.db._connect", side_effect=_fake_connect):
+        yield app, app.test_client(), headers
+
+
+def test_replica_urls_fill_in_from_the_primary():
+    config = {"DB_REPLICA_URLS": REPLICAS, "DB_USER": "eda", "DB_PASSWORD": "secret",
+              "DB_NAME": "eda", "DB_PORT": 3306}
+    assert _replica_settings(config) == [
+        {"host": "replica-a", "user": "eda", "password": "secret", "db": "eda", "port": 3307},
+        {"host": "replica-b", "user": "reader", "password": "pw", "db": "eda_ro", "port": 3306},
+    ]
+
+
+def test_one_replica_per_request(client):
+    app, client, headers = client
+    for _ in range(10):
+        hosts = client.get("/_test/hosts", headers=headers).get_json()
+        assert hosts[0] in ("replica-a", "replica-b")
+        assert set(hosts[:4]) == {hosts[0]}
+        assert hosts[4] == "primary"      # explicit primary reads are not rerouted
+
+
+def test_recent_writer_stays_on_primary(client):
+    app, client, headers = client
+    with app.app_context():
+        mark_recent_write("alice")
+    assert set(client.get("/_test/hosts", headers=headers).get_json()) == {"primary"}
+
+
+def test_unreachable_replica_falls_back_to_primary(client):
+    app, client, headers = client
+    DOWN.update({"replica-a", "replica-b"})
+    assert set(client.get("/_test/hosts", headers=headers).get_json()) == {"primary"}
+
+
+def test_unshared_sticky_marker_is_refused():
+    app = Flask(__name__)
+    app.config.update(DB_REPLICA_URLS=REPLICAS, CACHE_BACKEND="memory", WEB_CONCURRENCY=4)
+    with pytest.raises(RuntimeError):
+        db.init_app(app)
+    app.config["WEB_CONCURRENCY"] = 1
+    db.init_app(app)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
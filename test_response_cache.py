@@ -0,0 +1,108 @@
+"""
+Response Cache Test Script
+Checks the per-user response cache (app/cache.py): entries are keyed by the
+caller, the query string and the user's data version, so bumping the version
+invalidates them; the public scope uses the cache backend's own counter.
+
+The data version lookup is patched, so no database is needed.
+"""
+import sys
+import time
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+from flask import jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+
+from app import create_app, cache
+from app.cache import MemoryCacheBackend, PUBLIC_SCOPE, cached_response, invalidate_user_cache
+
+VERSIONS = {}
+CALLS = []
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+    app.config["CACHE_ENABLED"] = True
+
+    @app.route("/_test/cached")
+    @jwt_required()
+    @cached_response("test_cached")
+    def cached_view():
+        CALLS.append("user")
+        return jsonify({"calls": len(CALLS)})
+
+    @app.route("/_test/public")
+    @jwt_required()
+    @cached_response("test_public", scope=PUBLIC_SCOPE)
+    def public_view():
+        CALLS.append("public")
+        return jsonify({"calls": len(CALLS)})
+
+    VERSIONS.clear()
+    CALLS.clear()
+    with mock.patch.object(cache, "_backend", MemoryCacheBackend()), \
+            mock.patch("app.data_version.get_user_data_version", side_effect=lambda name: VERSIONS.get(name, 0)):
+        yield app.test_client(), app
+
+
+def _headers(app, username):
+    with app.app_context():
+        return {"Authorization": "Bearer " + create_access_token(identity=username)}
+
+
+def test_memory_backend_expires_and_evicts():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    backend.get("a")                    # "b" is now the least recently used
+    backend.set("c", "3", ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
+
+    backend.set("short", "x", ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get("short") is None
+
+
+def test_entries_are_keyed_by_user_and_query(client):
+    client, app = client
+    alice, bob = _headers(app, "alice"), _headers(app, "bob")
+
+    first = client.get("/_test/cached", headers=alice)
+    assert first.headers["X-Cache"] == "MISS"
+    again = client.get("/_test/cached", headers=alice)
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.get_json() == first.get_json()
+
+    assert client.get("/_test/cached?limit=5", headers=alice).headers["X-Cache"] == "MISS"
+    assert client.get("/_test/cached", headers=bob).headers["X-Cache"] == "MISS"
+    assert CALLS == ["user"] * 3
+
+
+def test_data_version_bump_invalidates(client):
+    client, app = client
+    alice = _headers(app, "alice")
+    client.get("/_test/cached", headers=alice)
+    assert client.get("/_test/cached", headers=alice).headers["X-Cache"] == "HIT"
+
+    VERSIONS["alice"] = 1   # a committed write bumped alice's data version
+    assert client.get("/_test/cached", headers=alice).headers["X-Cache"] == "MISS"
+
+
+def test_public_scope_invalidation(client):
+    client, app = client
+    alice, bob = _headers(app, "alice"), _headers(app, "bob")
+    client.get("/_test/public", headers=alice)
+    # Shared by every user
+    assert client.get("/_test/public", headers=bob).headers["X-Cache"] == "HIT"
+
+    with app.app_context():
+        invalidate_user_cache("alice", public=True)
+    assert client.get("/_test/public", headers=bob).headers["X-Cache"] == "MISS"
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
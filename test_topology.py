@@ -0,0 +1,51 @@
+"""
+Worker Topology Test Script
+Checks recommended_topology and torch_thread_settings (app/topology.py):
+workers x intra-op threads never exceed the cores, and explicit settings win
+over the derived ones.
+"""
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+
+from app.topology import recommended_topology, torch_thread_settings
+
+
+@pytest.mark.parametrize("cpus, workers, threads", [
+    (1, 1, 1),
+    (2, 2, 1),
+    (4, 2, 2),
+    (8, 4, 2),
+    (16, 4, 4),
+    (64, 16, 4),
+])
+def test_derived_topology(cpus, workers, threads):
+    topology = recommended_topology(cpus=cpus)
+    assert topology == {"workers": workers, "intra_op_threads": threads, "interop_threads": 1}
+
+
+@pytest.mark.parametrize("cpus", [1, 2, 3, 6, 12, 24, 96])
+def test_cores_are_not_oversubscribed(cpus):
+    for workers in (None, 1, 3, cpus, cpus * 2):
+        topology = recommended_topology(cpus=cpus, workers=workers)
+        assert 1 <= topology["workers"] <= cpus
+        assert topology["workers"] * topology["intra_op_threads"] <= cpus
+
+
+def test_fixed_worker_count_splits_the_cores():
+    assert recommended_topology(cpus=8, workers=3) == {"workers": 3, "intra_op_threads": 2, "interop_threads": 1}
+    # More workers than cores are capped at one per core
+    assert recommended_topology(cpus=4, workers=10)["workers"] == 4
+
+
+def test_torch_thread_settings():
+    with mock.patch("app.topology.available_cpus", return_value=8):
+        assert torch_thread_settings() == (2, 1)
+        assert torch_thread_settings(workers=8) == (1, 1)
+        assert torch_thread_settings(num_threads=6, interop_threads=2) == (6, 2)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,243 @@
+"""
+Resumable Upload Test Script
+Checks chunked upload sessions (app/uploads.py): files are preallocated and
+chunks land at their offsets in any order, received ranges are merged so a
+client can resend only the gaps, the chunk that completes a file starts its
+analysis exactly once, and finalize refuses incomplete files, recovers complete
+files left 'receiving' and returns the decoded analyses.
+
+get_db is patched with a stub connection that keeps the upload tables in
+dicts, and the analysis thread is replaced by one that stores a fixed result.
+"""
+import io
+import json
+import sys
+from unittest import mock
+sys.path.insert(0, '.')
+
+import pytest
+
+from app import create_app
+from app.db import TimedDictCursor
+from app.uploads import (
+    CHUNK_INSERT_SQL, FILE_CHUNKS_SQL, FILE_COMPLETE_SQL, FILE_LOCK_SQL, FILE_REQUEUE_SQL,
+    PENDING_SESSIONS_SQL, SESSION_CONSUME_SQL, SESSION_FILES_SQL, UploadError,
+    consume_session, create_session, finalize_session, merge_ranges, session_status, write_chunk
+)
+
+SESSIONS = {}  # upload_id -> {"username", "status"}
+FILES = {}     # (upload_id, file_index) -> upload_files row
+CHUNKS = {}    # (upload_id, file_index, start_offset) -> end_offset
+STARTED = []
+ANALYSIS = {"prediction": {"predicted_class": "Crack", "class_index": 1}, "error": None}
+
+
+class StubCursor:
+    """Answers the upload statements from the dicts above, instrumented like TimedDictCursor"""
+
+    _run = TimedDictCursor._run
+
+    def __init__(self):
+        self._rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _file_chunks(self, upload_id, file_index):
+        return [{"file_index": i, "start_offset": start, "end_offset": end}
+                for (u, i, start), end in sorted(CHUNKS.items())
+                if u == upload_id and file_index in (None, i)]
+
+    def _answer(self, query, args):
+        self._rows, self.rowcount = [], 0
+        if "CREATE TABLE" in query or "created_at < NOW()" in query:
+            pass
+        elif query == PENDING_SESSIONS_SQL:
+            pending = [s for s in SESSIONS.values() if s["username"] == args[0] and s["status"] != "consumed"]
+            self._rows = [{"pending": len(pending)}]
+        elif query.startswith("INSERT INTO upload_sessions"):
+            SESSIONS[args[0]] = {"username": args[1], "status": "open"}
+        elif query.startswith("INSERT INTO upload_files"):
+            for upload_id, index, name, stored_name, size in args:
+                FILES[(upload_id, index)] = {"file_index": index, "file_name": name, "stored_name": stored_name,
+                                             "size": size, "status": "receiving", "analysis": None}
+        elif query == SESSION_FILES_SQL:
+            session = SESSIONS.get(args[0])
+            self._rows = [dict(row, username=session["username"], session_status=session["status"])
+                          for (upload_id, _), row in sorted(FILES.items()) if upload_id == args[0]]
+        elif query == FILE_LOCK_SQL:
+            self._rows = [{"status": FILES[tuple(args)]["status"]}]
+        elif query == CHUNK_INSERT_SQL:
+            key = tuple(args[:3])
+            CHUNKS[key] = max(CHUNKS.get(key, 0), args[3])
+        elif query == FILE_CHUNKS_SQL:
+            self._rows = self._file_chunks(*args)
+        elif query.startswith("SELECT file_index, start_offset"):
+            self._rows = self._file_chunks(args[0], None)
+        elif query == FILE_COMPLETE_SQL:
+            row = FILES[tuple(args)]
+            if row["status"] == "receiving":
+                row["status"] = "analyzing"
+                self.rowcount = 1
+        elif query == FILE_REQUEUE_SQL:
+            pass                          # analyses in these tests are never stale
+        elif query.startswith("UPDATE upload_sessions SET status = 'finalized'"):
+            if SESSIONS[args[0]]["status"] == "open":
+                SESSIONS[args[0]]["status"] = "finalized"
+                self.rowcount = 1
+        elif query == SESSION_CONSUME_SQL:
+            if SESSIONS[args[0]]["status"] == "finalized":
+                SESSIONS[args[0]]["status"] = "consumed"
+                self.rowcount = 1
+        else:
+            raise AssertionError(f"Unexpected statement: {query}")
+        return self.rowcount
+
+    def execute(self, query, args=None):
+        return self._run(self._answer, query, args)
+
+    def executemany(self, query, args):
+        return self._run(self._answer, query, args)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class StubConnection:
+    def cursor(self):
+        return StubCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _analyzed(upload_id, file_index, filepath):
+    """Stand-in for the analysis thread: records the start and stores the result at once"""
+    STARTED.append((upload_id, file_index))
+    FILES[(upload_id, file_index)].update(status="analyzed", analysis=json.dumps(ANALYSIS))
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), UPLOAD_MAX_OPEN_SESSIONS=2)
+    for table in (SESSIONS, FILES, CHUNKS):
+        table.clear()
+    STARTED.clear()
+    with app.app_context(), \
+            mock.patch("app.uploads.get_db", side_effect=lambda *a, **k: StubConnection()), \
+            mock.patch("app.uploads._start_analysis", side_effect=_analyzed), \
+            mock.patch("app.uploads.POLL_INTERVAL_SECONDS", 0):
+        yield app
+
+
+def _send(upload_id, file_index, offset, data, length=None):
+    return write_chunk(upload_id, "alice", file_index, offset, io.BytesIO(data), length or len(data))
+
+
+def test_merge_ranges():
+    assert merge_ranges([]) == []
+    assert merge_ranges([(10, 20), (0, 5), (5, 10)]) == [[0, 20]]
+    assert merge_ranges([(0, 4), (2, 6), (8, 9)]) == [[0, 6], [8, 9]]
+
+
+def test_session_preallocates_files(app, tmp_path):
+    upload_id, files = create_session("alice", [{"name": "wall 1.jpg", "size": 10}, {"name": "b.jpg", "size": 3}])
+    assert [f["file_name"] for f in files] == ["wall_1.jpg", "b.jpg"]
+    stored = [tmp_path / FILES[(upload_id, i)]["stored_name"] for i in (0, 1)]
+    assert [p.stat().st_size for p in stored] == [10, 3]
+
+
+def test_open_sessions_are_capped_per_user(app):
+    create_session("alice", [{"name": "a.jpg", "size": 1}])
+    create_session("alice", [{"name": "a.jpg", "size": 1}])
+    with pytest.raises(UploadError) as error:
+        create_session("alice", [{"name": "a.jpg", "size": 1}])
+    assert error.value.status == 429
+    create_session("bob", [{"name": "a.jpg", "size": 1}])
+
+
+def test_chunks_in_any_order_complete_the_file_once(app, tmp_path):
+    upload_id, _ = create_session("alice", [{"name": "a.jpg", "size": 12}])
+    _send(upload_id, 0, 8, b"IJKL")
+    status = _send(upload_id, 0, 0, b"ABCD")
+    assert status["received_ranges"] == [[0, 4], [8, 12]]
+    assert status["status"] == "receiving" and not STARTED
+
+    # The status call tells a reconnecting client which gap to resend
+    assert session_status(upload_id, "alice")["files"][0]["received_bytes"] == 8
+    status = _send(upload_id, 0, 4, b"EFGH")
+    assert status["received_ranges"] == [[0, 12]]
+    assert STARTED == [(upload_id, 0)]
+
+    # A resent chunk after completion does not start a second analysis
+    _send(upload_id, 0, 4, b"EFGH")
+    assert STARTED == [(upload_id, 0)]
+    assert (tmp_path / FILES[(upload_id, 0)]["stored_name"]).read_bytes() == b"ABCDEFGHIJKL"
+
+
+def test_bad_chunks_are_refused(app):
+    upload_id, _ = create_session("alice", [{"name": "a.jpg", "size": 8}])
+    with pytest.raises(UploadError) as error:
+        _send(upload_id, 0, 6, b"XYZ")
+    assert error.value.status == 416
+    with pytest.raises(UploadError) as error:
+        write_chunk(upload_id, "bob", 0, 0, io.BytesIO(b"AB"), 2)
+    assert error.value.status == 404
+
+    # A dropped connection leaves no range behind, so the chunk is resent in full
+    with pytest.raises(UploadError):
+        _send(upload_id, 0, 0, b"ABCD", length=6)
+    assert not CHUNKS
+
+
+def test_finalize_refuses_incomplete_files(app):
+    upload_id, _ = create_session("alice", [{"name": "a.jpg", "size": 4}, {"name": "b.jpg", "size": 4}])
+    _send(upload_id, 0, 0, b"ABCD")
+    _send(upload_id, 1, 0, b"AB")
+    with pytest.raises(UploadError) as error:
+        finalize_session(upload_id, "alice", wait_seconds=0)
+    assert error.value.status == 409 and "[1]" in str(error.value)
+    assert SESSIONS[upload_id]["status"] == "open"
+
+
+def test_finalize_returns_analyses_and_session_is_consumed_once(app):
+    upload_id, _ = create_session("alice", [{"name": "a.jpg", "size": 4}, {"name": "b.jpg", "size": 2}])
+    _send(upload_id, 0, 0, b"ABCD")
+    _send(upload_id, 1, 0, b"AB")
+    # A worker that died between the chunk commit and the analysis start left this one 'receiving'
+    FILES[(upload_id, 1)].update(status="receiving", analysis=None)
+    STARTED.clear()
+
+    files, done = finalize_session(upload_id, "alice", wait_seconds=1)
+    assert done
+    assert [f["analysis"] for f in files] == [ANALYSIS, ANALYSIS]
+    assert STARTED == [(upload_id, 1)]
+
+    with pytest.raises(UploadError) as error:
+        _send(upload_id, 0, 0, b"ABCD")
+    assert error.value.status == 409
+
+    consume_session(StubCursor(), upload_id)
+    with pytest.raises(UploadError) as error:
+        consume_session(StubCursor(), upload_id)
+    assert error.value.status == 409
+    with pytest.raises(UploadError):
+        finalize_session(upload_id, "alice", wait_seconds=0)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main(["-q", __file__]))
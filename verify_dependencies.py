@@ -12,7 +12,10 @@ from pathlib import Path
 STDLIB_MODULES = {
     'os', 'sys', 'datetime', 'random', 'time', 'json', 'traceback',
     'collections', 'functools', 'itertools', 'typing', 'pathlib',
-    'io', 'logging', 're', 'importlib', 'warnings', 'abc'
+    'io', 'logging', 're', 'importlib', 'warnings', 'abc', 'glob',
+    'threading', 'hashlib', 'base64', 'math', 'sqlite3',
+    'concurrent', 'contextlib', 'cProfile', 'http', 'socket',
+    'socketserver', 'urllib', 'argparse', 'queue', 'asyncio', 'contextvars', 'secrets', 'fcntl'
 }
 
 # Module name mappings (import name -> package name)
@@ -24,6 +27,8 @@ MODULE_MAPPINGS = {
     'flask_jwt_extended': 'Flask-JWT-Extended',
     'flask_bcrypt': 'flask-bcrypt',
     'dotenv': 'python-dotenv',
+    'click': 'Flask',  # installed with Flask
+    'jwt': 'Flask-JWT-Extended',  # PyJWT, installed with Flask-JWT-Extended
 }
 
 def extract_imports(file_path):